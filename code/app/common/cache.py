@@ -1,47 +1,199 @@
-import copy
-import glob
+import atexit
 import json
 import os
+import sqlite3
+import sys
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List
+from types import MappingProxyType
+from typing import Any, Dict, List, Set
 
 
 class Cache:
-    """Cache handling class, storing data in the memory with disk persistence"""
+    """
+    Cache handling class, storing data in the memory with disk persistence.
+
+    The values are stored frozen (lists as tuples, dicts as read-only mappings, sets as frozensets), so they're returned
+    without any copy and may be shared by every thread. The reads take no lock, while the writes to each module take
+    the module lock.
+
+    Each module is persisted into its own SQLite store, which may be shared by several processes: only its keys are
+    loaded at first, each value being loaded the first time it's read, and the new values are written incrementally,
+    every DISK_SYNC_SECONDS (or when the process exits).
+
+    The values kept in the memory are bounded for each module (see set_limits), by their number and approximate size,
+    evicting the least recently used ones (the ones already written into the store may still be loaded again). The
+    statistics of each module are updated without any lock, so they're approximate when written by several threads.
+    """
     _modules_timestamp = {}  # to store the modules keys and their last updated timestamp
-    _data = {}
+    _data = {}  # values of each module kept in the memory, from the least to the most recently used
+    _sizes = {}  # approximate size (in bytes) of each value kept in the memory, by module
+    _limits = {}  # (max entries, max bytes) of each module with its own limits
+    _stats = {}  # statistics of each module
+    _pending = {}  # values of each module not written into its store yet
+    _stored_keys = {}  # keys of each module found in its store (so the missing ones aren't looked up there)
+    _locks = {}  # locks of each module, by their purpose: guarding its data writes or its store
+    _locks_lock = threading.Lock()  # guards the creation of the modules locks
     DISK_SYNC_SECONDS = 30
+    STORE_TIMEOUT_SECONDS = 30  # how long a process waits for another one writing into the same store
+    MAX_ENTRIES = 100000  # default maximum number of values of a module kept in the memory (None for no limit)
+    MAX_BYTES = 256 * 1024 * 1024  # default maximum (approximate) size of the values of a module in the memory
+    SCALAR_TYPES = (str, int, float, bool, type(None))
 
     @staticmethod
     def is_disabled() -> bool:
         """Determine whether the cache is globally disabled or not"""
-        return os.environ['CACHE_DISABLED'] == 1 if 'CACHE_DISABLED' in os.environ else False
+        return os.environ.get('CACHE_DISABLED', '0') == '1'
+
+    @staticmethod
+    def freeze(value: Any) -> Any:
+        """Returns an immutable copy of a value (the immutable values are returned as they are)"""
+        if isinstance(value, tuple) and all(type(item) in Cache.SCALAR_TYPES for item in value):
+            return value
+        if isinstance(value, (list, tuple)):
+            return tuple(Cache.freeze(item) for item in value)
+        if isinstance(value, (dict, MappingProxyType)):
+            return MappingProxyType({key: Cache.freeze(item) for key, item in value.items()})
+        if isinstance(value, (set, frozenset)):
+            return frozenset(Cache.freeze(item) for item in value)
+        return value
+
+    @staticmethod
+    def thaw(value: Any) -> Any:
+        """Converts a frozen value (not supported by JSON) into a serializable one"""
+        if isinstance(value, MappingProxyType):
+            return dict(value)
+        if isinstance(value, frozenset):
+            return list(value)
+        raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+    @staticmethod
+    def get_size(value: Any) -> int:
+        """
+        Gets the approximate size (in bytes) of a frozen value, including the containers it contains but not their
+        scalars (e.g. the sections names), which are mostly shared by many values
+        """
+        size = sys.getsizeof(value)
+        if isinstance(value, (tuple, frozenset)):
+            size += sum(Cache.get_size(item) for item in value if type(item) not in Cache.SCALAR_TYPES)
+        elif isinstance(value, MappingProxyType):
+            size += sys.getsizeof(dict(value)) + sum(
+                Cache.get_size(item) for item in value.values() if type(item) not in Cache.SCALAR_TYPES
+            )
+        return size
+
+    @staticmethod
+    def set_limits(module: str, max_entries: int = None, max_bytes: int = None) -> None:
+        """Sets the maximum number of values (and their approximate size) of a module kept in the memory"""
+        with Cache.get_lock(module):
+            Cache._limits[module] = (max_entries, max_bytes)
+            Cache.evict(module)
+
+    @staticmethod
+    def get_module_stats(module: str) -> Dict:
+        """Gets the statistics counters of a given module (created when needed)"""
+        module_stats = Cache._stats.get(module)
+        if module_stats is None:
+            module_stats = Cache._stats.setdefault(module, {
+                'hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0, 'size': 0, 'bytes': 0,
+            })
+        return module_stats
+
+    @staticmethod
+    def stats(module: str = None) -> Dict:
+        """
+        Returns the statistics of a given module, or the totals of every module: values found in the memory (hits) or
+        loaded from the store (loads, also counted as hits), not found (misses), evicted from the memory (evictions),
+        and the number (size) and approximate size (bytes) of the values kept in the memory
+        """
+        modules_stats = [Cache.get_module_stats(module)] if module is not None else list(Cache._stats.values())
+        totals = {
+            counter: sum(module_stats[counter] for module_stats in modules_stats)
+            for counter in ('hits', 'misses', 'loads', 'evictions', 'size', 'bytes')
+        }
+        total_reads = totals['hits'] + totals['misses']
+        totals['hit_ratio'] = totals['hits'] / total_reads if total_reads else 0.0
+        return totals
+
+    @staticmethod
+    def get_lock(module: str, purpose: str = 'data') -> threading.Lock:
+        """Gets the lock of a given module, for its data or its store (created when needed)"""
+        lock = Cache._locks.get((module, purpose))
+        if lock is None:
+            with Cache._locks_lock:
+                lock = Cache._locks.setdefault((module, purpose), threading.Lock())
+        return lock
 
     @staticmethod
     def list_keys(module: str) -> List:
-        """List the cache data keys for a given module"""
-        return [key for key in Cache._data[module]] if module in Cache._data else None
+        """List the cache data keys for a given module (the stored ones included, even if not loaded yet)"""
+        stored_keys = [row[0] for row in Cache.query(module, "SELECT key FROM cache ORDER BY rowid")]
+        known_keys = set(stored_keys)
+        return stored_keys + [key for key in list(Cache._data.get(module, {})) if key not in known_keys]
+
+    @staticmethod
+    def get_stored_keys(module: str) -> Set:
+        """Gets the keys found in the store of a given module (read from it the first time)"""
+        stored_keys = Cache._stored_keys.get(module)
+        if stored_keys is None:
+            stored_keys = {row[0] for row in Cache.query(module, "SELECT key FROM cache")}
+            with Cache.get_lock(module):
+                stored_keys = Cache._stored_keys.setdefault(module, stored_keys)
+        return stored_keys
 
     @staticmethod
     def clear_all() -> None:
         """Clear cache data and delete files"""
-        Cache._data = {}
-        modules_names = [module for module in Cache._modules_timestamp]
+        modules_names = set(Cache._modules_timestamp) | set(Cache._data)
         for module in modules_names:
-            del(Cache._modules_timestamp[module])
-            if module in Cache._data:
-                del (Cache._data[module])
+            with Cache.get_lock(module, 'store'), Cache.get_lock(module):
+                Cache._modules_timestamp.pop(module, None)
+                Cache._data.pop(module, None)
+                Cache._sizes.pop(module, None)
+                Cache._stats.pop(module, None)
+                Cache._pending.pop(module, None)
+                Cache._stored_keys.pop(module, None)
+
+                if os.path.isfile(Cache.get_cache_file(module)):
+                    os.remove(Cache.get_cache_file(module))
 
-            if os.path.isfile(Cache.get_cache_file(module)):
-                os.remove(Cache.get_cache_file(module))
+    @staticmethod
+    def unload(module: str) -> None:
+        """Drops the values of a module from the memory, writing the pending ones (they're loaded again when read)"""
+        Cache.sync(module, force=True)
+        with Cache.get_lock(module):
+            Cache._data.pop(module, None)
+            Cache._sizes.pop(module, None)
+            module_stats = Cache.get_module_stats(module)
+            module_stats['size'] = module_stats['bytes'] = 0
 
     @staticmethod
     def get_cache_file(module: str) -> str:
         """Gets the default cache data file path"""
         filepath = os.path.join(os.environ['DATA_DIR'], 'cache')
         Path(filepath).mkdir(parents=True, exist_ok=True)
-        return os.path.join(filepath, '{}.json'.format(module))
+        return os.path.join(filepath, '{}.sqlite3'.format(module))
+
+    @staticmethod
+    def connect(module: str) -> sqlite3.Connection:
+        """Opens a connection to the store of a given module, creating it if needed"""
+        connection = sqlite3.connect(Cache.get_cache_file(module), timeout=Cache.STORE_TIMEOUT_SECONDS)
+        connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return connection
+
+    @staticmethod
+    def query(module: str, statement: str, parameters=()) -> List:
+        """Runs a query on the store of a given module (if there's one), returning its rows"""
+        if Cache.is_disabled() or not os.path.isfile(Cache.get_cache_file(module)):
+            return []
+
+        connection = Cache.connect(module)
+        try:
+            return connection.execute(statement, parameters).fetchall()
+        finally:
+            connection.close()
 
     @staticmethod
     def expired(module: str) -> bool:
@@ -51,49 +203,130 @@ class Cache:
         return Cache._modules_timestamp[module] + Cache.DISK_SYNC_SECONDS < time.time()
 
     @staticmethod
-    def sync(module: str) -> None:
-        """Sync current cache data with the file (auto-generated) if expired"""
+    def sync(module: str, force: bool = False) -> None:
+        """Writes the values not stored yet of a module into its store, if expired (unless forced)"""
         # just sync after expiration
-        if not Cache.expired(module):
+        if not force and not Cache.expired(module):
             return
 
-        filename = Cache.get_cache_file(module)
-        with open(filename, 'w') as dump_file:
-            json.dump(Cache._data[module], dump_file, indent=4, sort_keys=True)
+        # the store lock keeps the values written in the order they were set, while the writes go on
+        with Cache.get_lock(module, 'store'):
+            with Cache.get_lock(module):
+                if not force and not Cache.expired(module):
+                    return
+                pending = Cache._pending.pop(module, {})
+                Cache._modules_timestamp[module] = time.time()
 
-        Cache._modules_timestamp[module] = time.time()
+            if not len(pending):
+                return
 
-    @staticmethod
-    def load_from_file(module: str) -> Dict:
-        """Save current cache instance from a file (auto-generated)"""
-        if Cache.is_disabled():
-            return {}
+            connection = Cache.connect(module)
+            try:
+                with connection:
+                    connection.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", [
+                        (key, json.dumps(value, default=Cache.thaw)) for key, value in pending.items()
+                    ])
+            finally:
+                connection.close()
+
+            stored_keys = Cache.get_stored_keys(module)
+            with Cache.get_lock(module):
+                stored_keys.update(pending)
 
-        filename = Cache.get_cache_file(module)
-        if not os.path.isfile(filename):
-            return {}
+    @staticmethod
+    def sync_all() -> None:
+        """Writes the values not stored yet of every module into their stores"""
+        for module in list(Cache._pending):
+            Cache.sync(module, force=True)
 
-        with open(filename, 'r') as dump_file:
-            return json.load(dump_file)
+    @staticmethod
+    def load_from_file(module: str) -> Dict:
+        """Loads every value stored for a given module (as they were saved, not frozen)"""
+        return {key: json.loads(value) for key, value in Cache.query(module, "SELECT key, value FROM cache")}
 
     @staticmethod
     def get_from_key(module: str, key: str) -> Any:
-        """Gets the value for a given key from the cache. None if not exists."""
+        """Gets the (frozen) value for a given key from the cache. None if not exists."""
         if Cache.is_disabled():
             return None
-        if module not in Cache._data:
-            Cache._data[module] = Cache.load_from_file(module)
-        return copy.deepcopy(Cache._data[module][key]) if key in Cache._data[module] else None
+
+        module_stats = Cache.get_module_stats(module)
+        module_data = Cache._data.get(module, {})
+        value = module_data.get(key)
+        if value is not None:
+            module_stats['hits'] += 1
+            try:
+                module_data.move_to_end(key)
+            except KeyError:
+                pass  # evicted meanwhile by another thread
+            return value
+
+        # not read yet (or evicted from the memory): it's loaded from the values not written yet, or from the store
+        value = Cache._pending.get(module, {}).get(key)
+        if value is None and key in Cache.get_stored_keys(module):
+            rows = Cache.query(module, "SELECT value FROM cache WHERE key = ?", (key,))
+            value = Cache.freeze(json.loads(rows[0][0])) if len(rows) else None
+
+        if value is None:
+            module_stats['misses'] += 1
+            return None
+
+        module_stats['hits'] += 1
+        module_stats['loads'] += 1
+        with Cache.get_lock(module):
+            return Cache.put(module, key, value, replace=False)
 
     @staticmethod
-    def save_to_key(module: str, key: str, value: Any) -> None:
-        """Sets the value for a given key into the cache"""
-        if Cache.is_disabled():
-            return
+    def put(module: str, key: str, value: Any, replace: bool = True) -> Any:
+        """
+        Keeps a frozen value in the memory (unless there's one already and it isn't replaced), evicting the least
+        recently used ones beyond the module limits, and returns the value kept. The module lock must be held.
+        """
+        module_data = Cache._data.setdefault(module, OrderedDict())
+        module_sizes = Cache._sizes.setdefault(module, {})
+        module_stats = Cache.get_module_stats(module)
+        if key in module_data:
+            if not replace:
+                return module_data[key]
+            module_stats['bytes'] -= module_sizes[key]
+
+        module_data[key] = value
+        module_data.move_to_end(key)
+        module_sizes[key] = Cache.get_size(value)
+        module_stats['bytes'] += module_sizes[key]
+        Cache.evict(module)
+        return value
+
+    @staticmethod
+    def evict(module: str) -> None:
+        """Evicts the least recently used values of a module beyond its limits. The module lock must be held."""
+        max_entries, max_bytes = Cache._limits.get(module, (Cache.MAX_ENTRIES, Cache.MAX_BYTES))
+        module_data = Cache._data.get(module, OrderedDict())
+        module_sizes = Cache._sizes.get(module, {})
+        module_stats = Cache.get_module_stats(module)
+
+        # the most recently used value is always kept
+        while len(module_data) > 1 and (
+            (max_entries is not None and len(module_data) > max_entries) or
+            (max_bytes is not None and module_stats['bytes'] > max_bytes)
+        ):
+            key, _ = module_data.popitem(last=False)
+            module_stats['bytes'] -= module_sizes.pop(key)
+            module_stats['evictions'] += 1
+        module_stats['size'] = len(module_data)
 
-        # if there's no data for the module, create and empty dict
-        if module not in Cache._data:
-            Cache._data[module] = Cache.load_from_file(module)
+    @staticmethod
+    def save_to_key(module: str, key: str, value: Any) -> Any:
+        """Sets the value for a given key into the cache, returning it frozen (as it's returned by get_from_key)"""
+        frozen_value = Cache.freeze(value)
+        if Cache.is_disabled():
+            return frozen_value
 
-        Cache._data[module][key] = value
+        with Cache.get_lock(module):
+            Cache.put(module, key, frozen_value)
+            Cache._pending.setdefault(module, {})[key] = frozen_value
         Cache.sync(module)
+        return frozen_value
+
+
+atexit.register(Cache.sync_all)
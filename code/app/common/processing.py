@@ -0,0 +1,13 @@
+from concurrent.futures import process
+
+
+class ProcessingExecutor:
+
+    def __init__(self, function, max_process_workers=8):
+        self.function = function
+        self.max_process_workers = max_process_workers
+
+    def run(self, arguments_set):
+        total_executors = max(1, min(self.max_process_workers, len(arguments_set)))
+        with process.ProcessPoolExecutor(max_workers=total_executors) as executor:
+            return list(executor.map(self.function, arguments_set))
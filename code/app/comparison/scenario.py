@@ -34,8 +34,6 @@ class Scenario:
         self.options = {}
         self.set_options(options)
 
-        Cache.clear_all()
-
         if route is None:
             route = self.ROUTE
         self.route = route
@@ -122,15 +120,21 @@ class Scenario:
         controllers = ([controller.ABBREV for controller in self.controllers])
         y_pos = np.arange(len(controllers))
         failed_simulations = [
-            controller.iterations_counter - controller.successful_iterations_counter
+            controller.iterations_counter - controller.successful_iterations_counter -
+            controller.pruned_iterations_counter
             for controller in self.controllers
         ]
         successful_simulations = [controller.successful_iterations_counter for controller in self.controllers]
+        pruned_simulations = [controller.pruned_iterations_counter for controller in self.controllers]
 
         ax.barh(y_pos, failed_simulations, align='center', height=.66, color='r')
         ax.barh(y_pos, successful_simulations, align='center', height=.66, left=failed_simulations, color='g',label='run time')
+        ax.barh(
+            y_pos, pruned_simulations, align='center', height=.66,
+            left=np.add(failed_simulations, successful_simulations), color='grey'
+        )
 
-        ax.legend(['Failed Simulations', 'Successful Simulations'])
+        ax.legend(['Failed Simulations', 'Successful Simulations', 'Pruned Simulations'])
 
         ax.set_yticks(y_pos)
         ax.set_yticklabels(controllers)
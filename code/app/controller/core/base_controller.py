@@ -1,13 +1,23 @@
 import copy
 import gc
 import multiprocessing
+import random
 import time
 
-from typing import List
+from typing import Dict, List
 
+from app.common.processing import ProcessingExecutor
 from app.common.threading import ThreadingExecutor
-from app.controller.core.worker import run_solution
+from app.controller.core.evaluation_cache import EvaluationCache
+from app.controller.core.steady_state import SteadyStateEvaluator
+from app.controller.core.transport import BrokerTransport, InProcessTransport
+from app.controller.core.worker import run_solution, evaluate_solution
+from app.controller.core.worker_pool import WarmWorkerPool
+from app.controller.exception.error import InvalidConditionError
+from app.simulation.core.batch import SimulationBatch
+from app.simulation.core.cost_bound import CostBound
 from app.simulation.core.simulation import Simulation
+from app.common.cache import Cache
 from app.common.date import seconds_to_interval
 from app.common.logger import generate_logger, LoggerFolders
 
@@ -20,6 +30,10 @@ def free_up_memory():
 class BaseController:
     NAME = "Base Controller"
     ABBREV = "--"
+    EVALUATION_BACKENDS = ('thread', 'process', 'warm_process', 'in_process', 'broker', 'batch')
+    # backends exchanging only the compact inputs and outcomes of the solutions with their workers
+    TASK_BACKENDS = ('process', 'warm_process', 'in_process', 'broker')
+    EVALUATION_MODES = ('generational', 'steady_state')
 
     def __init__(self, route, trains: List = None, **options):
         self.logger = generate_logger(self.NAME, LoggerFolders.CONTROLLERS)
@@ -32,13 +46,21 @@ class BaseController:
         self.best_solution_cost = float('inf')
         self.best_solution_last_updated_step = 0
         self.best_solution_status = '---'
+        self.best_solution_has_completed = False
         self.iterations_counter = 0   # number of times a solution (simulation) was run
         self.successful_iterations_counter = 0  # number of times a solution was run and was successful
+        self.pruned_iterations_counter = 0  # number of times a solution was run and was pruned (see CostBound)
         self.stop_reason = ""
 
         self.best_cost_per_step = []
 
         self.route = route
+        # every random choice of the controller (and the seeds of its solutions) is taken from its own generator
+        seed = self.options['seed'] if self.options['seed'] is not None else random.getrandbits(32)
+        self.random = random.Random(seed)
+        self.evaluation_cache = EvaluationCache(self.options['evaluation_cache_size'])
+        # best cost known so far, shared with the solutions being run so the dominated ones stop early
+        self.cost_bound = CostBound() if self.options['prune_solutions'] else None
         self.current_step = 0
         self.runtime = 0
         self.trains = trains
@@ -51,44 +73,203 @@ class BaseController:
             'solutions_size': 20,
             'simulation_options': {},
             'max_thread_workers': multiprocessing.cpu_count() * 2,
+            'max_process_workers': multiprocessing.cpu_count(),
             'max_iterations': 50,
             'max_consecutive_steps_with_same_best': 3,
+            # how the unsolved solutions are run: 'thread' (thread pool), 'process' (process pool, only the compact
+            # inputs and outcomes are exchanged with the workers), 'warm_process' (shared pool of long-lived workers,
+            # which keep the built routes), 'in_process' (one by one in the controller process, as the workers do),
+            # 'broker' (remote workers connected to a broker, see BrokerTransport) or 'batch' (lockstep SimulationBatch)
+            'evaluation_backend': 'thread',
+            # address the broker listens on for its workers: a TCP (host, port) or "host:port" or a Unix socket path
+            'broker_address': None,
+            # key authenticating the workers connected to the broker (required by the 'broker' backend)
+            'broker_authkey': None,
+            # maximum number of solutions sent at once to each worker of the broker
+            'broker_batch_size': 1,
+            # how the solutions are evaluated: 'generational' (a whole generation at once, then its selection, etc.) or
+            # 'steady_state' (each worker runs a new solution as soon as it finishes one, and the population is updated
+            # as each result arrives), which isn't available for the 'batch' backend
+            'evaluation_mode': 'generational',
+            # maximum number of evaluations memoized (0 disables it), by any backend (only the outcomes of the
+            # evaluations are kept, so the frames of the memoized solutions are replayed from their seeds when needed)
+            'evaluation_cache_size': 10000,
+            # whether new solutions derived from an already run one (e.g. GA offspring) resume from its latest
+            # checkpoint sharing their actions prefix, instead of being run from the beginning (local backends only)
+            'fork_solutions': False,
+            # seed of the controller random generator (drawn from the global one when not given)
+            'seed': None,
+            # whether the frames of every solution but the best one are dropped once it's run (they're regenerated
+            # from its seed when needed)
+            'drop_solutions_results': False,
+            # whether the solutions being run stop as soon as their cost passes the best known one (as they may no
+            # longer improve it), which is updated as soon as any solution completes every train
+            'prune_solutions': False,
         }
 
     def get_simulation_options(self):
         defaults = copy.deepcopy(Simulation.DEFAULT_OPTIONS)
         defaults.update(self.options['simulation_options'])
+        if self.options['fork_solutions']:
+            defaults['checkpoints'] = True
         return defaults
 
-    def create_solution(self, trains_actions=None):
-        """Creates a solution with the computed trains actions"""
+    def create_solution(self, trains_actions=None, parent: Simulation = None):
+        """
+        Creates a solution with the computed trains actions. When forking solutions is enabled and a parent solution
+        (from which the actions were derived) is given, it's forked from its latest checkpoint matching the actions.
+        """
+        simulation_options = self.get_simulation_options()
+
+        checkpoint = None
+        if (
+            self.options['fork_solutions'] and parent is not None and trains_actions is not None and
+            parent.options == dict(simulation_options, controller_name=parent.options['controller_name'])
+        ):
+            checkpoint = parent.find_checkpoint(trains_actions)
+
+        if checkpoint is not None:
+            solution = parent.fork(checkpoint, trains_actions, seed=self.random.getrandbits(32))
+            solution.options['controller_name'] = self.NAME
+            self.solutions.append(solution)
+            self.logger.debug("Forked solution {} from step {} of {}".format(
+                solution.uuid, checkpoint.step, parent.uuid
+            ))
+            return solution
+
         solution = Simulation(
             route=self.route,
             trains_queue=copy.deepcopy(self.trains),
             trains_actions=trains_actions,
-            **self.get_simulation_options()
+            seed=self.random.getrandbits(32),
+            cost_bound=self.cost_bound,
+            **simulation_options
         )
         solution.options['controller_name'] = self.NAME
         self.solutions.append(solution)
+        return solution
 
     def run(self):
+        evaluation_mode = self.options['evaluation_mode']
+        if evaluation_mode not in self.EVALUATION_MODES:
+            raise InvalidConditionError("Unknown evaluation mode '{}' (expected one of: {})".format(
+                evaluation_mode, ", ".join(self.EVALUATION_MODES)
+            ))
+
         self.running = True
 
         start_time = time.time()
-        while self.running:
-            self.take_step_actions()
+        if evaluation_mode == 'steady_state':
+            self.run_steady_state()
+        else:
+            while self.running:
+                self.take_step_actions()
         self.runtime = time.time() - start_time
+        self.logger.info("Ran {} solutions on {:.2f} seconds ({:.2f} simulations per second)".format(
+            self.iterations_counter, self.runtime, self.get_throughput()
+        ))
 
-    def update_best_solution(self):
+    def run_steady_state(self):
+        """
+        Steady-state mode: keeps every worker busy running solutions (the ones already created, then the ones given by
+        get_next_solution), reading each solution into the population (see read_finished_solution) as soon as it
+        finishes. Each time the population size is reached by the finished solutions, it counts as a controller step.
+        """
+        max_iterations = self.options['max_iterations']
+        queued_solutions = [solution for solution in self.solutions if not solution.has_finished]
+        evaluation_backend = self.options['evaluation_backend']
+        evaluator = SteadyStateEvaluator(
+            evaluation_backend, self.get_total_workers(), self.evaluation_cache, self.cost_bound,
+            self.get_transport() if evaluation_backend in self.TASK_BACKENDS else None
+        )
+
+        try:
+            while self.running:
+                while evaluator.has_idle_worker() and (
+                    max_iterations <= 0 or self.iterations_counter + evaluator.count_pending() < max_iterations
+                ):
+                    solution = queued_solutions.pop(0) if len(queued_solutions) else self.get_next_solution()
+                    if solution is None:
+                        break
+                    evaluator.submit(solution)
+
+                if not evaluator.count_pending():
+                    self.stop("No solution left to be run")
+                    break
+
+                for solution in evaluator.receive():
+                    self.count_finished_solutions([solution])
+                    self.update_best_solution([solution])
+                    self.read_finished_solution(solution)
+
+                    if self.iterations_counter % self.options['solutions_size'] == 0:
+                        self.best_cost_per_step.append(self.best_solution_cost)
+                        self.current_step += 1
+                self.check_stop_conditions()
+        finally:
+            evaluator.close()
+
+    def get_next_solution(self):
+        """Steady-state mode: creates the next solution to be run (by default, a random one)"""
+        return self.create_solution()
+
+    def read_finished_solution(self, solution: Simulation):
+        """
+        Steady-state mode: updates the population with a solution which has just finished. By default, the worst
+        finished solution is dropped when there are more of them than the population size.
+        """
+        finished_solutions = [solution for solution in self.solutions if solution.has_finished]
+        if len(finished_solutions) > self.options['solutions_size']:
+            self.solutions.remove(max(finished_solutions, key=lambda finished: finished.accumulated_cost))
+
+    def get_total_workers(self):
+        """Gets the maximum number of workers of the evaluation backend"""
+        is_task_backend = self.options['evaluation_backend'] in self.TASK_BACKENDS
+        return self.options['max_process_workers' if is_task_backend else 'max_thread_workers']
+
+    def get_transport(self):
+        """Gets the transport of the evaluation backend exchanging tasks with long-lived workers, if any"""
+        evaluation_backend = self.options['evaluation_backend']
+        if evaluation_backend == 'warm_process':
+            return WarmWorkerPool.get_shared(self.options['max_process_workers'])
+        elif evaluation_backend == 'in_process':
+            return InProcessTransport.get_shared()
+        elif evaluation_backend == 'broker':
+            return BrokerTransport.get_shared(
+                self.options['broker_address'], self.options['broker_authkey'], self.options['broker_batch_size']
+            )
+        return None
 
-        completed_solutions = [solution for solution in self.solutions if solution.has_completed_every_train]
-        best_solutions = self.solutions if len(completed_solutions) == 0 else completed_solutions
+    def get_throughput(self):
+        """Gets the number of solutions (simulations) run per second"""
+        return self.iterations_counter / self.runtime if self.runtime > 0 else 0.0
+
+    def update_best_solution(self, solutions: List[Simulation] = None):
+        """Updates the global best with the given solutions (by default, the current ones)"""
+        if solutions is None:
+            solutions = self.solutions
+
+        # the solutions not run yet (e.g. beyond the iterations limit) have no cost to be compared
+        finished_solutions = [solution for solution in solutions if solution.has_finished]
+        completed_solutions = [solution for solution in finished_solutions if solution.has_completed_every_train]
+        best_solutions = finished_solutions if len(completed_solutions) == 0 else completed_solutions
 
         for solution in best_solutions:
             solution_cost = solution.accumulated_cost
-            if solution_cost < self.best_solution_cost:
-                self.best_solution_results = solution.results
+            has_completed = solution.has_completed_every_train
+            if self.cost_bound is not None:
+                # the pruned solutions stop early (so their cost is lower), then a solution which completed every train
+                # always replaces a best one which didn't (whatever their costs)
+                is_better = (
+                    (has_completed, -solution_cost) > (self.best_solution_has_completed, -self.best_solution_cost)
+                )
+            else:
+                is_better = solution_cost < self.best_solution_cost
+
+            if is_better:
+                self.best_solution_results = solution.get_results()
                 self.best_solution_cost = solution_cost
+                self.best_solution_has_completed = has_completed
                 self.best_solution_last_updated_step = self.current_step
                 self.best_solution_status = solution.get_status_text()
 
@@ -102,7 +283,15 @@ class BaseController:
                     )
                 )
 
-        self.best_cost_per_step.append(self.best_solution_cost)
+        # only the cost of a solution which completed every train bounds the others
+        if self.cost_bound is not None and self.best_solution_has_completed:
+            self.cost_bound.publish(self.best_solution_cost)
+
+        if self.options['drop_solutions_results']:
+            for solution in solutions:
+                is_best_solution = solution.results is self.best_solution_results
+                if solution.has_finished and solution.has_results and not is_best_solution:
+                    solution.drop_results()
 
     def check_stop_conditions(self):
         if self.iterations_counter >= self.options['max_iterations']:
@@ -133,20 +322,38 @@ class BaseController:
             solutions_to_solve[:] = solutions_to_solve[0:(max_iterations - self.iterations_counter)]
         
         total_solutions_to_solve = len(solutions_to_solve)
-        total_executors = min(self.options['max_thread_workers'], total_solutions_to_solve)
+        evaluation_backend = self.options['evaluation_backend']
+        if evaluation_backend not in self.EVALUATION_BACKENDS:
+            raise InvalidConditionError("Unknown evaluation backend '{}' (expected one of: {})".format(
+                evaluation_backend, ", ".join(self.EVALUATION_BACKENDS)
+            ))
 
-        self.logger.info("Starting {} unsolved solutions @ step {} (max_executors: {}, iterations_counter: {})".format(
-            len(solutions_to_solve), self.current_step, total_executors, self.iterations_counter
-        ))
+        # the memoized outcomes are read right away, so only the remaining solutions are evaluated
+        solutions_to_evaluate = self.read_memoized_solutions(solutions_to_solve)
+        total_solutions_to_evaluate = len(solutions_to_evaluate)
 
-        executor = ThreadingExecutor(run_solution, total_executors)
-        executor.run(solutions_to_solve)
+        is_task_backend = evaluation_backend in self.TASK_BACKENDS
+        total_executors = min(self.get_total_workers(), total_solutions_to_evaluate)
 
-        self.iterations_counter += total_solutions_to_solve
-        self.successful_iterations_counter += len(
-            [solution for solution in solutions_to_solve if solution.has_completed_every_train]
+        self.logger.info(
+            "Starting {} unsolved solutions @ step {} (backend: {}, max_executors: {}, iterations_counter: {})".format(
+                len(solutions_to_solve), self.current_step, evaluation_backend, total_executors,
+                self.iterations_counter
+            )
         )
 
+        outcomes = None
+        if total_solutions_to_evaluate and evaluation_backend == 'batch':
+            SimulationBatch(solutions_to_evaluate).run()
+        elif total_solutions_to_evaluate and is_task_backend:
+            outcomes = self.evaluate_solutions_in_processes(solutions_to_evaluate, total_executors)
+        elif total_solutions_to_evaluate:
+            executor = ThreadingExecutor(run_solution, total_executors)
+            executor.run(solutions_to_evaluate)
+
+        self.memoize_solutions(solutions_to_evaluate, outcomes)
+        self.count_finished_solutions(solutions_to_solve)
+
         self.logger.info(
             "Finished {} solutions @ step {} on {:.2f} seconds".format(
                 total_solutions_to_solve,
@@ -155,9 +362,63 @@ class BaseController:
             )
         )
 
+    def count_finished_solutions(self, solutions: List[Simulation]):
+        """Updates the iterations counters with the given (just finished) solutions"""
+        self.iterations_counter += len(solutions)
+        self.successful_iterations_counter += len(
+            [solution for solution in solutions if solution.has_completed_every_train]
+        )
+        self.pruned_iterations_counter += len(
+            [solution for solution in solutions if solution.has_been_pruned]
+        )
+
+    def read_memoized_solutions(self, solutions: List[Simulation]) -> List[Simulation]:
+        """Reads the memoized outcomes of the given solutions, returning the ones which still must be evaluated"""
+        if self.evaluation_cache.max_size <= 0:
+            return solutions
+
+        solutions_to_evaluate = []
+        for solution in solutions:
+            outcome = self.evaluation_cache.get_outcome(solution.get_evaluation_task())
+            if outcome is not None:
+                solution.read_outcome(outcome)
+            else:
+                solutions_to_evaluate.append(solution)
+        return solutions_to_evaluate
+
+    def memoize_solutions(self, solutions: List[Simulation], outcomes: List[Dict] = None):
+        """
+        Memoizes the outcomes of the given (just evaluated) solutions: the ones sent back by the workers, if given, or
+        else the ones of the solutions run in this process
+        """
+        if self.evaluation_cache.max_size <= 0:
+            return
+
+        if outcomes is None:
+            outcomes = [solution.get_outcome() for solution in solutions]
+        for solution, outcome in zip(solutions, outcomes):
+            self.evaluation_cache.put_outcome(solution.get_evaluation_task(), outcome)
+
+    def evaluate_solutions_in_processes(self, solutions: List[Simulation], total_executors) -> List[Dict]:
+        """
+        Evaluates the given solutions in a process pool or through the transport of the backend (e.g. the shared pool
+        of warm workers). Each worker receives only the compact inputs of a solution (route, trains, actions, options
+        and its random seed) and sends back its compact outcome, which is read by the solution and returned.
+        """
+        tasks = [dict(solution.get_evaluation_task(), cost_bound=self.cost_bound) for solution in solutions]
+        if self.options['evaluation_backend'] == 'process':
+            outcomes = ProcessingExecutor(evaluate_solution, total_executors).run(tasks)
+        else:
+            outcomes = self.get_transport().evaluate(tasks)
+
+        for solution, outcome in zip(solutions, outcomes):
+            solution.read_outcome(outcome)
+        return outcomes
+
     def take_step_actions(self):
         self.run_unsolved_solutions()
         self.update_best_solution()
+        self.best_cost_per_step.append(self.best_solution_cost)
         self.check_stop_conditions()
 
         self.current_step += 1
@@ -172,10 +433,24 @@ class BaseController:
             "\tCONTROLLER - max_consecutive_steps_with_same_best: {}".format(
                 self.options['max_consecutive_steps_with_same_best']
             ),
+            "\tCONTROLLER - max_process_workers: {}".format(self.options['max_process_workers']),
+            "\tCONTROLLER - evaluation_backend: {}".format(self.options['evaluation_backend']),
+            "\tCONTROLLER - evaluation_mode: {}".format(self.options['evaluation_mode']),
+            "\tCONTROLLER - evaluation_cache_size: {}".format(self.options['evaluation_cache_size']),
+            "\tCONTROLLER - seed: {}".format(self.options['seed']),
+            "\tCONTROLLER - prune_solutions: {}".format(self.options['prune_solutions']),
             "\n".join(["\tSIMULATION - {}: {}".format(k, v) for k, v in self.options['simulation_options'].items()]),
             "\nTotal steps: {}".format(self.current_step),
             "Total iterations: {}".format(self.iterations_counter),
             "Total successful iterations: {}".format(self.successful_iterations_counter),
+            "Total pruned iterations: {}".format(self.pruned_iterations_counter),
+            "Throughput: {:.2f} simulations per second".format(self.get_throughput()),
+            "Evaluation cache: {hits} hits, {misses} misses ({hit_ratio:.1%}), {size} stored, {evictions} evicted".format(
+                **self.evaluation_cache.stats()
+            ),
+            # the routes cache is shared by the whole process (the workers of the process backends have their own)
+            "Routes cache: {hits} hits ({loads} loaded), {misses} misses ({hit_ratio:.1%}), {size} kept "
+            "({bytes} bytes), {evictions} evicted".format(**Cache.stats()),
             "Stop reason: {}".format(self.stop_reason),
             "Best solution UUID: {}".format(
                 self.best_solution_results.simulation_uuid if self.best_solution_results is not None else '---'
@@ -185,7 +460,7 @@ class BaseController:
             ),
             "Best solution status: {}".format(self.best_solution_status),
             "Best solution total steps: {}".format(
-                len(self.best_solution_results.frames) if self.best_solution_results is not None else '---'
+                self.best_solution_results.total_frames if self.best_solution_results is not None else '---'
             ),
             "Best solution calculated real time elapsed: {}".format(
                 self.best_solution_results.calculated_time_elapsed if self.best_solution_results is not None else '---'
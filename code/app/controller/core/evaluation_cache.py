@@ -0,0 +1,132 @@
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict
+
+from app.simulation.action.all import ALL_POSSIBLE_ACTIONS
+
+
+class EvaluationCache:
+    """
+    Bounded (least recently used eviction) memoization of the solutions evaluations. The outcomes are stored by a
+    canonical hash of everything that determines them: the route topology, the trains set, the simulation options, the
+    (normalized) actions of each train and the random seed.
+    """
+    # options that don't change the outcome of a simulation
+    IGNORED_OPTIONS = ('controller_name', 'logger_name', 'checkpoints', 'checkpoints_min_interval')
+
+    def __init__(self, max_size=10000):
+        """Class constructor"""
+        self.max_size = max_size
+        self.outcomes = OrderedDict()
+        self.routes_signatures = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def get_route_signature(self, route_class) -> str:
+        """Gets the hash of the topology (sections, lengths and connections) of a given route class"""
+        if route_class not in self.routes_signatures:
+            route = route_class()
+            topology = [
+                {
+                    'name': section.name,
+                    'length': section.length,
+                    'flow': section.flow,
+                    'max_velocity': section.max_velocity,
+                    'interdicted': section.interdicted,
+                    'connections': [
+                        (connection.destiny_section_name, connection.connection_origin)
+                        for connection in section.connections
+                    ],
+                    'restrictions': [
+                        (restriction.start_km, restriction.end_km, restriction.max_velocity)
+                        for restriction in section.restrictions
+                    ],
+                }
+                for section in route.sections_mapper.sections
+            ]
+            self.routes_signatures[route_class] = self.hash(topology)
+        return self.routes_signatures[route_class]
+
+    @staticmethod
+    def hash(data) -> str:
+        """Hashes a given (JSON serializable) data"""
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def normalize_actions(trains_actions: Dict) -> Dict:
+        """Normalizes the trains actions (names or abbreviations) into the actions names, as `find_action` does"""
+        actions_names = {}
+        for action in ALL_POSSIBLE_ACTIONS:
+            actions_names[action.abbrev] = action.name
+        for action in ALL_POSSIBLE_ACTIONS:
+            actions_names[action.name] = action.name
+
+        return {
+            prefix: [actions_names.get(action, action) for action in actions]
+            for prefix, actions in (trains_actions or {}).items()
+        }
+
+    def get_genome_key(self, task) -> str:
+        """Gets the canonical key of a task (see Simulation.get_evaluation_task) without its random seed"""
+        options = {key: value for key, value in task['options'].items() if key not in self.IGNORED_OPTIONS}
+        return self.hash([
+            self.get_route_signature(task['route']),
+            task['trains_queue'],
+            options,
+            self.normalize_actions(task['trains_actions']),
+        ])
+
+    def get_keys(self, task):
+        """
+        Gets the canonical keys of a task (see Simulation.get_evaluation_task): the one used when its outcome doesn't
+        depend on the random seed (no action was randomly chosen, so the genome alone determines it) and the one
+        including the seed.
+        """
+        genome_key = self.get_genome_key(task)
+        return self.hash([genome_key, None]), self.hash([genome_key, task['seed']])
+
+    def get_outcome(self, task):
+        """Gets the stored outcome of a task (None if not stored), updating the hits/misses statistics"""
+        genome_key, seeded_key = self.get_keys(task)
+        for key in (genome_key, seeded_key):
+            if key in self.outcomes:
+                self.hits += 1
+                self.outcomes.move_to_end(key)
+                return copy.deepcopy(self.outcomes[key])
+
+        self.misses += 1
+        return None
+
+    def put_outcome(self, task, outcome) -> None:
+        """Stores the outcome of a task (by the genome alone, when it doesn't depend on the random seed)"""
+        genome_key, seeded_key = self.get_keys(task)
+        self.put(genome_key if outcome.get('random_actions_count') == 0 else seeded_key, outcome)
+
+    def put(self, key: str, outcome) -> None:
+        """Stores the outcome for a given key, evicting the least recently used ones when the cache is full"""
+        if self.max_size <= 0:
+            return
+
+        self.outcomes[key] = copy.deepcopy(outcome)
+        self.outcomes.move_to_end(key)
+        while len(self.outcomes) > self.max_size:
+            self.outcomes.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Returns the cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.outcomes),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
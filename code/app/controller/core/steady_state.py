@@ -0,0 +1,114 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import List
+
+from app.controller.core.evaluation_cache import EvaluationCache
+from app.controller.core.transport import WorkerTransport
+from app.controller.core.worker import run_solution, evaluate_solution
+from app.controller.exception.error import InvalidConditionError
+from app.simulation.core.cost_bound import CostBound
+from app.simulation.core.simulation import Simulation
+
+
+class SteadyStateEvaluator:
+    """
+    Evaluates the solutions of a controller in the steady-state mode: each solution is handed to an idle worker as soon
+    as there's one, and the finished solutions are received one by one, so no worker waits for the slowest solution of
+    a generation. The process backends exchange only the compact inputs and outcomes of the solutions with the workers,
+    as in the generational mode, and the other task backends send them through their transport (e.g. the shared pool of
+    warm workers). The outcomes of every backend are memoized in the evaluation cache, if enabled.
+    """
+    BACKENDS = ('thread', 'process', 'warm_process', 'in_process', 'broker')
+
+    def __init__(
+        self,
+        backend: str,
+        total_workers: int,
+        evaluation_cache: EvaluationCache = None,
+        cost_bound: CostBound = None,
+        transport: WorkerTransport = None
+    ):
+        """Class constructor. Starts the workers of the given backend (unless it's given its transport)."""
+        if backend not in self.BACKENDS:
+            raise InvalidConditionError("The steady-state mode can't use the '{}' backend (expected one of: {})".format(
+                backend, ", ".join(self.BACKENDS)
+            ))
+
+        self.backend = backend
+        self.total_workers = max(1, total_workers)
+        self.evaluation_cache = evaluation_cache
+        self.cost_bound = cost_bound
+        self.pending = {}  # solutions (and their tasks) being evaluated, by their future
+        self.finished: List[Simulation] = []  # solutions finished but not received yet (e.g. memoized ones)
+
+        self.executor = None
+        self.pool = None
+        if backend == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.total_workers)
+        elif backend == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=self.total_workers)
+        elif transport is None:
+            raise InvalidConditionError("The '{}' backend requires its transport".format(backend))
+        else:
+            self.pool = transport
+
+    def count_pending(self) -> int:
+        """Counts the submitted solutions which weren't received yet"""
+        total_pending = len(self.pending) if self.pool is None else self.pool.count_pending()
+        return total_pending + len(self.finished)
+
+    def has_idle_worker(self) -> bool:
+        """Determines if any worker isn't evaluating a solution"""
+        if self.pool is not None:
+            return self.pool.count_idle_workers() > 0
+        return len(self.pending) < self.total_workers
+
+    def submit(self, solution: Simulation):
+        """Submits a solution to be evaluated by an idle worker"""
+        task = dict(solution.get_evaluation_task(), cost_bound=self.cost_bound)
+        outcome = self.evaluation_cache.get_outcome(task) if self.use_cache() else None
+        if outcome is not None:
+            solution.read_outcome(outcome)
+            self.finished.append(solution)
+        elif self.backend == 'thread':
+            self.pending[self.executor.submit(run_solution, solution)] = (solution, task)
+        elif self.pool is not None:
+            self.pool.submit((solution, task), task)
+        else:
+            self.pending[self.executor.submit(evaluate_solution, task)] = (solution, task)
+
+    def receive(self) -> List[Simulation]:
+        """Waits for any of the submitted solutions to finish, returning every finished one"""
+        finished, self.finished = self.finished, []
+        if len(finished):
+            return finished
+
+        if self.pool is not None:
+            results = self.pool.receive()
+        else:
+            done, _ = wait(list(self.pending), return_when=FIRST_COMPLETED)
+            results = [(self.pending.pop(future), future.result()) for future in done]
+
+        for (solution, task), outcome in results:
+            # the solutions of the thread backend are run in this process, so they already have their outcome
+            if self.backend == 'thread':
+                outcome = solution.get_outcome()
+            else:
+                solution.read_outcome(outcome)
+            if self.use_cache():
+                self.evaluation_cache.put_outcome(task, outcome)
+            finished.append(solution)
+        return finished
+
+    def use_cache(self) -> bool:
+        """Determines if the evaluations are memoized"""
+        return self.evaluation_cache is not None and self.evaluation_cache.max_size > 0
+
+    def close(self):
+        """Waits for the solutions still being evaluated (discarding them) and stops the workers"""
+        if self.pool is not None:
+            while self.pool.count_pending():
+                self.pool.receive()
+        else:
+            self.executor.shutdown(wait=True)
+        self.pending.clear()
+        del self.finished[:]
@@ -0,0 +1,281 @@
+import atexit
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, wait
+from typing import List, Tuple
+
+from app.controller.core.worker import evaluate_request, get_request, parse_address
+from app.controller.exception.error import InvalidConditionError
+
+
+class WorkerTransport(ABC):
+    """
+    Interface of the transports sending the solutions to be evaluated (as compact tasks, see
+    Simulation.get_evaluation_task) to the workers, and receiving back their outcomes. The tasks are submitted along
+    with a key, which is received along with the outcome of each of them.
+    """
+
+    def evaluate(self, tasks: List) -> List:
+        """Evaluates the given tasks, returning their outcomes in the same order"""
+        if self.count_pending():
+            raise InvalidConditionError("There are {} tasks pending to be received from the workers".format(
+                self.count_pending()
+            ))
+
+        for index, task in enumerate(tasks):
+            self.submit(index, task)
+
+        outcomes = [None] * len(tasks)
+        total_received = 0
+        while total_received < len(tasks):
+            for index, outcome in self.receive():
+                outcomes[index] = outcome
+                total_received += 1
+        return outcomes
+
+    @abstractmethod
+    def count_idle_workers(self) -> int:
+        """Counts how many more tasks may be submitted before every worker is busy"""
+
+    @abstractmethod
+    def count_pending(self) -> int:
+        """Counts the submitted tasks whose outcomes weren't received yet"""
+
+    @abstractmethod
+    def submit(self, key, task):
+        """Submits a single task, whose outcome is received (along with the given key) by `receive`"""
+
+    @abstractmethod
+    def receive(self, timeout: float = None) -> List[Tuple]:
+        """Waits for any of the submitted tasks to be evaluated, returning the (key, outcome) of every finished one"""
+
+    def close(self):
+        """Stops the workers"""
+        pass
+
+
+class InProcessTransport(WorkerTransport):
+    """
+    Transport evaluating the tasks one by one in the current process (keeping the routes it has already built), which
+    behaves as a single worker. Mostly useful as a reference for the other transports and to debug the evaluations.
+    """
+    shared_transport = None
+
+    def __init__(self):
+        """Class constructor"""
+        self.routes = {}
+        self.logger_name = "WORKER_{}".format(os.getpid())
+        self.queue = deque()
+
+    @classmethod
+    def get_shared(cls):
+        """Returns the transport shared by every controller of the process (created when needed)"""
+        if cls.shared_transport is None:
+            cls.shared_transport = InProcessTransport()
+        return cls.shared_transport
+
+    def count_idle_workers(self) -> int:
+        return 0 if len(self.queue) else 1
+
+    def count_pending(self) -> int:
+        return len(self.queue)
+
+    def submit(self, key, task):
+        self.queue.append((key, task))
+
+    def receive(self, timeout: float = None) -> List[Tuple]:
+        if not len(self.queue):
+            return []
+
+        key, task = self.queue.popleft()
+        return [(key, evaluate_request(get_request(task), self.routes, self.logger_name)[0])]
+
+    def close(self):
+        self.queue.clear()
+
+
+class BrokerTransport(WorkerTransport):
+    """
+    Transport acting as a broker for workers connected through a socket (TCP or Unix), which may run on other machines
+    (see worker.run_remote_worker). The workers may join at any time, and may drop out: the tasks they were evaluating
+    are queued again, to be sent to the next idle worker. Every connection is authenticated with the given key.
+
+    The queued tasks are sent in batches (of up to `batch_size` tasks sharing their route, trains queue and options),
+    as the requests of the warm workers. The cost bound isn't sent, as the workers can't access the shared one.
+    """
+    POLL_INTERVAL = 0.1  # seconds between the checks for new workers while waiting for the outcomes
+
+    shared_transport = None
+
+    def __init__(self, address, authkey, batch_size: int = 1):
+        """
+        Class constructor. Starts listening on a TCP (host, port) or Unix socket (path) address, which may also be
+        given as a string ("host:port" or a path).
+        """
+        if not authkey:
+            raise InvalidConditionError("The broker requires an authentication key for its workers")
+
+        self.requested_address = address
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self.batch_size = max(1, batch_size)
+        self.listener = Listener(parse_address(address) if isinstance(address, str) else address, authkey=self.authkey)
+        self.address = self.listener.address
+
+        self.lock = threading.Lock()
+        self.closed = False
+        self.joining = []  # connections of the workers accepted but not used yet
+        self.idle = []
+        self.busy = {}  # batch of (key, task) being evaluated, by the connection of its worker
+        self.queue = deque()  # (key, task) waiting for an idle worker
+
+        self.accept_thread = threading.Thread(target=self.accept_workers, daemon=True)
+        self.accept_thread.start()
+
+    @classmethod
+    def get_shared(cls, address, authkey, batch_size: int = 1):
+        """Returns the broker shared by every controller of the process (created when needed)"""
+        shared_transport = cls.shared_transport
+        if shared_transport is None or (shared_transport.requested_address, shared_transport.authkey) != (
+            address, authkey.encode() if isinstance(authkey, str) else authkey
+        ):
+            if shared_transport is not None:
+                shared_transport.close()
+            cls.shared_transport = BrokerTransport(address, authkey, batch_size)
+        cls.shared_transport.batch_size = max(1, batch_size)
+        return cls.shared_transport
+
+    def accept_workers(self):
+        """Accepts the connections of the workers (run by its own thread until the broker is closed)"""
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue
+
+            with self.lock:
+                if self.closed:
+                    connection.close()
+                else:
+                    self.joining.append(connection)
+
+    def count_workers(self) -> int:
+        """Counts the workers connected to the broker"""
+        with self.lock:
+            return len(self.joining) + len(self.idle) + len(self.busy)
+
+    def count_idle_workers(self) -> int:
+        return max(self.count_workers(), 1) * self.batch_size - self.count_pending()
+
+    def count_pending(self) -> int:
+        return sum(len(batch) for batch in self.busy.values()) + len(self.queue)
+
+    def submit(self, key, task):
+        self.queue.append((key, task))
+        self.dispatch()
+
+    def dispatch(self):
+        """Sends the queued tasks to the idle workers (including the ones which have just joined)"""
+        with self.lock:
+            self.idle.extend(self.joining)
+            del self.joining[:]
+
+        while len(self.queue) and len(self.idle):
+            connection = self.idle.pop()
+            batch = [self.queue.popleft()]
+            task = batch[0][1]
+            while len(batch) < self.batch_size and len(self.queue) and self.is_same_group(task, self.queue[0][1]):
+                batch.append(self.queue.popleft())
+
+            try:
+                connection.send((
+                    task['route'], task['trains_queue'], task['options'], None,
+                    [(batch_task['trains_actions'], batch_task['seed']) for _, batch_task in batch]
+                ))
+            except OSError:
+                self.drop_worker(connection, batch)
+                continue
+            self.busy[connection] = batch
+
+    @staticmethod
+    def is_same_group(task, other_task) -> bool:
+        """Determines if two tasks share their route, trains queue and options (so they may be sent together)"""
+        return task['route'] == other_task['route'] and task['trains_queue'] == other_task['trains_queue'] and \
+            task['options'] == other_task['options']
+
+    def drop_worker(self, connection, batch: List):
+        """Discards a worker which has dropped out, queuing again (first) the tasks it was evaluating"""
+        self.queue.extendleft(reversed(batch))
+        connection.close()
+
+    def receive(self, timeout: float = None) -> List[Tuple]:
+        """
+        Waits for any of the submitted tasks to be evaluated, returning the (key, outcome) of every finished one. While
+        there's no connected worker, it waits for one to join (so the broker may be started before its workers).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.count_pending():
+            self.dispatch()
+            if len(self.busy):
+                ready = wait(list(self.busy), self.POLL_INTERVAL)
+            else:
+                ready = []
+                time.sleep(self.POLL_INTERVAL)
+
+            finished = []
+            for connection in ready:
+                batch = self.busy.pop(connection)
+                try:
+                    status, response = connection.recv()
+                except (EOFError, OSError):
+                    self.drop_worker(connection, batch)
+                    continue
+
+                self.idle.append(connection)
+                if status != 'ok':
+                    raise InvalidConditionError("Worker failed to evaluate solutions:\n{}".format(response))
+                finished.extend((key, outcome) for (key, _), outcome in zip(batch, response))
+
+            if len(finished):
+                return finished
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        return []
+
+    def close(self):
+        """Stops every connected worker and the listener"""
+        with self.lock:
+            self.closed = True
+            connections = self.joining + self.idle + list(self.busy)
+            del self.joining[:]
+            del self.idle[:]
+            self.busy.clear()
+            self.queue.clear()
+
+        for connection in connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except OSError:
+                pass
+
+        # a connection wakes up the accepting thread, so it sees the broker is closed
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        self.accept_thread.join(timeout=5)
+        self.listener.close()
+
+        if BrokerTransport.shared_transport is self:
+            BrokerTransport.shared_transport = None
+
+
+@atexit.register
+def close_shared_broker():
+    """Stops the workers connected to the shared broker when the main process exits"""
+    if BrokerTransport.shared_transport is not None:
+        BrokerTransport.shared_transport.close()
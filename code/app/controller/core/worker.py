@@ -1,5 +1,122 @@
+import argparse
+import os
+import time
+import traceback
+from multiprocessing.connection import Client
+
 from app.simulation.core.simulation import Simulation
 
 
 def run_solution(solution: Simulation):
     solution.run()
+
+
+def evaluate_solution(task):
+    """Evaluates a solution from its compact inputs (to be run in a worker process), returning its outcome"""
+    return Simulation.evaluate_task(task)
+
+
+def get_request(task):
+    """
+    Gets the request of a single task (see Simulation.get_evaluation_task) sent to the workers: a tuple of (route class,
+    trains queue, options, cost bound, genomes), being each genome a tuple of (trains actions, seed)
+    """
+    return (
+        task['route'], task['trains_queue'], task['options'], task.get('cost_bound'),
+        [(task['trains_actions'], task['seed'])]
+    )
+
+
+def evaluate_request(request, routes, logger_name):
+    """Evaluates a request (see get_request), building its route only if it isn't in the given routes yet"""
+    route_class, trains_queue, options, cost_bound, genomes = request
+    if route_class not in routes:
+        routes[route_class] = route_class()
+
+    worker_options = dict(options, logger_name=logger_name)
+    return [
+        Simulation.evaluate_task({
+            'route': route_class,
+            'trains_queue': trains_queue,
+            'trains_actions': trains_actions,
+            'options': worker_options,
+            'seed': seed,
+            'cost_bound': cost_bound,
+        }, routes[route_class])
+        for trains_actions, seed in genomes
+    ]
+
+
+def serve_requests(connection, routes, logger_name):
+    """Answers the requests of a connection with the list of outcomes (or an error), until a `None` request"""
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        try:
+            connection.send(('ok', evaluate_request(request, routes, logger_name)))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+
+def run_warm_worker(connection):
+    """
+    Main loop of a long-lived (warm) worker process. Each route is built only once and kept for the following
+    requests, as well as the logger. The requests (see get_request) are answered with the list of outcomes (or an
+    error). A `None` request stops the worker.
+    """
+    serve_requests(connection, {}, "WORKER_{}".format(os.getpid()))
+    connection.close()
+
+
+def run_remote_worker(address, authkey: bytes = None, retry_interval: float = 1.0):
+    """
+    Main loop of a remote worker, connected to a broker (see BrokerTransport) by its TCP (host, port) or Unix socket
+    (path) address. The requests are answered just like a warm worker does, connecting again (rejoining the broker)
+    whenever the connection is lost or refused, until the broker sends a `None` request.
+    """
+    routes = {}
+    logger_name = "WORKER_{}".format(os.getpid())
+
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+        except OSError:
+            time.sleep(retry_interval)
+            continue
+
+        try:
+            serve_requests(connection, routes, logger_name)
+            break
+        except (EOFError, OSError):
+            time.sleep(retry_interval)
+        finally:
+            connection.close()
+
+
+def parse_address(address: str):
+    """Parses a broker address, either a TCP one (host:port) or a Unix socket path"""
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def main():
+    """Runs a remote worker from the command line"""
+    parser = argparse.ArgumentParser(description="Worker evaluating the solutions sent by a controller broker")
+    parser.add_argument('address', help="address of the broker: host:port (TCP) or a Unix socket path")
+    parser.add_argument('--authkey', default=os.environ.get('BROKER_AUTHKEY'), help="broker authentication key")
+    parser.add_argument('--retry-interval', type=float, default=1.0, help="seconds between connection attempts")
+    arguments = parser.parse_args()
+
+    run_remote_worker(
+        parse_address(arguments.address),
+        arguments.authkey.encode() if arguments.authkey else None,
+        arguments.retry_interval
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import atexit
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import List, Tuple
+
+from app.controller.core.transport import WorkerTransport
+from app.controller.core.worker import get_request, run_warm_worker
+from app.controller.exception.error import InvalidConditionError
+
+
+class WarmWorkerPool(WorkerTransport):
+    """
+    Pool of long-lived worker processes used to evaluate solutions. Each worker keeps the routes it has already built
+    (so the startup cost is paid once per worker, not once per simulation), across generations and controllers.
+
+    The solutions are sent as compact requests: the parts shared by a group of solutions (route class, trains queue,
+    options and cost bound) are sent once for each worker, followed by the genomes (trains actions and random seed) of
+    its share. In the steady-state mode, the tasks are sent one by one instead, each to an idle worker (see submit).
+    """
+    shared_pool = None
+
+    def __init__(self, total_workers: int):
+        """Class constructor. Starts the worker processes."""
+        self.total_workers = max(1, total_workers)
+        self.connections = []
+        self.processes = []
+
+        for _ in range(self.total_workers):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_warm_worker, args=(child_connection,), daemon=True)
+            process.start()
+            child_connection.close()
+
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+        # keys of the tasks submitted one by one (see submit), by the connection of the worker evaluating each of them
+        self.pending = {}
+
+    @classmethod
+    def get_shared(cls, total_workers: int):
+        """Returns the pool shared by every controller of the process (created when needed)"""
+        if cls.shared_pool is None or cls.shared_pool.total_workers != max(1, total_workers):
+            if cls.shared_pool is not None:
+                cls.shared_pool.close()
+            cls.shared_pool = WarmWorkerPool(total_workers)
+        return cls.shared_pool
+
+    @staticmethod
+    def group_tasks(tasks: List):
+        """Groups the tasks (keeping their indexes) by their shared parts: route, trains queue, options and bound"""
+        groups = []
+        for index, task in enumerate(tasks):
+            group = next((
+                group for group in groups
+                if group['route'] == task['route'] and group['trains_queue'] == task['trains_queue'] and
+                group['options'] == task['options'] and group['cost_bound'] is task.get('cost_bound')
+            ), None)
+
+            if group is None:
+                group = {
+                    'route': task['route'],
+                    'trains_queue': task['trains_queue'],
+                    'options': task['options'],
+                    'cost_bound': task.get('cost_bound'),
+                    'indexes': [],
+                }
+                groups.append(group)
+            group['indexes'].append(index)
+        return groups
+
+    def evaluate(self, tasks: List) -> List:
+        """Evaluates the given tasks (see Simulation.get_evaluation_task), returning their outcomes in the same order"""
+        if len(self.pending):
+            raise InvalidConditionError("There are {} tasks pending to be received from the workers".format(
+                len(self.pending)
+            ))
+
+        outcomes = [None] * len(tasks)
+        for group in self.group_tasks(tasks):
+            indexes = group['indexes']
+            chunk_size = -(-len(indexes) // self.total_workers)
+            chunks = [indexes[start:start + chunk_size] for start in range(0, len(indexes), chunk_size)]
+
+            for connection, chunk in zip(self.connections, chunks):
+                genomes = [(tasks[index]['trains_actions'], tasks[index]['seed']) for index in chunk]
+                connection.send((
+                    group['route'], group['trains_queue'], group['options'], group['cost_bound'], genomes
+                ))
+
+            # every response is received before checking them, so no worker is left with a pending one
+            responses = [connection.recv() for connection, _ in zip(self.connections, chunks)]
+            for chunk, (status, response) in zip(chunks, responses):
+                if status != 'ok':
+                    raise InvalidConditionError("Worker failed to evaluate solutions:\n{}".format(response))
+                for index, outcome in zip(chunk, response):
+                    outcomes[index] = outcome
+        return outcomes
+
+    def count_idle_workers(self) -> int:
+        """Counts the workers which aren't evaluating any submitted task"""
+        return self.total_workers - len(self.pending)
+
+    def count_pending(self) -> int:
+        return len(self.pending)
+
+    def submit(self, key, task):
+        """Sends a single task to an idle worker, whose outcome is received (along with the given key) by `receive`"""
+        connection = next((connection for connection in self.connections if connection not in self.pending), None)
+        if connection is None:
+            raise InvalidConditionError("There's no idle worker to evaluate the task")
+
+        connection.send(get_request(task))
+        self.pending[connection] = key
+
+    def receive(self, timeout: float = None) -> List[Tuple]:
+        """Waits for any of the submitted tasks to be evaluated, returning the (key, outcome) of every finished one"""
+        finished = []
+        for connection in wait(list(self.pending), timeout):
+            key = self.pending.pop(connection)
+            status, response = connection.recv()
+            if status != 'ok':
+                raise InvalidConditionError("Worker failed to evaluate solutions:\n{}".format(response))
+            finished.append((key, response[0]))
+        return finished
+
+    def close(self):
+        """Stops every worker process"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+
+        del self.connections[:]
+        del self.processes[:]
+        self.pending.clear()
+        if WarmWorkerPool.shared_pool is self:
+            WarmWorkerPool.shared_pool = None
+
+
+@atexit.register
+def close_shared_pool():
+    """Stops the shared pool workers when the main process exits"""
+    if WarmWorkerPool.shared_pool is not None:
+        WarmWorkerPool.shared_pool.close()
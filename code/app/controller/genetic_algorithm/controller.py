@@ -1,7 +1,6 @@
-import random
+from typing import Dict, List
 
 from app.controller.core.base_controller import BaseController, free_up_memory
-from app.simulation.model.train import Train
 from app.simulation.action.all import ALL_POSSIBLE_ACTIONS
 from app.simulation.core.simulation import Simulation
 
@@ -60,70 +59,91 @@ class GeneticAlgorithmController(BaseController):
     def apply_crossover_operator(self):
         """Applies the crossover operator in the solutions"""
         while len(self.solutions) < self.options['solutions_size']:
-            individual1 = random.choice(self.solutions)
-            individual2 = random.choice(self.solutions)
+            individual1 = self.random.choice(self.solutions)
+            individual2 = self.random.choice(self.solutions)
 
-            if len(individual1.dispatcher.trains) != len(individual2.dispatcher.trains):
+            trains_actions1 = individual1.get_trains_actions()
+            trains_actions2 = individual2.get_trains_actions()
+            if len(trains_actions1) != len(trains_actions2):
                 self.logger.debug(
                     "Trying to crossover solutions with different number of trains: [{}] and [{}]!".format(
-                        ",".join([train.prefix for train in individual1.dispatcher.trains]),
-                        ",".join([train.prefix for train in individual2.dispatcher.trains])
+                        ",".join(trains_actions1.keys()),
+                        ",".join(trains_actions2.keys())
                     )
                 )
                 continue
 
             genes = self.get_crossed_genes(individual1, individual2)
-            self.create_solution(genes)
+            self.create_solution(genes, parent=individual1)
+
+    def get_next_solution(self):
+        """
+        Overrides the parent method (steady-state mode) to breed the next solution from two finished ones (crossover and
+        mutation), as the worst ones are dropped as the results arrive (see read_finished_solution)
+        """
+        parents = [solution for solution in self.solutions if solution.has_finished]
+        if not len(parents):
+            return super().get_next_solution()
+
+        individual1 = self.random.choice(parents)
+        individual2 = self.random.choice(parents)
+        genes = individual1.get_trains_actions()
+        if len(genes) == len(individual2.get_trains_actions()):
+            genes = self.get_crossed_genes(individual1, individual2)
+
+        if self.random.random() >= (1 - self.options['solution_mutation_probability']):
+            genes = self.get_mutated_genes(genes)
+        return self.create_solution(genes, parent=individual1)
 
     def get_crossed_genes(self, individual1: Simulation, individual2: Simulation):
         """Helper function to cross the genes of two given simulations"""
+        trains_actions2 = individual2.get_trains_actions()
+
         genes = {}
-        for train1 in individual1.dispatcher.trains:
-            if random.random() >= self.options['train_crossing_probability']:
-                genes[train1.options.prefix] = [action['data']['name'] for action in train1.actions_history]
+        for prefix, train_actions1 in individual1.get_trains_actions().items():
+            if self.random.random() >= self.options['train_crossing_probability']:
+                genes[prefix] = list(train_actions1)
                 continue
 
-            train2 = next((
-                train for train in individual2.dispatcher.trains if train.options.prefix == train1.options.prefix
-            ), None)
-
-            if train2 is None:
-                self.logger.debug("Unable to find partner solution for crossing train {}!".format(train1.prefix))
-                genes[train1.options.prefix] = [action['data']['name'] for action in train1.actions_history]
+            train_actions2 = trains_actions2.get(prefix)
+            if train_actions2 is None:
+                self.logger.debug("Unable to find partner solution for crossing train {}!".format(prefix))
+                genes[prefix] = list(train_actions1)
                 continue
 
-            total_genes1 = int(round(len(train1.actions_history) / 2.0))
-            train_genes = [action['data']['name'] for action in train1.actions_history[0:total_genes1]]
+            total_genes1 = int(round(len(train_actions1) / 2.0))
+            train_genes = train_actions1[0:total_genes1]
 
-            total_genes2 = int(round(len(train2.actions_history) / 2.0))
-            train_genes.extend([action['data']['name'] for action in train2.actions_history[total_genes2:]])
+            total_genes2 = int(round(len(train_actions2) / 2.0))
+            train_genes.extend(train_actions2[total_genes2:])
 
-            genes[train1.options.prefix] = train_genes
+            genes[prefix] = train_genes
         return genes
 
     def apply_mutation_operator(self):
         """Apply the mutation operator on the whole solution, given some occurrences rate (probabilities)"""
         solutions_uuids_to_remove = []
         for solution in self.solutions:
-            if random.random() >= (1 - self.options['solution_mutation_probability']):
-                genes = {
-                    train.prefix: [action['data']['name'] for action in train.actions_history]
-                    for train in solution.dispatcher.trains
-                }
-                for train in solution.dispatcher.trains:
-                    if random.random() >= (1 - self.options['train_mutation_probability']):
-                        genes[train.prefix] = self.mutate_train(train)
-
-                self.create_solution(genes)
+            if self.random.random() >= (1 - self.options['solution_mutation_probability']):
+                genes = self.get_mutated_genes(solution.get_trains_actions())
+                self.create_solution(genes, parent=solution)
                 solutions_uuids_to_remove.append(solution.uuid)
                 self.logger.debug("Mutation Operator - Mutated solution {}".format(solution.uuid))
 
         self.solutions = [solution for solution in self.solutions if solution.uuid not in solutions_uuids_to_remove]
 
-    def mutate_train(self, train: Train):
-        """Function used to mutate a single train, given a certain occurrence rate (probability)"""
-        genes = [action['data']['name'] for action in train.actions_history]
+    def get_mutated_genes(self, trains_actions: Dict[str, List[str]]):
+        """Helper function to mutate the actions of each train, given a certain occurrence rate (probability)"""
+        genes = {prefix: list(train_actions) for prefix, train_actions in trains_actions.items()}
+        for prefix in genes:
+            if self.random.random() >= (1 - self.options['train_mutation_probability']):
+                genes[prefix] = self.mutate_train(genes[prefix])
+        return genes
+
+    def mutate_train(self, train_actions: List[str]):
+        """Function used to mutate the actions of a single train, given a certain occurrence rate (probability)"""
+        genes = list(train_actions)
         for gene_index in range(len(genes)):
-            if random.random() >= self.options['gene_mutation_occurrence']:
-                genes[gene_index] = random.choice(ALL_POSSIBLE_ACTIONS).name
+            if self.random.random() >= self.options['gene_mutation_occurrence']:
+                genes[gene_index] = self.random.choice(ALL_POSSIBLE_ACTIONS).name
         return genes
@@ -1,9 +1,8 @@
 import math
-import random
+from typing import List
 
 from app.controller.core.base_controller import BaseController, free_up_memory
 from app.simulation.action.all import ALL_POSSIBLE_ACTIONS
-from app.simulation.model.train import Train
 
 
 class ParticleSwarmOptimizationController(BaseController):
@@ -16,6 +15,8 @@ class ParticleSwarmOptimizationController(BaseController):
 
         self.positions_map = self.calculate_positions_map()
         self.particles = []
+        self.particles_solutions = {}  # particles by the uuid of their solution being run (steady-state mode)
+        self.idle_particles = []  # particles whose solution has finished, to be moved (steady-state mode)
         self.best_global_particle = None
         self.best_global_particle_cost = math.inf
 
@@ -45,44 +46,55 @@ class ParticleSwarmOptimizationController(BaseController):
         while len(self.solutions) < self.options['solutions_size']:
             self.create_solution()
 
-    def get_train_position(self, train: Train):
+    def get_train_position(self, train_actions: List[str]):
         """Calculates a train position based on its action history"""
         return [
-            self.positions_map[action['data']['name']]
-            for action in train.actions_history
+            self.positions_map[action_name]
+            for action_name in train_actions
         ]
 
-    def get_random_velocity(self, train: Train):
+    def get_random_velocity(self, train_actions: List[str]):
         """Calculates a train position based on its action history"""
         return [
-            random.random() - self.positions_map[action['data']['name']]
-            for action in train.actions_history
+            self.random.random() - self.positions_map[action_name]
+            for action_name in train_actions
         ]
 
     def read_particles(self, solutions):
         """Parses the solutions (simulations) into the particles"""
-        self.particles = [
-            {
-                'positions': {train.prefix: self.get_train_position(train) for train in solution.dispatcher.trains},
-                'velocities': {train.prefix: self.get_random_velocity(train) for train in solution.dispatcher.trains},
-                'best_positions': {},
-                'best_cost': math.inf,
-                'solution': solution,
-            }
-            for solution in solutions
-        ]
+        self.particles = [self.read_particle(solution) for solution in solutions]
+
+    def read_particle(self, solution):
+        """Parses a solution (simulation) into a particle"""
+        return {
+            'positions': {
+                prefix: self.get_train_position(train_actions)
+                for prefix, train_actions in solution.get_trains_actions().items()
+            },
+            'velocities': {
+                prefix: self.get_random_velocity(train_actions)
+                for prefix, train_actions in solution.get_trains_actions().items()
+            },
+            'best_positions': {},
+            'best_cost': math.inf,
+            'solution': solution,
+        }
 
     def update_particles_bests(self):
         """Iterates through each particle updating its personal best cost/position and updates the global"""
         for particle in self.particles:
-            particle_current_cost = particle['solution'].accumulated_cost
-            if particle_current_cost < particle['best_cost']:
-                particle['best_cost'] = particle['solution'].accumulated_cost
-                particle['best_positions'] = particle['positions']
+            self.update_particle_best(particle)
 
-            if particle_current_cost < self.best_global_particle_cost:
-                self.best_global_particle_cost = particle_current_cost
-                self.best_global_particle = particle
+    def update_particle_best(self, particle):
+        """Updates the personal best cost/position of a particle and the global one"""
+        particle_current_cost = particle['solution'].accumulated_cost
+        if particle_current_cost < particle['best_cost']:
+            particle['best_cost'] = particle['solution'].accumulated_cost
+            particle['best_positions'] = particle['positions']
+
+        if particle_current_cost < self.best_global_particle_cost:
+            self.best_global_particle_cost = particle_current_cost
+            self.best_global_particle = particle
 
     def get_particle_new_velocity_personal(self, particle, train_prefix, velocity_index):
         """Calculates the personal term of the new velocity equation"""
@@ -100,7 +112,8 @@ class ParticleSwarmOptimizationController(BaseController):
         ):
             current_position = particle['best_positions'][train_prefix][velocity_index]
 
-        return self.options['personal_acceleration_coefficient'] * random.random() * (best_position - current_position)
+        coefficient = self.options['personal_acceleration_coefficient']
+        return coefficient * self.random.random() * (best_position - current_position)
 
     def get_particle_new_velocity_global(self, particle, train_prefix, velocity_index):
         """Calculates the global term of the new velocity equation"""
@@ -116,7 +129,8 @@ class ParticleSwarmOptimizationController(BaseController):
         if train_prefix in particle['positions'] and len(particle['positions'][train_prefix]) > velocity_index:
             current_position = particle['best_positions'][train_prefix][velocity_index]
 
-        return self.options['global_acceleration_coefficient'] * random.random() * (best_position - current_position)
+        coefficient = self.options['global_acceleration_coefficient']
+        return coefficient * self.random.random() * (best_position - current_position)
 
     def update_particle_velocities_and_positions(self, particle):
         """Iterates through the velocity in each dimension of a particle updating it, then updates its positions"""
@@ -156,7 +170,39 @@ class ParticleSwarmOptimizationController(BaseController):
             train_prefix: [self.get_action_from_position(position) for position in particle['positions'][train_prefix]]
             for train_prefix in particle['positions']
         }
-        self.create_solution(trains_actions)
+        return self.create_solution(trains_actions)
+
+    def get_next_solution(self):
+        """
+        Overrides the parent method (steady-state mode) to move the next idle particle, whose previous solution has
+        finished. The initial particles are read from random solutions.
+        """
+        if len(self.idle_particles):
+            particle = self.idle_particles.pop(0)
+            self.update_particle_velocities_and_positions(particle)
+            solution = self.parse_particle_positions(particle)
+            self.particles_solutions[solution.uuid] = particle
+            return solution
+
+        total_random_solutions = len([
+            solution for solution in self.solutions if solution.uuid not in self.particles_solutions
+        ])
+        if len(self.particles) + total_random_solutions < self.options['solutions_size']:
+            return super().get_next_solution()
+        return None
+
+    def read_finished_solution(self, solution):
+        """Overrides the parent method (steady-state mode) to update the particle of a finished solution"""
+        self.solutions.remove(solution)
+
+        particle = self.particles_solutions.pop(solution.uuid, None)
+        if particle is None:
+            particle = self.read_particle(solution)
+            self.particles.append(particle)
+        particle['solution'] = solution
+
+        self.update_particle_best(particle)
+        self.idle_particles.append(particle)
 
     def take_step_actions(self):
         """Overrides the original controller step actions to add the PSO methods"""
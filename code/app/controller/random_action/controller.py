@@ -21,7 +21,10 @@ class RandomActionController(BaseController):
             self.create_solution()
 
         super().take_step_actions()
-        self.update_max_simulation_cost()
+
+        # the dominated solutions are already pruned by the cost bound (without being reported as failures)
+        if self.cost_bound is None:
+            self.update_max_simulation_cost()
 
     def update_max_simulation_cost(self, max_cost=inf):
         if max_cost == inf and 'max_cost' in self.options['simulation_options']:
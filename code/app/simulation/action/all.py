@@ -12,6 +12,13 @@ ALL_POSSIBLE_ACTIONS = [
     ReverseAction
 ]
 
+# actions that move the train by themselves (the other ones wait for another train)
+MOVEMENT_ACTIONS = [
+    MoveStraightAction,
+    MoveDeviateAction,
+    ReverseAction
+]
+
 
 def find_action(keyword):
     return next(
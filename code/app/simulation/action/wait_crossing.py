@@ -18,15 +18,16 @@ class WaitCrossingAction(BaseAction):
             return False
 
         # check if all other trains ahead are executing the WaitCrossingAction
-        all_other_trains_ahead_waiting_crossing = all([
+        all_other_trains_ahead_waiting_crossing = all(
             type(other_train.executing_action) == WaitCrossingAction
             for other_train in train.trains_ahead
-        ])
+        )
 
-        has_available_siding = any([
+        # the (already built) routes between the closest turnouts are only checked until an available siding is found
+        has_available_siding = any(
             dispatcher.is_route_available(route, train.is_reversed)
             for route in train.routes_between_closest_turnouts
-        ])
+        )
 
         return (
             has_available_siding and
@@ -0,0 +1,100 @@
+from typing import List
+
+import numpy as np
+
+from app.simulation.core.simulation import Simulation
+from app.simulation.exception.error import ConflictConditionError, EmptyCollectionError
+from app.simulation.model.trains_state import TrainsStateBatch
+
+
+class SimulationBatch:
+    """
+    Lockstep engine used to run several simulations of the same route together (e.g. a whole population of solutions
+    of a controller). Every simulation keeps its own dispatcher (so the trains decisions are still taken one by one),
+    but their trains state tables are bound to a single (simulations, trains) table, so the kinematics, times and costs
+    of all of them are integrated at once on each step. The results are exactly the same as running each simulation
+    by itself.
+    """
+
+    def __init__(self, simulations: List[Simulation]):
+        """Class constructor"""
+        if not len(simulations):
+            raise EmptyCollectionError("There are no simulations to be run in the batch")
+
+        self.simulations = simulations
+        sections_mapper = simulations[0].route.sections_mapper
+        for simulation in simulations[1:]:
+            if simulation.route.sections_mapper.index.names != sections_mapper.index.names:
+                raise ConflictConditionError("Simulation {} has a different route from the batch ones".format(
+                    simulation.uuid
+                ))
+
+        self.sections_index = sections_mapper.index
+        self.sections_lengths = np.array(self.sections_index.lengths, dtype=np.float64)
+        self.steps_durations = np.array(
+            [simulation.time_dynamics.get_step_duration() for simulation in simulations], dtype=np.float64
+        )
+        # number of following steps (for each simulation) that can be fast-forwarded, when in event-driven mode
+        self.steps_to_fast_forward = [0] * len(simulations)
+        self.trains_state = None
+
+    def run(self):
+        """Runs every simulation of the batch until all of them finish"""
+        self.trains_state = TrainsStateBatch(
+            [simulation.dispatcher.trains_state for simulation in self.simulations], self.sections_index
+        )
+        try:
+            for simulation in self.simulations:
+                simulation.start()
+            while any(simulation.running for simulation in self.simulations):
+                self.step()
+        finally:
+            self.trains_state.release()
+
+    def step(self):
+        """Performs a single step of every running simulation"""
+        running_lines = [line for line, simulation in enumerate(self.simulations) if simulation.running]
+        fast_forward = [self.steps_to_fast_forward[line] > 0 for line in range(len(self.simulations))]
+        self.trains_state.active[:] = False
+        self.trains_state.active[running_lines] = True
+
+        for line in running_lines:
+            simulation = self.simulations[line]
+            simulation.time_dynamics.step()
+            simulation.dispatcher.prepare_step(fast_forward[line])
+
+        self.update_trains_kinematics()
+        for line in running_lines:
+            self.simulations[line].dispatcher.step_trains(fast_forward[line])
+        self.update_trains_costs()
+
+        for line in running_lines:
+            simulation = self.simulations[line]
+            simulation.dispatcher.finish_step(fast_forward[line])
+            simulation.register_step()
+            simulation.finish_step()
+
+            if fast_forward[line]:
+                self.steps_to_fast_forward[line] -= 1
+            elif simulation.options['event_driven'] and simulation.running:
+                self.steps_to_fast_forward[line] = simulation.dispatcher.get_steps_to_next_event()
+
+    def update_trains_kinematics(self):
+        """Updates the velocity, position and times of the trains of every running simulation at once"""
+        rows = self.trains_state.rows
+        steps_durations = np.broadcast_to(self.steps_durations[:, np.newaxis], rows.shape)[rows]
+
+        changed = self.trains_state.update_velocities(rows)
+        for line, simulation in enumerate(self.simulations):
+            changed_rows = np.flatnonzero(changed[line])
+            if len(changed_rows):
+                simulation.dispatcher.sync_trains_velocities(changed_rows)
+
+        self.trains_state.update_positions(rows, self.sections_lengths, steps_durations)
+        self.trains_state.update_times(rows, steps_durations)
+
+    def update_trains_costs(self):
+        """Updates the accumulated cost of the trains of every running simulation at once"""
+        rows = self.trains_state.rows
+        distances_to_goal = self.trains_state.get_distances_to_goal(rows, self.sections_index, self.sections_lengths)
+        self.trains_state.update_costs(rows, distances_to_goal)
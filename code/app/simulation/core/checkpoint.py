@@ -0,0 +1,79 @@
+import copy
+from typing import Dict, List
+
+
+class SimulationCheckpoint:
+    """
+    Snapshot of the state of a running simulation at the end of a given step: its dispatcher (with the trains and
+    their state table), time dynamics, counters and the results registered so far. The route (sections, mapper and
+    index) and the loggers are never copied, as they aren't changed by the simulations, so the snapshot is cheap.
+
+    It also keeps the names of the actions taken by each train until then, used to check if a new set of trains
+    actions (a genome) shares this prefix, so a simulation of it may be resumed from the checkpoint.
+    """
+    SIMULATION_ATTRIBUTES = (
+        'current_step',
+        'accumulated_cost',
+        'has_finished',
+        'has_completed_every_train',
+        'has_reached_no_movement_step_limit',
+        'has_reached_step_limit',
+        'has_reached_cost_limit',
+        'has_reached_deadlock',
+        'has_been_pruned',
+        'has_aborted',
+        'error',
+    )
+
+    def __init__(self, simulation):
+        """Class constructor. Captures the current state of a given simulation."""
+        self.step = simulation.current_step
+        self.trains_actions: Dict[str, List[str]] = simulation.dispatcher.get_trains_actions_history()
+        self.attributes = {attribute: getattr(simulation, attribute) for attribute in self.SIMULATION_ATTRIBUTES}
+        self.results = simulation.results.get_state()
+        self.trains_positions_history = list(simulation.trains_positions_history)
+        self.dispatcher, self.time_dynamics = self.copy_state(
+            simulation, simulation.dispatcher, simulation.time_dynamics
+        )
+
+    @staticmethod
+    def get_shared_objects_memo(simulation) -> Dict:
+        """Returns a deepcopy memo which makes the copies keep referencing the route, loggers and random generator"""
+        route = simulation.route
+        shared_objects = [route, route.sections_mapper, route.sections_mapper.index, simulation.logger]
+        # the random generator isn't copied either, as a fork always starts a new one (from its own seed)
+        shared_objects.append(simulation.random)
+        shared_objects.extend(route.sections_mapper.sections)
+        memo = {id(shared_object): shared_object for shared_object in shared_objects}
+
+        # while run in a batch, the trains state table is a view over the batch one, which is never copied
+        batch = simulation.dispatcher.trains_state.batch
+        if batch is not None:
+            memo[id(batch)] = None
+        return memo
+
+    @staticmethod
+    def copy_state(simulation, dispatcher, time_dynamics):
+        """Deep copies a dispatcher and time dynamics (keeping their references) without copying the route"""
+        memo = SimulationCheckpoint.get_shared_objects_memo(simulation)
+        return copy.deepcopy((dispatcher, time_dynamics), memo)
+
+    def matches(self, trains_actions: Dict) -> bool:
+        """Determines if the given trains actions start with the ones taken until the checkpoint"""
+        for prefix, actions in self.trains_actions.items():
+            train_actions = (trains_actions or {}).get(prefix, [])
+            if len(train_actions) < len(actions) or list(train_actions[0:len(actions)]) != actions:
+                return False
+        return True
+
+    def restore(self, simulation):
+        """Restores the checkpoint state into a given simulation (the checkpoint itself is kept untouched)"""
+        for attribute, value in self.attributes.items():
+            setattr(simulation, attribute, value)
+
+        simulation.dispatcher, simulation.time_dynamics = self.copy_state(
+            simulation, self.dispatcher, self.time_dynamics
+        )
+        simulation.trains_positions_history = list(self.trains_positions_history)
+        simulation.results.set_state(self.results)
+        simulation.running = False
@@ -0,0 +1,53 @@
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import weakref
+
+
+class CostBound:
+    """
+    Best known cost (incumbent) of a search, shared by the simulations being evaluated, so the ones whose cost has
+    already passed it stop early, as they may no longer improve it. It's kept in a small memory-mapped file, so the
+    copies of a bound sent to worker processes (which only carry its path) read and publish the same value.
+
+    Publishing only ever lowers the bound, holding an exclusive lock of its file while comparing and writing the cost,
+    so the bound is always the lowest cost published, even by different threads or processes at the same time.
+    """
+    FORMAT = 'd'
+
+    def __init__(self, path: str = None):
+        """Class constructor. Creates a new bound (with no cost yet) or attaches to the one of a given path."""
+        if path is None:
+            descriptor, path = tempfile.mkstemp(prefix='cost_bound_')
+            os.write(descriptor, struct.pack(self.FORMAT, float('inf')))
+            os.close(descriptor)
+            # the file is removed along with the bound which created it (the attached copies don't own it)
+            weakref.finalize(self, os.remove, path)
+
+        self.path = path
+        with open(path, 'r+b') as file:
+            self.memory = mmap.mmap(file.fileno(), struct.calcsize(self.FORMAT))
+
+    def __reduce__(self):
+        """Pickles (or copies) the bound by its path, so the copy is attached to the same value"""
+        return CostBound, (self.path,)
+
+    def get(self) -> float:
+        """Gets the current bound (infinite while no cost was published)"""
+        return struct.unpack_from(self.FORMAT, self.memory)[0]
+
+    def publish(self, cost: float) -> bool:
+        """Publishes a cost, which becomes the new bound if it's lower than the current one"""
+        # the bound only decreases, so a cost which isn't lower than the current one is discarded without locking
+        if cost >= self.get():
+            return False
+
+        # the file is opened on every publication, so its lock also excludes the threads sharing this bound
+        with open(self.path, 'rb') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            if cost >= self.get():
+                return False
+            struct.pack_into(self.FORMAT, self.memory, 0, cost)
+            return True
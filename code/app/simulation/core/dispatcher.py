@@ -1,13 +1,17 @@
 import math
+import os
 from typing import List
 
+import numpy as np
+
 from app.common.logger import generate_logger, LoggerFolders
 from app.simulation.exception.error import ConflictConditionError
 from app.simulation.math.dynamics import TimeDynamics
-from app.simulation.action.all import ALL_POSSIBLE_ACTIONS, find_action
+from app.simulation.action.all import ALL_POSSIBLE_ACTIONS, MOVEMENT_ACTIONS, find_action
 from app.simulation.model.section import Section
 from app.simulation.model.sections_mapper import SectionsMapper
 from app.simulation.model.train import Train
+from app.simulation.model.trains_state import TrainsState
 
 
 class Dispatcher:
@@ -18,53 +22,190 @@ class Dispatcher:
         time_dynamics: TimeDynamics,
         sections_mapper: SectionsMapper,
         trains_queue,
-        trains_actions
+        trains_actions,
+        logger=None,
+        random_generator=None,
+        detect_deadlocks=False
     ):
-        """Class constructor"""
+        """
+        Class constructor. The trains take their random choices from the given generator (if any), and the deadlocked
+        trains are only looked for when the deadlocks detection is enabled.
+        """
         self.simulation_uuid = simulation_uuid
         self.time_dynamics = time_dynamics
         self.sections_mapper = sections_mapper
         self.trains_queue = trains_queue
         self.trains_actions = trains_actions
+        self.random_generator = random_generator
+        self.detect_deadlocks = detect_deadlocks
 
-        self.logger = generate_logger(self.simulation_uuid, LoggerFolders.SIMULATIONS)
+        self.logger = logger
+        if self.logger is None:
+            self.logger = generate_logger(self.simulation_uuid, LoggerFolders.SIMULATIONS)
 
-        self.trains = []
+        # the trains list is the one from the state table, so they always share the same order
+        self.trains_state = TrainsState(sections_mapper.index)
+        self.trains = self.trains_state.trains
+        self.sections_lengths = np.array(sections_mapper.index.lengths, dtype=np.float64)
         self.steps_without_movement = 0
+        self.removed_trains = []
         self.last_positions = []
         self.occupancy_dict = {section.name: [] for section in sections_mapper.sections}
+        self.occupancy_version = 0  # incremented on every occupancy change (invalidating the cached possible actions)
+        self.deadlocked_trains = []  # trains which may never move again (see find_deadlocked_trains)
+
+        # when in debug mode, the incremental occupancy is checked against a full rebuild on every update
+        self.check_occupancy = os.environ.get('DEBUG', '0') != '0'
+
+        # signatures of the discrete state after the last two full steps (used by the event-driven mode)
+        self.last_decision_signature = None
+        self.previous_decision_signature = None
 
     def step(self):
         """Performs a full step calculation"""
+        self.prepare_step()
+        self.update_trains_kinematics()
+        self.step_trains()
+        self.update_trains_costs()
+        self.finish_step()
+
+    def fast_forward_step(self):
+        """
+        Performs a lean step calculation, only integrating the trains kinematics, times and costs. It must only be used
+        while no event can happen (see get_steps_to_next_event), as the decision-related attributes (sections, possible
+        actions and related trains) are not updated.
+        """
+        self.prepare_step(fast_forward=True)
+        self.update_trains_kinematics()
+        self.step_trains(fast_forward=True)
+        self.update_trains_costs()
+        self.finish_step(fast_forward=True)
+
+    def prepare_step(self, fast_forward=False):
+        """First phase of a step: adds the queued trains ready to enter the route and removes the finished ones"""
+        if fast_forward:
+            return
+
         self.check_trains_to_add()
-        self.update_occupancy_dict()
-        self.trains[:] = [train for train in self.trains if not train.has_finished()]
+        self.check_occupancy_dict()
+        for train in [train for train in self.trains if train.has_finished()]:
+            self.remove_train(train)
 
+    def step_trains(self, fast_forward=False):
+        """Second phase of a step (after the kinematics integration): performs the decisions of each of the trains"""
         for train in self.trains:
             train.step()
             if train.executing_action is not None:
                 train.executing_action.execute(self, train)
+            if fast_forward:
+                continue
+
             self.update_train_sections(train)
-            self.update_occupancy_dict()
+            self.check_occupancy_dict()
             self.update_train_possible_actions(train)
             self.update_related_trains(train)
-            self.update_train_cost(train)
 
+    def finish_step(self, fast_forward=False):
+        """Last phase of a step (after the costs update): updates the movement and decision trackers"""
         # Update the number of steps without train movement only if there are actually trains in the route
         if len(self.trains):
             self.update_steps_without_movement()
         else:
             self.steps_without_movement = 0
 
+        if not fast_forward:
+            self.previous_decision_signature = self.last_decision_signature
+            self.last_decision_signature = self.get_decision_signature()
+            if self.detect_deadlocks:
+                self.deadlocked_trains = self.find_deadlocked_trains()
+
+    def get_decision_signature(self):
+        """Returns a hashable snapshot of every discrete attribute that the decision logic of a step depends on"""
+        return len(self.trains_queue), tuple(
+            (
+                train.prefix,
+                train.current_head_section.name,
+                train.is_reversed,
+                id(train.executing_action),
+                id(getattr(train.executing_action, 'lookup_train', None)),
+                len(train.actions_history),
+                tuple(train.possible_actions),
+                tuple(id(train_ahead) for train_ahead in train.trains_ahead),
+                tuple(id(train_behind) for train_behind in train.trains_behind),
+            )
+            for train in self.trains
+        )
+
+    def get_steps_to_next_event(self):
+        """
+        Returns how many of the following steps are guaranteed to be free of events (a train reaching a section end or
+        its finish mark, choosing or completing an action, being added from the queue, etc.). It's zero unless the last
+        two full steps kept the same discrete state, meaning that the decision logic has reached a fixed point.
+        """
+        if self.last_decision_signature is None or self.last_decision_signature != self.previous_decision_signature:
+            return 0
+
+        steps_to_next_event = math.inf
+        for train in self.queued_trains_with_pending_step():
+            steps_to_next_event = min(steps_to_next_event, train['step_to_add'] - self.time_dynamics.current_step - 1)
+
+        occupied_sections = set()
+        for train in self.trains:
+            if train.current_head_section.name in occupied_sections:
+                # trains sharing a section may overtake each other, changing their related trains
+                return 0
+            occupied_sections.add(train.current_head_section.name)
+            steps_to_next_event = min(steps_to_next_event, self.get_train_steps_to_next_event(train))
+
+        return max(0, steps_to_next_event)
+
+    def queued_trains_with_pending_step(self):
+        """Returns the queued trains that are still waiting for their step to be added"""
+        return [
+            train for train in self.trains_queue
+            if 'step_to_add' in train and self.time_dynamics.current_step < train['step_to_add']
+        ]
+
+    def get_train_steps_to_next_event(self, train: Train):
+        """Returns how many of the following steps are guaranteed to be free of events for a given train"""
+        action = train.executing_action
+        if train.has_finished() or (action is None and len(train.possible_actions)):
+            return 0
+
+        if action is not None and action.was_executed(train):
+            return 0
+
+        # without an action or waiting at the section end, the train is kept stopped
+        if action is None or train.is_at_section_end():
+            return math.inf
+
+        section = train.current_head_section
+        target_positions = [0.0 if train.is_reversed else 1.0]
+        if train.options.finish_section == section:
+            target_positions.append(0.5)
+        remaining_distance = min(
+            abs(target_position - train.relative_position) for target_position in target_positions
+        ) * section.length
+
+        maximum_step_distance = section.get_maximum_velocity() / 3.6 * self.time_dynamics.get_step_duration()
+        if maximum_step_distance <= 0:
+            return math.inf
+
+        # keeps one step of margin to absorb any floating point difference in the position integration
+        return int(math.floor(remaining_distance / maximum_step_distance)) - 1
+
     def check_trains_to_add(self):
         """Check the list of trains to be added and - if ready - adds it"""
         if not len(self.trains_queue):
             return
 
-        trains_to_add = [train for train in self.trains_queue if self.is_train_ready_to_be_added(train)]
-        self.trains_queue = [train for train in self.trains_queue if not self.is_train_ready_to_be_added(train)]
+        # the trains are checked one by one, so a train added in this step occupies its section for the next ones
+        remaining_trains = []
+        for train in self.trains_queue:
+            if not self.is_train_ready_to_be_added(train):
+                remaining_trains.append(train)
+                continue
 
-        for train in trains_to_add:
             added_train = self.add_generic_train(**train)
             actions = next(iter([
                 actions for prefix, actions in self.trains_actions.items()
@@ -74,6 +215,8 @@ class Dispatcher:
             if actions is not None:
                 added_train.actions_queue = [find_action(action) for action in actions]
 
+        self.trains_queue = remaining_trains
+
     def is_train_ready_to_be_added(self, train):
         """Determines if a train is ready to be added in the simulation"""
         train_start_section = self.sections_mapper.find_section_by_name(train['start_section'])
@@ -99,9 +242,11 @@ class Dispatcher:
         if sections_names is None:
             sections_names = []
 
-        sections = [self.sections_mapper.find_section_by_name(section_name) for section_name in sections_names]
-
-        return True if all([not self.is_section_occupied(section, not is_reversed) for section in sections]) else False
+        # it stops at the first occupied section
+        return all(
+            not self.is_section_occupied(self.sections_mapper.find_section_by_name(section_name), not is_reversed)
+            for section_name in sections_names
+        )
 
     def add_generic_train(self, start_section: str, end_section: str, **train_options):
         """Adds a train to the route"""
@@ -113,6 +258,7 @@ class Dispatcher:
             time_dynamics=self.time_dynamics.clone(),
             start_section=start_section_obj,
             finish_section=end_section_obj,
+            random_generator=self.random_generator,
             **train_options
         )
 
@@ -125,13 +271,22 @@ class Dispatcher:
                 train.prefix, train.options.start_section
             ))
 
-        self.trains.append(train)
+        self.trains_state.attach(train)
+        self.occupancy_dict[train.current_head_section.name].append(train)
+        self.occupancy_version += 1
         self.logger.debug("Added train {} from {} to {} (reversed: {}) to simulation {}".format(
             train.options.prefix, start_section, end_section, train.is_reversed, self.simulation_uuid
         ))
 
         return train
 
+    def remove_train(self, train: Train):
+        """Removes a train from the route (and from the occupancy of its section)"""
+        self.trains_state.detach(train)
+        self.removed_trains.append(train)
+        self.occupancy_dict[train.current_head_section.name].remove(train)
+        self.occupancy_version += 1
+
     def update_train_sections(self, train: Train):
         """Updates the sections attributes (prev, next, etc) for a train"""
         next_sections = self.sections_mapper.get_next_sections(train.current_head_section, train.is_reversed)
@@ -158,8 +313,28 @@ class Dispatcher:
             train.is_reversed
         )
 
+    def get_possible_actions_key(self, train: Train):
+        """
+        Returns a hashable snapshot of every input the actions applicability of a given train depends on: its section
+        and direction (which determine its next and previous sections and turnouts, and the routes between them), the
+        sections occupancy and the trains ahead (and their actions) and behind it.
+        """
+        return (
+            self.occupancy_version,
+            train.current_head_section.name,
+            train.is_reversed,
+            tuple(train_ahead.prefix for train_ahead in train.trains_ahead),
+            tuple(type(train_ahead.executing_action) for train_ahead in train.trains_ahead),
+            tuple(train_behind.prefix for train_behind in train.trains_behind),
+        )
+
     def update_train_possible_actions(self, train: Train):
-        """Updates the list of possible actions for a given train"""
+        """Updates the list of possible actions for a given train (only evaluated again when any of its inputs change)"""
+        possible_actions_key = self.get_possible_actions_key(train)
+        if possible_actions_key == train.possible_actions_key:
+            return
+
+        train.possible_actions_key = possible_actions_key
         possible_actions = [action for action in ALL_POSSIBLE_ACTIONS if action.is_applicable(self, train)]
         train.possible_actions = possible_actions
 
@@ -187,14 +362,9 @@ class Dispatcher:
             return []
 
         trains_direction = 'normal' if not is_reversed else 'reversed'
-        trains_behind = self.trains_in_section(section, trains_direction)
+        sections_before = self.sections_mapper.get_sections_before_mask(section, is_reversed)
 
-        sections_before = self.sections_mapper.get_all_sections_before(section, is_reversed)
-        for previous_section in sections_before:
-            section_object = self.sections_mapper.find_section_by_name(previous_section)
-            trains_behind.extend(self.trains_in_section(section_object, trains_direction))
-
-        return list(set(trains_behind))
+        return self.trains_in_sections_mask(sections_before, section, trains_direction)
 
     def trains_moving_opposite_from_section(self, section: Section, is_reversed=False) -> List:
         """Returns the list of trains moving opposite from a given section. Basically used to check trains moving in
@@ -203,14 +373,24 @@ class Dispatcher:
             return []
 
         trains_direction = 'normal' if is_reversed else 'reversed'
-        trains_opposite = self.trains_in_section(section, trains_direction)
+        sections_after = self.sections_mapper.get_sections_after_mask(section, is_reversed)
+
+        return self.trains_in_sections_mask(sections_after, section, trains_direction)
 
-        sections_after = self.sections_mapper.get_all_sections_after(section, is_reversed)
-        for next_section in sections_after:
-            section_object = self.sections_mapper.find_section_by_name(next_section)
-            trains_opposite.extend(self.trains_in_section(section_object, trains_direction))
+    def trains_in_sections_mask(self, sections_mask, section: Section = None, direction='both') -> List:
+        """Returns the list of trains whose head section is marked in a given boolean mask (indexed by section id) or
+        is the given section itself, optionally filtering by the trains direction"""
+        index = self.sections_mapper.index
+        section_id = index.get_id(section.name) if section is not None else None
 
-        return list(set(trains_opposite))
+        trains = []
+        for train in self.trains:
+            if direction != 'both' and train.is_reversed != (direction == 'reversed'):
+                continue
+            train_section_id = index.get_id(train.current_head_section.name)
+            if train_section_id == section_id or sections_mask[train_section_id]:
+                trains.append(train)
+        return trains
 
     def trains_in_section(self, section, direction='both'):
         """Returns a list with the trains occupying a given section"""
@@ -222,14 +402,30 @@ class Dispatcher:
             train.is_reversed == (direction == 'reversed')
         ]
 
-    def update_train_cost(self, train):
-        """Updates the accumulated cost of a given train"""
-        train.last_accumulated_cost = train.accumulated_cost
-        distance_to_goal = self.get_train_distance_to_goal(train)
-        if distance_to_goal == math.inf:
-            distance_to_goal = 2 * sum([section.length for section in self.sections_mapper.sections])
-        train.instant_cost = train.options.priority * train.train_equation.calculate_cost(train, distance_to_goal)
-        train.accumulated_cost += train.instant_cost
+    def update_trains_kinematics(self):
+        """Updates the velocity, position and times of every train at once"""
+        step_duration = self.time_dynamics.get_step_duration()
+        rows = self.trains_state.rows
+
+        self.sync_trains_velocities(np.flatnonzero(self.trains_state.update_velocities(rows)))
+        self.trains_state.update_positions(rows, self.sections_lengths, step_duration)
+        self.trains_state.update_times(rows, step_duration)
+
+    def sync_trains_velocities(self, rows):
+        """Keeps the velocity variables (and their history) of the given trains rows in sync with the state table"""
+        for row in rows:
+            self.trains[row].train_equation.velocity.value = float(self.trains_state.velocity[row])
+
+    def update_trains_costs(self):
+        """Updates the accumulated cost of every train at once"""
+        rows = self.trains_state.rows
+        self.trains_state.update_costs(rows, self.get_trains_distances_to_goal(rows))
+
+    def get_trains_distances_to_goal(self, rows=None):
+        """Calculates the distance to the goal of every train at once (the vectorized get_train_distance_to_goal)"""
+        if rows is None:
+            rows = self.trains_state.rows
+        return self.trains_state.get_distances_to_goal(rows, self.sections_mapper.index, self.sections_lengths)
 
     def get_train_distance_to_goal(self, train: Train):
         """Calculates a train distance to the goal"""
@@ -248,11 +444,27 @@ class Dispatcher:
 
     def update_occupancy_dict(self):
         """Updates the occupancy dictionary with a list with each of the sections and its occupying trains """
-        self.occupancy_dict = {
+        self.occupancy_dict = self.build_occupancy_dict()
+        self.occupancy_version += 1
+
+    def build_occupancy_dict(self):
+        """Builds (from scratch) the occupancy dictionary for the current trains in the route"""
+        return {
             section.name: self.trains_in_section(section)
             for section in self.sections_mapper.sections
         }
 
+    def check_occupancy_dict(self):
+        """When enabled (debug mode), checks if the incremental occupancy dictionary matches a full rebuild"""
+        if not self.check_occupancy:
+            return
+
+        expected_occupancy_dict = self.build_occupancy_dict()
+        if self.occupancy_dict != expected_occupancy_dict:
+            raise ConflictConditionError("Occupancy mismatch at step {}: expected {} but got {}".format(
+                self.time_dynamics.current_step, expected_occupancy_dict, self.occupancy_dict
+            ))
+
     def update_steps_without_movement(self):
         """Updates the number of steps without any train movement"""
         trains_positions = [train.relative_position for train in self.trains]
@@ -262,6 +474,84 @@ class Dispatcher:
         else:
             self.steps_without_movement += 1
 
+    def get_section_blockers(self, section: Section, is_reversed=False) -> List[Train]:
+        """Returns the trains which make a given section occupied (see is_section_occupied)"""
+        occupancy = self.occupancy_dict[section.name]
+        if len(occupancy) or not section.is_turnout():
+            return list(occupancy)
+
+        # an empty turnout is only occupied when all of its next sections are
+        next_sections_blockers = [
+            self.get_section_blockers(next_section, is_reversed)
+            for next_section in self.sections_mapper.get_next_sections(section, is_reversed)
+        ]
+        if not all(next_sections_blockers):
+            return []
+        return [blocker for blockers in next_sections_blockers for blocker in blockers]
+
+    def get_train_blockers(self, train: Train):
+        """
+        Returns the trains a given one is waiting for (any of them moving could let it move again), or None if it may
+        still move by itself: it's executing a movement action, any movement action is applicable to it or it's still
+        going to its section end (as a waiting action keeps it going until there).
+        """
+        action = train.executing_action
+        if action is not None and not action.was_executed(train):
+            lookup_train = getattr(action, 'lookup_train', None)
+            if lookup_train is None or not train.is_at_section_end():
+                return None
+
+            # no other action is taken until the lookup train leaves (being ahead or behind the waiting one)
+            return [lookup_train]
+
+        if any(movement_action.is_applicable(self, train) for movement_action in MOVEMENT_ACTIONS):
+            return None
+        if len(train.possible_actions) and not train.is_at_section_end():
+            return None
+
+        # the next sections are occupied, and any waiting action would be taken for a train ahead or behind
+        blockers = [
+            blocker
+            for next_section in self.sections_mapper.get_next_sections(train.current_head_section, train.is_reversed)
+            for blocker in self.get_section_blockers(next_section, train.is_reversed)
+        ]
+        return blockers + list(train.trains_ahead) + list(train.trains_behind)
+
+    def find_deadlocked_trains(self) -> List[Train]:
+        """
+        Finds the trains which may never move again, from the wait-for graph of the route (each stopped train pointing
+        to the trains it's waiting for). A train is deadlocked if every train it's waiting for is deadlocked as well,
+        so the ones waiting for any train which may still move (or finish) are discarded until none is left to discard.
+        """
+        trains_blockers = {}
+        for train in self.trains:
+            if train.has_finished():
+                continue
+            blockers = self.get_train_blockers(train)
+            if blockers:
+                trains_blockers[train] = blockers
+
+        deadlocked_trains = set(trains_blockers)
+        has_discarded = True
+        while has_discarded:
+            has_discarded = False
+            for train in list(deadlocked_trains):
+                if any(blocker not in deadlocked_trains for blocker in trains_blockers[train]):
+                    deadlocked_trains.discard(train)
+                    has_discarded = True
+
+        return [train for train in self.trains if train in deadlocked_trains]
+
+    def get_deadlocked_trains_cost(self, total_steps: int) -> float:
+        """
+        Returns the minimum cost the deadlocked trains would add to the simulation over a given number of steps: as they
+        may never move again, each of them keeps adding at least its accumulated cost plus its instant one on every step
+        """
+        return sum(
+            total_steps * train.accumulated_cost + (total_steps * (total_steps + 1) / 2) * train.instant_cost
+            for train in self.deadlocked_trains
+        )
+
     def has_completed_every_train(self):
         """Determines if every train in the simulation has finished its trip (and the queue is empty)"""
         return len(self.trains_queue) == 0 and all([train.has_finished() for train in self.trains])
@@ -294,9 +584,28 @@ class Dispatcher:
             if connection.destiny_section_name == new_section.name
         )
 
+        self.occupancy_dict[train.current_head_section.name].remove(train)
+        new_section_occupancy = self.occupancy_dict[new_section.name]
+        new_section_occupancy.append(train)
+        if len(new_section_occupancy) > 1:
+            # keeps the occupying trains in the same order of the dispatcher trains list
+            new_section_occupancy.sort(key=self.trains.index)
+        self.occupancy_version += 1
+
         train.current_head_section = new_section
         train.relative_position = 1.0 if train.is_reversed else 0.0
 
+    def get_random_actions_count(self):
+        """Returns the number of actions randomly chosen by every train (including the ones already removed)"""
+        return sum(train.random_actions_count for train in self.removed_trains + self.trains)
+
+    def get_trains_actions_history(self):
+        """Returns the names of the actions taken by every train added so far (including the removed ones)"""
+        return {
+            train.prefix: [action['data']['name'] for action in train.actions_history]
+            for train in self.removed_trains + self.trains
+        }
+
     def find_train_by_prefix(self, prefix: str) -> Train:
         """Helper function used to return the train object for a given prefix"""
         return next((train for train in self.trains if train.prefix == prefix), None)
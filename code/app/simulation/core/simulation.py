@@ -1,11 +1,18 @@
 import copy
+import functools
 import json
+import random
 import traceback
 import uuid
 from typing import List, Dict
 
-from app.simulation.exception.error import Error
+from app.simulation.action.all import find_action
+from app.simulation.core.checkpoint import SimulationCheckpoint
+from app.simulation.core.cost_bound import CostBound
+from app.simulation.exception.error import Error, ConflictConditionError, InvalidChoiceError
 from app.simulation.math.dynamics import TimeDynamics
+from app.simulation.model.route import Route
+from app.simulation.model.recording import RecordingLevels
 from app.simulation.model.simulation_results import SimulationResults
 from app.common.logger import generate_logger, LoggerFolders
 from app.simulation.core.dispatcher import Dispatcher
@@ -21,23 +28,64 @@ class Simulation:
         'step_limit_multiplier': 10,
         'cost_limit_multiplier': 10,
         'without_movement_multiplier': 10,
+        'deadlock_multiplier': 10,
+        'detect_deadlocks': False,  # whether to stop as soon as any train may never move again (see Dispatcher)
         'controller_name': 'No Controller',
+        'event_driven': False,
+        'logger_name': None,  # defaults to the simulation uuid (a long-lived worker reuses the same one)
+        'checkpoints': False,  # whether to keep checkpoints (after the action decisions) to be forked later
+        'checkpoints_min_interval': 5,  # minimum number of steps between two checkpoints
+        'recording_level': RecordingLevels.FULL,  # detail of the results registered on each step (see RecordingLevels)
     }
 
-    def __init__(self, route, trains_queue: List = None, trains_actions: Dict = None, **options):
-        """Simulation class constructor"""
+    def __init__(
+        self,
+        route,
+        trains_queue: List = None,
+        trains_actions: Dict = None,
+        seed: int = None,
+        cost_bound: CostBound = None,
+        **options
+    ):
+        """
+        Simulation class constructor. The route may be either a route class (built for this simulation) or an already
+        built route, which may be shared by consecutive simulations, as they don't change it.
+
+        Every random choice of the simulation (trains prefixes and actions) is taken from its own generator, seeded with
+        the given seed (drawn from the global random generator when not given), so it may be replayed from its seed and
+        trains actions alone.
+
+        When a cost bound (the best cost known by a controller) is given, the simulation is pruned (stopped) as soon as
+        its cost passes it, and it publishes its own cost if it completes every train.
+        """
         if trains_actions is None:
             trains_actions = {}
 
         self.uuid = str(uuid.uuid4())
 
-        self.logger = generate_logger(self.uuid, LoggerFolders.SIMULATIONS)
+        # compact inputs of the simulation, used to evaluate (or replay) it in another process
+        self.route_class = type(route) if isinstance(route, Route) else route
+        self.initial_trains_queue = copy.deepcopy(trains_queue)
+        self.trains_actions = trains_actions
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.random = random.Random(self.seed)
+        self.cost_bound = cost_bound
+        self.has_results = True  # whether the frames are available (or the simulation must be replayed to get them)
+        self.outcome_trains_actions = None
+        self.checkpoints: List[SimulationCheckpoint] = []
+        self.checkpoint_actions_count = 0
+
+        self.logger = generate_logger(options.get('logger_name') or self.uuid, LoggerFolders.SIMULATIONS)
 
         self.options = {}
         self.set_options(options)
+        if self.options['recording_level'] not in RecordingLevels.ALL:
+            raise InvalidChoiceError("Unknown recording level '{}' (expected one of: {})".format(
+                self.options['recording_level'], ", ".join(RecordingLevels.ALL)
+            ))
 
         self.error = None
-        self.route = route()
+        self.route = route if isinstance(route, Route) else route()
         self.route.logger = self.logger
 
         self.time_dynamics = TimeDynamics(step_duration=self.options['step_duration'])
@@ -49,7 +97,10 @@ class Simulation:
             time_dynamics=self.time_dynamics,
             sections_mapper=self.route.sections_mapper,
             trains_queue=trains_queue,
-            trains_actions=trains_actions
+            trains_actions=trains_actions,
+            logger=self.logger,
+            random_generator=self.random,
+            detect_deadlocks=self.options['detect_deadlocks']
         )
 
         self.running = False
@@ -59,9 +110,21 @@ class Simulation:
         self.has_reached_no_movement_step_limit = False
         self.has_reached_step_limit = False
         self.has_reached_cost_limit = False
+        self.has_reached_deadlock = False
+        self.has_been_pruned = False
         self.has_aborted = False
 
-        self.results = SimulationResults(simulation=self, controller_name=self.options['controller_name'])
+        self.results = self.create_results()
+
+    def create_results(self):
+        """Creates the results of the simulation, whose full frames (if not recorded) are replayed when requested"""
+        results = SimulationResults(
+            simulation=self,
+            controller_name=self.options['controller_name'],
+            recording_level=self.options['recording_level']
+        )
+        results.frames_loader = functools.partial(Simulation.replay_frames, self.get_evaluation_task(), self.uuid)
+        return results
 
     def get_status_text(self):
         """Retrieves current status of the simulation in a human-friendly way"""
@@ -69,6 +132,10 @@ class Simulation:
             return 'RUNNING'
         if not self.has_finished:
             return 'PAUSED'
+        if self.has_reached_deadlock:
+            return 'DEADLOCK'
+        if self.has_been_pruned:
+            return 'PRUNED'
         return 'SUCCESS' if self.has_completed_every_train else 'FAIL'
 
     def set_options(self, options):
@@ -98,16 +165,32 @@ class Simulation:
                 self.current_step, reason, self.accumulated_cost
             ))
 
-    def step(self):
-        """Performs the full set of actions of a single step"""
+    def step(self, fast_forward=False):
+        """Performs the full set of actions of a single step (or a lean one, when fast-forwarding)"""
         #try:
         if self.running:
             self.time_dynamics.step()
-            self.dispatcher.step()
-            self.results.register_frame(self)
-            self.trains_positions_history.append(self.dispatcher.get_trains_positions())
-            self.accumulated_cost += sum([train.accumulated_cost for train in self.dispatcher.trains])
+            if fast_forward:
+                self.dispatcher.fast_forward_step()
+            else:
+                self.dispatcher.step()
+            self.register_step()
+
+        self.finish_step()
+
+        #except Error as err:
+
+        #    self.stop()
+        #    self.error = str(err)
 
+    def register_step(self):
+        """Registers the results (frame, trains positions and cost) of the step just calculated by the dispatcher"""
+        self.results.register_frame(self)
+        self.trains_positions_history.append(self.dispatcher.get_trains_positions())
+        self.accumulated_cost += sum([train.accumulated_cost for train in self.dispatcher.trains])
+
+    def finish_step(self):
+        """Checks the stop conditions at the end of a step and moves to the next one"""
         if self.current_step > 0 and self.current_step % 1000 == 0:
             self.logger.info("Completed step {}...".format(self.current_step))
 
@@ -118,10 +201,63 @@ class Simulation:
         self.check_stop_conditions()
         self.current_step += 1
 
-        #except Error as err:
+        if self.options['checkpoints'] and self.running:
+            self.check_checkpoint()
 
-        #    self.stop()
-        #    self.error = str(err)
+    def check_checkpoint(self):
+        """Creates a checkpoint if any action was decided since the last one (given the minimum interval)"""
+        actions_count = sum(len(actions) for actions in self.dispatcher.get_trains_actions_history().values())
+        if actions_count == self.checkpoint_actions_count:
+            return
+
+        last_step = self.checkpoints[-1].step if len(self.checkpoints) else 0
+        if self.current_step - last_step < self.options['checkpoints_min_interval']:
+            return
+
+        self.checkpoints.append(SimulationCheckpoint(self))
+        self.checkpoint_actions_count = actions_count
+
+    def find_checkpoint(self, trains_actions: Dict):
+        """Finds the latest checkpoint whose actions taken so far are a prefix of the given trains actions"""
+        return next((checkpoint for checkpoint in reversed(self.checkpoints) if checkpoint.matches(trains_actions)), None)
+
+    def fork(self, from_checkpoint: SimulationCheckpoint, new_actions_queue: Dict, seed: int = None):
+        """
+        Creates a new (paused) simulation resuming from a given checkpoint of this one, with a new set of trains actions
+        (which must start with the actions taken until the checkpoint) and random seed. Running it gives the same
+        results of running a simulation of those trains actions (and seed) from the very beginning, but only the steps
+        after the checkpoint are calculated. The route is shared with this simulation.
+        """
+        if not from_checkpoint.matches(new_actions_queue):
+            raise ConflictConditionError("The trains actions don't match the ones taken until the checkpoint")
+
+        fork = copy.copy(self)
+        fork.uuid = str(uuid.uuid4())
+        fork.trains_actions = new_actions_queue
+        fork.seed = seed if seed is not None else random.getrandbits(32)
+        fork.random = random.Random(fork.seed)
+        fork.has_results = True
+        fork.outcome_trains_actions = None
+        fork.options = copy.deepcopy(self.options)
+        fork.checkpoints = [checkpoint for checkpoint in self.checkpoints if checkpoint.step <= from_checkpoint.step]
+        fork.results = fork.create_results()
+        from_checkpoint.restore(fork)
+        fork.checkpoint_actions_count = sum(len(actions) for actions in from_checkpoint.trains_actions.values())
+
+        # each train resumes with the remaining part of its new actions (the ones not added yet take all of them). As
+        # every action taken until the checkpoint is queued when run from the beginning, none of them was random.
+        dispatcher = fork.dispatcher
+        dispatcher.simulation_uuid = fork.uuid
+        dispatcher.trains_actions = new_actions_queue
+        dispatcher.random_generator = fork.random
+        for train in dispatcher.removed_trains + dispatcher.trains:
+            train.random = fork.random
+            train.random_actions_count = 0
+        for train in dispatcher.trains:
+            train_actions = new_actions_queue.get(train.prefix, [])
+            train.actions_queue = [find_action(action) for action in train_actions[len(train.actions_history):]]
+
+        return fork
 
     def abort(self):
         """Function used to abort the simulation (unexpected stop)"""
@@ -136,9 +272,28 @@ class Simulation:
         self.start()
         while self.running:
             self.step()
+            if self.options['event_driven']:
+                self.fast_forward()
         #except:
         #    self.logger.critical("Exception!", traceback.format_exc())
 
+    def fast_forward(self):
+        """
+        Event-driven mode: skips the decision logic of the dispatcher until the next step where something may change
+        (a train reaching a section end, a queued train being added, an action being chosen or completed, etc.). The
+        skipped steps still integrate the trains positions, times and costs (and register their frames) one by one, so
+        the results are exactly the same as the ones from the fixed-step mode.
+        """
+        steps_to_next_event = self.dispatcher.get_steps_to_next_event()
+
+        total_steps = 0
+        while self.running and total_steps < steps_to_next_event:
+            self.step(fast_forward=True)
+            total_steps += 1
+
+        if total_steps > 0:
+            self.logger.debug("Fast-forwarded {} steps until step {}".format(total_steps, self.current_step))
+
     def check_if_reached_step_limit(self):
         """Helper function used to check if the simulation has reached the step limit"""
         self.has_reached_step_limit = False
@@ -157,6 +312,14 @@ class Simulation:
             self.accumulated_cost = self.accumulated_cost * self.options['cost_limit_multiplier']
             self.stop("Reached cost limit of {:.2E}".format(cost_limit))
 
+        # the cost never decreases, so a simulation which has passed the best known cost may no longer improve it
+        self.has_been_pruned = False
+        if self.cost_bound is not None and self.running:
+            cost_bound = self.cost_bound.get()
+            if self.accumulated_cost > cost_bound and not self.dispatcher.has_completed_every_train():
+                self.has_been_pruned = True
+                self.stop("Pruned, as its cost passed the best known one of {:.2E}".format(cost_bound))
+
     def check_if_reached_no_movement_limit(self):
         """Helper function used to check if the simulation has reached the no-movement trains step limit"""
         self.has_reached_no_movement_step_limit = False
@@ -166,11 +329,29 @@ class Simulation:
             self.accumulated_cost = self.accumulated_cost * self.options['without_movement_multiplier']
             self.stop("Reached {} steps without any movement".format(max_steps_without_movement))
 
+    def check_if_reached_deadlock(self):
+        """Helper function used to check if any train may never move again (so the simulation may never succeed)"""
+        self.has_reached_deadlock = False
+        deadlocked_trains = self.dispatcher.deadlocked_trains
+        if self.options['detect_deadlocks'] and len(deadlocked_trains):
+            self.has_reached_deadlock = True
+
+            # it may never succeed, so it's penalized over the cost it would reach at the step limit (which is at least
+            # the one of its deadlocked trains staying where they are until then)
+            remaining_steps = max(0, self.options['max_steps'] - self.current_step)
+            step_limit_cost = self.options['step_limit_multiplier'] * (
+                self.accumulated_cost + self.dispatcher.get_deadlocked_trains_cost(remaining_steps)
+            )
+            self.accumulated_cost = step_limit_cost * self.options['deadlock_multiplier']
+            self.stop("Reached a deadlock of trains {}".format(", ".join(train.prefix for train in deadlocked_trains)))
+
     def check_if_completed_every_train(self):
         """Helper function used to check if the simulation has completed every train"""
         self.has_completed_every_train = self.dispatcher.has_completed_every_train()
         if self.has_completed_every_train:
             self.stop("Completed every train")
+            if self.cost_bound is not None:
+                self.cost_bound.publish(self.accumulated_cost)
 
     def check_stop_conditions(self):
         """Check the stop conditions"""
@@ -181,6 +362,7 @@ class Simulation:
         self.check_if_reached_step_limit()
         self.check_if_reached_cost_limit()
         self.check_if_reached_no_movement_limit()
+        self.check_if_reached_deadlock()
         self.check_if_completed_every_train()
 
         self.has_finished = any([
@@ -188,9 +370,130 @@ class Simulation:
             self.has_reached_step_limit,
             self.has_reached_cost_limit,
             self.has_reached_no_movement_step_limit,
+            self.has_reached_deadlock,
+            self.has_been_pruned,
             self.has_aborted,
         ])
 
+    def get_trains_actions(self):
+        """Returns the names of the actions taken by each of the trains still in the route (indexed by prefix)"""
+        if self.outcome_trains_actions is not None:
+            return self.outcome_trains_actions
+
+        return {
+            train.prefix: [action['data']['name'] for action in train.actions_history]
+            for train in self.dispatcher.trains
+        }
+
+    def get_evaluation_task(self):
+        """Returns the compact (picklable) inputs needed to evaluate (or replay) the simulation in a worker process"""
+        return {
+            'route': self.route_class,
+            'trains_queue': self.initial_trains_queue,
+            'trains_actions': self.trains_actions,
+            'options': self.options,
+            'seed': self.seed,
+        }
+
+    @staticmethod
+    def from_task(task, route: Route = None, **options):
+        """
+        Creates a simulation from its compact inputs (see get_evaluation_task), optionally overriding some options. An
+        already built route (of the task route class) may be given, to avoid building it again. The cost bound isn't
+        part of the simulation inputs, but a controller may add it to the tasks it sends to be evaluated.
+        """
+        return Simulation(
+            route if route is not None else task['route'],
+            copy.deepcopy(task['trains_queue']),
+            task['trains_actions'],
+            seed=task['seed'],
+            cost_bound=task.get('cost_bound'),
+            **dict(task['options'], **options)
+        )
+
+    @staticmethod
+    def evaluate_task(task, route: Route = None):
+        """Runs a simulation from its compact inputs (see get_evaluation_task), returning its compact outcome"""
+        # only the outcome is sent back, so there's no point in keeping checkpoints
+        simulation = Simulation.from_task(task, route, checkpoints=False)
+        simulation.run()
+        return simulation.get_outcome()
+
+    def get_outcome(self):
+        """Returns the compact outcome of the simulation (costs, status and actions) used by the controllers"""
+        return {
+            'accumulated_cost': self.accumulated_cost,
+            'current_step': self.current_step,
+            'error': self.error,
+            'has_finished': self.has_finished,
+            'has_completed_every_train': self.has_completed_every_train,
+            'has_reached_no_movement_step_limit': self.has_reached_no_movement_step_limit,
+            'has_reached_step_limit': self.has_reached_step_limit,
+            'has_reached_cost_limit': self.has_reached_cost_limit,
+            'has_reached_deadlock': self.has_reached_deadlock,
+            'has_been_pruned': self.has_been_pruned,
+            'has_aborted': self.has_aborted,
+            'trains_actions': self.get_trains_actions(),
+            # when no action was randomly chosen, the outcome doesn't depend on the random seed
+            'random_actions_count': self.dispatcher.get_random_actions_count(),
+        }
+
+    def read_outcome(self, outcome):
+        """Reads the outcome of an evaluation made in a worker process (so the frames must be replayed if needed)"""
+        self.has_results = False
+        self.running = False
+        self.accumulated_cost = outcome['accumulated_cost']
+        self.current_step = outcome['current_step']
+        self.error = outcome['error']
+        self.has_finished = outcome['has_finished']
+        self.has_completed_every_train = outcome['has_completed_every_train']
+        self.has_reached_no_movement_step_limit = outcome['has_reached_no_movement_step_limit']
+        self.has_reached_step_limit = outcome['has_reached_step_limit']
+        self.has_reached_cost_limit = outcome['has_reached_cost_limit']
+        self.has_reached_deadlock = outcome['has_reached_deadlock']
+        self.has_been_pruned = outcome['has_been_pruned']
+        self.has_aborted = outcome['has_aborted']
+        self.outcome_trains_actions = outcome['trains_actions']
+
+    def replay(self):
+        """
+        Runs the simulation again from the beginning (with the same route, trains, actions, options and seed) in a new
+        simulation, which gives exactly the same results of this one (but for a pruned simulation, as the replay runs
+        without the cost bound).
+        """
+        replay = Simulation.from_task(self.get_evaluation_task(), checkpoints=False)
+        replay.uuid = self.uuid
+        replay.results.simulation_uuid = self.uuid
+        replay.run()
+        return replay
+
+    @staticmethod
+    def replay_frames(task, simulation_uuid):
+        """Replays a simulation from its compact inputs (see get_evaluation_task), returning its full frames"""
+        simulation = Simulation.from_task(task, checkpoints=False, recording_level=RecordingLevels.FULL)
+        simulation.uuid = simulation_uuid
+        simulation.run()
+        return simulation.results.frames
+
+    def drop_results(self):
+        """Drops the frames registered so far (e.g. of a losing solution), which are regenerated by get_results"""
+        if self.running:
+            raise ConflictConditionError("The results of a running simulation can't be dropped")
+
+        self.results = self.create_results()
+        self.trains_positions_history = []
+        self.has_results = False
+
+    def get_results(self):
+        """
+        Returns the full results (frames) of the simulation. When they aren't available (it was evaluated in a worker
+        process, so only its outcome is known, or they were dropped), it's replayed locally from its seed.
+        """
+        if not self.has_results:
+            self.results = self.replay().results
+            self.has_results = True
+        return self.results
+
     def get_trains_instant_cost(self):
         """Gets the total instant cost of the dispatcher trains"""
         total_cost = 0.0
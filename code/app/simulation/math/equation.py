@@ -2,31 +2,37 @@ from app.simulation.math.variable import Variable
 
 
 class TrainEquation:
-    def __init__(self, options):
+    def __init__(self, options, train=None):
         """Class constructor"""
         self.train_options = options
         self.time_dynamics = options.time_dynamics
+        self.train = train
 
-        self.velocity = Variable()  # [m/s]
-        self.desired_velocity = 0
+        self.velocity = Variable(memory_size=options.velocity_memory_size)  # [m/s]
+        self._desired_velocity = 0
 
         self.total_power = 1000  # [W]
 
-    def update_velocity(self):
-        """Updates the train velocity"""
-        if self.velocity.value != self.desired_velocity:
-            # we should perform some calculations here
-            self.velocity.value = self.desired_velocity
+    @property
+    def desired_velocity(self) -> float:
+        """Getter for the desired velocity (stored in the train state table, when there's a train)"""
+        if self.train is None:
+            return self._desired_velocity
+        return float(self.train.state.desired_velocity[self.train.row])
 
-    def calculate_next_step_position(self, section_length, last_relative_position):
-        """Calculates the next relative position of the train, based on the section length and on last position"""
-        time_diff = self.time_dynamics.get_step_duration()
-        last_real_position = section_length * last_relative_position
-        new_real_position = self.velocity.value * time_diff + last_real_position
-        return new_real_position / section_length
+    @desired_velocity.setter
+    def desired_velocity(self, value):
+        """Setter for the desired velocity"""
+        if self.train is None:
+            self._desired_velocity = value
+            return
+        self.train.state.desired_velocity[self.train.row] = value
 
     def calculate_cost(self, train, distance_to_goal=0.0):
-        """Calculates the instant cost of a given train and its current distance to the goal"""
+        """
+        Calculates the instant cost of a given train and its current distance to the goal (the same equation is used by
+        TrainsState.update_costs to calculate the costs of every train at once)
+        """
         return float(self.train_options.cost_normalizer * (
             train.odometer * self.train_options.meter_travelled_cost +
             train.traveling_time * self.train_options.traveling_time_cost +
@@ -1,21 +1,36 @@
 import logging
 
+import numpy as np
+
 
 class Variable:
-    """Variable class, used to store and handle variable numeric values (always treated as floats)"""
+    """
+    Variable class, used to store and handle variable numeric values (always treated as floats). The last values are
+    kept in a ring buffer (a preallocated array) with a given depth, which may be 0 to keep no history at all.
+    """
     UNIT_METERS_PER_SECOND = 'm/s'
     UNIT_KILOMETERS_PER_HOUR = 'km/h'
     UNIT_MILES_PER_HOUR = 'mph'
+    DEFAULT_MEMORY_SIZE = 16
 
-    def __init__(self, value=0.0, unit=None):
+    def __init__(self, value=0.0, unit=None, memory_size=DEFAULT_MEMORY_SIZE):
         """Class constructor"""
-        self.memory_size = 1024
-        self.last_values = [None] * self.memory_size
-        self.last_derivative_values = [None] * self.memory_size
+        self.memory_size = max(0, memory_size)
+        self.memory = np.zeros(self.memory_size, dtype=np.float64)
+        self.total_values = 0  # number of values replaced so far (the ones in memory are the last of them)
+        self.previous_value = None
         self.unit = unit
 
         self._value = value
 
+    def __deepcopy__(self, memo):
+        """Copies the variable (its values memory only holds numbers, so a shallow copy of it is enough)"""
+        variable = Variable.__new__(Variable)
+        variable.__dict__.update(self.__dict__)
+        variable.memory = self.memory.copy()
+        memo[id(self)] = variable
+        return variable
+
     @property
     def value(self) -> float:
         """Getter for the variable value"""
@@ -23,9 +38,11 @@ class Variable:
 
     @value.setter
     def value(self, value):
-        """Setter for the variable value"""
-        self.last_values.pop()
-        self.last_values.append(self._value)
+        """Setter for the variable value (the replaced one is kept in the memory)"""
+        if self.memory_size:
+            self.memory[self.total_values % self.memory_size] = self._value
+        self.total_values += 1
+        self.previous_value = self._value
         self._value = value
 
     @value.deleter
@@ -33,6 +50,19 @@ class Variable:
         """Deleter for the variable value"""
         del self._value
 
+    @property
+    def last_values(self) -> np.ndarray:
+        """Gets the values kept in the memory (the replaced ones), from the oldest to the newest"""
+        total_kept = min(self.total_values, self.memory_size)
+        indexes = np.arange(self.total_values - total_kept, self.total_values) % max(1, self.memory_size)
+        return self.memory[indexes]
+
+    def get_derivative(self, interval=1.0) -> float:
+        """Gets the derivative of the variable over a given interval, from its last two values (0 if there's one)"""
+        if self.previous_value is None:
+            return 0.0
+        return (float(self._value) - float(self.previous_value)) / interval
+
     def convert_to_unit(self, new_unit):
         """Convert the value to another unit"""
         if (
@@ -0,0 +1,64 @@
+from typing import Dict
+
+import numpy as np
+
+
+class RecordingLevels:
+    """Levels of detail of the results registered on every step of a simulation"""
+    OFF = 'off'  # only the steps count (the frames are replayed when requested)
+    SUMMARY = 'summary'  # the timestamp and total cost of each step
+    TRAJECTORY = 'trajectory'  # the summary and the numeric state of each train on each step
+    FULL = 'full'  # the full frames (SimulationFrame objects)
+    ALL = (OFF, SUMMARY, TRAJECTORY, FULL)
+
+
+class RecordColumns:
+    """
+    Compact columnar storage (one numpy array per column) of the records registered along a simulation. The arrays are
+    preallocated and doubled when full, so appending a record (or a batch of them) is cheap.
+    """
+
+    def __init__(self, dtypes: Dict, capacity=64):
+        """Class constructor. The columns are given as a dictionary of names and dtypes."""
+        self.dtypes = dtypes
+        self.capacity = max(1, capacity)
+        self.size = 0
+        self.columns = {column: np.zeros(self.capacity, dtype=dtype) for column, dtype in dtypes.items()}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, column) -> np.ndarray:
+        """Gets the used part of a column (a read-only view, as it's shared with the storage)"""
+        values = self.columns[column][:self.size]
+        values.flags.writeable = False
+        return values
+
+    def grow(self, min_capacity):
+        """Doubles the capacity until it reaches a given one"""
+        while self.capacity < min_capacity:
+            self.capacity *= 2
+
+        for column, old_values in self.columns.items():
+            new_values = np.zeros(self.capacity, dtype=old_values.dtype)
+            new_values[:self.size] = old_values[:self.size]
+            self.columns[column] = new_values
+
+    def append(self, count=1, **values):
+        """Appends a given number of records, being each value either a scalar (for all of them) or an array"""
+        if self.size + count > self.capacity:
+            self.grow(self.size + count)
+
+        for column, value in values.items():
+            self.columns[column][self.size:self.size + count] = value
+        self.size += count
+
+    def copy(self):
+        """Copies the used part of the columns into a new storage"""
+        columns = RecordColumns(self.dtypes, capacity=self.size)
+        columns.append(self.size, **{column: values[:self.size] for column, values in self.columns.items()})
+        return columns
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """Gets the used part of every column, by name"""
+        return {column: self[column] for column in self.columns}
@@ -2,6 +2,10 @@ from app.simulation.exception.error import ConflictConditionError, Unprocessable
 
 
 class Section:
+    __slots__ = (
+        'name', 'length', 'flow', 'lines', 'description', 'start_kilometer', 'end_kilometer', 'max_velocity',
+        'connections', 'accessible_connections_cache', 'restrictions', 'interdicted',
+    )
     SECTION_START_STRAIGHT = "start_straight"
     SECTION_START_DEVIATED = "start_deviated"
     SECTION_END_STRAIGHT = "end_straight"
@@ -36,6 +40,7 @@ class Section:
         self.max_velocity = 60  # km/h
 
         self.connections = []
+        self.accessible_connections_cache = {}
         self.read_connections(connections)
 
         self.restrictions = []
@@ -68,6 +73,7 @@ class Section:
                 connection["when_at"]
             )
             self.connections.append(connection_object)
+        self.accessible_connections_cache = {}
 
     def read_restrictions(self, restriction_list):
         for restriction in restriction_list:
@@ -90,8 +96,13 @@ class Section:
 
         return self.max_velocity
 
+    def get_maximum_velocity(self):
+        """Gets the maximum velocity that can be reached at any position of the section"""
+        return max([self.max_velocity] + [restriction.max_velocity for restriction in self.restrictions])
+
     def clear(self):
         self.connections = []
+        self.accessible_connections_cache = {}
         self.flow = "both"
         self.lines = []
         self.start_kilometer = 0.0
@@ -106,7 +117,7 @@ class Section:
         self.interdicted = True
 
     def is_turnout(self):
-        return True if len(self.accessible_connections()) > 2 else False
+        return True if len(self.get_accessible_connections_tuple()) > 2 else False
 
     def get_origin_map(self):
         return [
@@ -131,6 +142,15 @@ class Section:
         self.interdicted = False
 
     def accessible_connections(self, origin="both"):
+        return list(self.get_accessible_connections_tuple(origin))
+
+    def get_accessible_connections_tuple(self, origin="both"):
+        """Gets the (cached) tuple of accessible connections names from a given origin"""
+        if origin not in self.accessible_connections_cache:
+            self.accessible_connections_cache[origin] = self.read_accessible_connections(origin)
+        return self.accessible_connections_cache[origin]
+
+    def read_accessible_connections(self, origin="both"):
         if origin == "both":
             possible_origins = (
                 Section.SECTION_START_STRAIGHT, Section.SECTION_START_DEVIATED,
@@ -143,7 +163,7 @@ class Section:
         else:
             possible_origins = [origin]
 
-        return list(
+        return tuple(
             connection.destiny_section_name for connection in self.connections
             if connection.connection_origin in possible_origins
         )
@@ -178,6 +198,7 @@ class Section:
 
 
 class SectionRestriction:
+    __slots__ = ('start_km', 'end_km', 'start_position', 'end_position', 'max_velocity')
 
     def __init__(self, section: Section, start_km, end_km, max_velocity):
         self.start_km = start_km
@@ -193,6 +214,7 @@ class SectionRestriction:
 
 
 class SectionConnection:
+    __slots__ = ('destiny_section_name', 'connection_origin')
 
     def __init__(
             self,
@@ -0,0 +1,116 @@
+import heapq
+import math
+from types import MappingProxyType
+from typing import List, Tuple
+
+import numpy as np
+
+from app.simulation.model.section import Section
+
+
+class SectionsIndex:
+    """
+    Immutable topology index of a list of sections, compiled once when the sections are read by the mapper.
+
+    Each section receives an integer id (its position in the sections list) and, for both directions (indexed by the
+    `is_reversed` flag), the tuples of next and previous sections are precomputed. The adjacency tuples keep the same
+    ordering of the sections list, so the results match the ones obtained by scanning it.
+
+    The minimum route distances between every pair of sections are also precomputed for both directions, being
+    `distances[is_reversed][start_id, end_id]` the sum of the lengths of the sections in the shortest route (including
+    both start and end sections), or infinite when the end section isn't reachable. From them, the transitive closure of
+    the graph is stored as boolean rows: `sections_after[is_reversed][section_id]` marks every section reachable ahead
+    of a given one and `sections_before[is_reversed][section_id]` every section behind it.
+    """
+    __slots__ = (
+        'sections', 'names', 'ids', 'next_ids', 'previous_ids', 'next_sections', 'previous_sections', 'lengths',
+        'total_length', 'distances', 'sections_after', 'sections_before',
+    )
+
+    def __init__(self, sections: List[Section] = None):
+        """Class constructor. Compiles the index for the given sections."""
+        if sections is None:
+            sections = []
+
+        self.sections: Tuple[Section, ...] = tuple(sections)
+        self.names: Tuple[str, ...] = tuple(section.name for section in self.sections)
+
+        # when there are repeated names, the first section prevails (the same behaviour of a linear scan)
+        ids = {}
+        for section_id, section_name in enumerate(self.names):
+            ids.setdefault(section_name, section_id)
+        self.ids = MappingProxyType(ids)
+
+        # adjacency tuples indexed by the direction: [0] for normal and [1] for reversed
+        self.next_ids = (self.compile_adjacency("end"), self.compile_adjacency("start"))
+        self.previous_ids = (self.next_ids[1], self.next_ids[0])
+        self.next_sections = tuple(self.resolve_adjacency(adjacency) for adjacency in self.next_ids)
+        self.previous_sections = tuple(self.resolve_adjacency(adjacency) for adjacency in self.previous_ids)
+
+        self.lengths: Tuple = tuple(section.length for section in self.sections)
+        self.total_length = sum(self.lengths)
+        self.distances = tuple(self.compile_distances(adjacency) for adjacency in self.next_ids)
+        self.sections_after = tuple(self.compile_reachability(distances) for distances in self.distances)
+        self.sections_before = (self.sections_after[1], self.sections_after[0])
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __setattr__(self, key, value):
+        if hasattr(self, key):
+            raise AttributeError("SectionsIndex is immutable (tried to set '{}')".format(key))
+        super().__setattr__(key, value)
+
+    def compile_adjacency(self, connection_origin: str) -> Tuple[Tuple[int, ...], ...]:
+        """Compiles the tuple of connected section ids (for each section) from a given connection origin"""
+        adjacency = []
+        for section in self.sections:
+            # the ids are sorted to keep the ordering of the sections list
+            connected_names = set(section.get_accessible_connections_tuple(connection_origin))
+            adjacency.append(tuple(sorted(self.ids[name] for name in connected_names if name in self.ids)))
+        return tuple(adjacency)
+
+    def resolve_adjacency(self, adjacency: Tuple[Tuple[int, ...], ...]) -> Tuple[Tuple[Section, ...], ...]:
+        """Converts an adjacency tuple of section ids into a tuple of section objects"""
+        return tuple(
+            tuple(self.sections[section_id] for section_id in connected_ids)
+            for connected_ids in adjacency
+        )
+
+    def compile_distances(self, adjacency: Tuple[Tuple[int, ...], ...]) -> np.ndarray:
+        """
+        Compiles the all-pairs minimum distance matrix for a given adjacency by running Dijkstra from each section.
+        The lengths are accumulated from the start section onwards, so the results are exactly the same as summing the
+        lengths of the sections of the shortest route.
+        """
+        total_sections = len(self.sections)
+        distances = np.full((total_sections, total_sections), math.inf)
+
+        for start_id in range(total_sections):
+            row = distances[start_id]
+            row[start_id] = 0 + self.lengths[start_id]
+            queue = [(row[start_id], start_id)]
+            while queue:
+                distance, section_id = heapq.heappop(queue)
+                if distance > row[section_id]:
+                    continue
+                for next_id in adjacency[section_id]:
+                    next_distance = distance + self.lengths[next_id]
+                    if next_distance < row[next_id]:
+                        row[next_id] = next_distance
+                        heapq.heappush(queue, (next_distance, next_id))
+
+        distances.setflags(write=False)
+        return distances
+
+    @staticmethod
+    def compile_reachability(distances: np.ndarray) -> np.ndarray:
+        """Compiles the boolean reachability matrix (excluding the section itself) from a distance matrix"""
+        reachability = np.isfinite(distances)
+        np.fill_diagonal(reachability, False)
+        reachability.setflags(write=False)
+        return reachability
+
+    def get_id(self, section_name: str, default=None):
+        """Gets the integer id of a section by its name"""
+        return self.ids.get(section_name, default)
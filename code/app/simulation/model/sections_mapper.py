@@ -1,10 +1,14 @@
-import copy
+import hashlib
+import json
 import math
 from logging import Logger
-from typing import List
+from typing import Dict, List
+
+import numpy as np
 
 from app.simulation.exception.error import ConflictConditionError, NotFoundError
 from app.simulation.model.section import Section
+from app.simulation.model.sections_index import SectionsIndex
 from app.common.cache import Cache
 
 
@@ -15,6 +19,7 @@ class SectionsMapper:
         """Class constructor"""
         self.logger = logger
         self.sections = []
+        self.index = SectionsIndex()
         self.cache_module_name = 'SectionsMapper'
         self.read_sections(sections)
 
@@ -26,11 +31,23 @@ class SectionsMapper:
         }
 
     def read_sections(self, sections: List):
-        """Stores a list of sections and checks the route integrity"""
+        """Stores a list of sections and compiles its topology index"""
         if sections is None:
             sections = []
         self.sections = sections
-        self.cache_module_name = 'SectionsMapper_{}'.format(','.join([section.name for section in sections]))
+        self.index = SectionsIndex(sections)
+        self.cache_module_name = 'SectionsMapper_{}'.format(self.get_topology_hash())
+
+    def get_topology_hash(self) -> str:
+        """
+        Gets the content hash of the route topology (its sections and their accessible connections), so the cached
+        values of a route are kept while its topology doesn't change (across scenarios and processes)
+        """
+        topology = [
+            (section.name, section.accessible_connections('start'), section.accessible_connections('end'))
+            for section in self.sections
+        ]
+        return hashlib.sha1(json.dumps(topology).encode()).hexdigest()
 
     def check_integrity(self):
         """
@@ -54,33 +71,39 @@ class SectionsMapper:
 
     def get_next_sections(self, from_section: Section, is_reversed=False):
         """Gets the list of next connected sections from a given section and a direction"""
-        connection_origin = "start" if is_reversed else "end"
-        next_sections_name = from_section.accessible_connections(connection_origin)
-        return [next_section for next_section in self.sections if next_section.name in next_sections_name]
+        section_id = self.index.get_id(from_section.name)
+        if section_id is None:
+            connection_origin = "start" if is_reversed else "end"
+            next_sections_name = from_section.accessible_connections(connection_origin)
+            return [next_section for next_section in self.sections if next_section.name in next_sections_name]
+        return list(self.index.next_sections[bool(is_reversed)][section_id])
 
     def get_previous_sections(self, from_section: Section, is_reversed=False):
         """Gets the list of previous connected sections from a given section and a direction"""
-        connection_origin = "end" if is_reversed else "start"
-        previous_sections_name = from_section.accessible_connections(connection_origin)
-        return [next_section for next_section in self.sections if next_section.name in previous_sections_name]
+        section_id = self.index.get_id(from_section.name)
+        if section_id is None:
+            connection_origin = "end" if is_reversed else "start"
+            previous_sections_name = from_section.accessible_connections(connection_origin)
+            return [next_section for next_section in self.sections if next_section.name in previous_sections_name]
+        return list(self.index.previous_sections[bool(is_reversed)][section_id])
 
-    def get_all_sections_before(self, from_section: Section, is_reversed=False):
-        """Gets all the sections before a given one and a direction"""
-        sections_before = [section.name for section in self.get_previous_sections(from_section, is_reversed)]
+    def get_sections_before_mask(self, from_section: Section, is_reversed=False):
+        """Gets the boolean row (indexed by section id) of all the sections before a given one and a direction"""
+        return self.index.sections_before[bool(is_reversed)][self.get_section_id(from_section)]
 
-        for section in self.get_previous_sections(from_section, is_reversed):
-            sections_before.extend(self.get_all_sections_before(section, is_reversed))
+    def get_sections_after_mask(self, from_section: Section, is_reversed=False):
+        """Gets the boolean row (indexed by section id) of all the sections after a given one and a direction"""
+        return self.index.sections_after[bool(is_reversed)][self.get_section_id(from_section)]
 
-        return list(set(sections_before))
+    def get_all_sections_before(self, from_section: Section, is_reversed=False):
+        """Gets all the sections before a given one and a direction"""
+        mask = self.get_sections_before_mask(from_section, is_reversed)
+        return [self.index.names[section_id] for section_id in np.flatnonzero(mask)]
 
     def get_all_sections_after(self, from_section: Section, is_reversed=False):
         """Gets all the sections after a given one and a direction"""
-        sections_after = [section.name for section in self.get_next_sections(from_section, is_reversed)]
-
-        for section in self.get_next_sections(from_section, is_reversed):
-            sections_after.extend(self.get_all_sections_after(section, is_reversed))
-
-        return list(set(sections_after))
+        mask = self.get_sections_after_mask(from_section, is_reversed)
+        return [self.index.names[section_id] for section_id in np.flatnonzero(mask)]
 
     def get_routes_between_sections(
         self,
@@ -90,18 +113,23 @@ class SectionsMapper:
         chain: List = None,
     ):
         """
-        Returns a list of lists, each one representing a set of sections that describes a possible route between
-        the start section and the end section.
+        Returns a tuple of tuples, each one representing a set of sections that describes a possible route between
+        the start section and the end section. They're frozen as they're cached, so they must not be changed.
         """
         if start_section is None or end_section is None:
             return []
 
+        # reached the goal, returns the current chain as the only route (with no need to look it up in the cache)
+        if start_section == end_section:
+            return (tuple(chain or []) + (start_section.name,),)
+
         cache_key = "get_routes_between_sections_{}_{}_{}_{}".format(
             start_section.name, end_section.name, is_reversed,
             ';'.join(chain) if chain is not None else '[]'
         )
-        if Cache.get_from_key(self.cache_module_name, cache_key) is not None:
-             return Cache.get_from_key(self.cache_module_name, cache_key)
+        cached_routes = Cache.get_from_key(self.cache_module_name, cache_key)
+        if cached_routes is not None:
+            return cached_routes
 
         routes = []
 
@@ -110,43 +138,66 @@ class SectionsMapper:
             chain = []
         chain.append(start_section.name)
 
-        # reached the goal, appends current chain to the routes list and early return
-        if start_section == end_section:
-            routes.append(copy.deepcopy(chain))
-            return routes
-
         # if not reached the goal, iterate recursively through the next possible sections ...
         for next_section in self.get_next_sections(start_section, is_reversed):
-            next_routes = self.get_routes_between_sections(next_section, end_section, is_reversed, copy.deepcopy(chain))
+            next_routes = self.get_routes_between_sections(next_section, end_section, is_reversed, list(chain))
             # ... extending the list of routes with any of the connections that reaches the goal
             if next_routes:
                 routes.extend(next_routes)
 
-        # finally return the list of routes
-        Cache.save_to_key(self.cache_module_name, cache_key, routes)
-        return routes
+        # finally return the routes, frozen as they're cached (so they're shared without being copied)
+        return Cache.save_to_key(self.cache_module_name, cache_key, routes)
 
     def get_distance_between_sections(self, start_section, end_section, is_reversed=False):
         """Returns the minimum possible route distance between two sections and a direction"""
-        cache_key = "get_distance_between_sections_{}_{}_{}".format(start_section.name, end_section.name, is_reversed)
-        if Cache.get_from_key(self.cache_module_name, cache_key) is not None:
-            return Cache.get_from_key(self.cache_module_name, cache_key)
-
-        routes = self.get_routes_between_sections(start_section, end_section, is_reversed)
-        routes_lengths = [
-            sum([self.find_section_by_name(section).length for section in route])
-            for route in routes
-        ]
-        if not routes_lengths:
+        start_id = self.index.get_id(start_section.name)
+        end_id = self.index.get_id(end_section.name)
+        if start_id is None or end_id is None:
             return math.inf
-        min_distance = min(routes_lengths)
 
-        Cache.save_to_key(self.cache_module_name, cache_key, min_distance)
-        return min_distance
+        return float(self.index.distances[bool(is_reversed)][start_id, end_id])
 
-    def count_total_routes_between_sections(self, start_section, end_section, is_reversed=False):
-        """Returns the number of routes between two given sections"""
-        return len(self.get_routes_between_sections(start_section, end_section, is_reversed))
+    def count_total_routes_between_sections(self, start_section, end_section, is_reversed=False, counts: Dict = None):
+        """
+        Returns the number of routes between two given sections, counted without enumerating them: by dynamic
+        programming over the directed sections graph, the routes from a section are the sum of the routes from each of
+        its next sections which reach the end section. The given counts (by section id) are shared by the calls with
+        the same end section and direction. A cycle in the routes (which would make them endless) raises an error.
+        """
+        start_id = self.index.get_id(start_section.name)
+        end_id = self.index.get_id(end_section.name)
+        if start_id is None or end_id is None:
+            return len(self.get_routes_between_sections(start_section, end_section, is_reversed))
+
+        if counts is None:
+            counts = {}
+        counts[end_id] = 1
+        direction = bool(is_reversed)
+        adjacency = self.index.next_ids[direction]
+        reaches_end = self.index.sections_after[direction][:, end_id]
+
+        # iterative depth-first search, keeping the sections of the current path to detect the cycles
+        path = [start_id]
+        stack = [iter(adjacency[start_id])]
+        while start_id not in counts and len(stack):
+            section_id = next(stack[-1], None)
+            if section_id is None:
+                section_id = path.pop()
+                stack.pop()
+                counts[section_id] = sum(
+                    counts[next_id] for next_id in adjacency[section_id] if next_id == end_id or reaches_end[next_id]
+                )
+            elif section_id in counts or not (section_id == end_id or reaches_end[section_id]):
+                continue
+            elif section_id in path:
+                cycle = path[path.index(section_id):] + [section_id]
+                raise ConflictConditionError("Endless routes between sections {} and {} through the cycle {}".format(
+                    start_section.name, end_section.name, " -> ".join(self.index.names[cycle_id] for cycle_id in cycle)
+                ))
+            else:
+                path.append(section_id)
+                stack.append(iter(adjacency[section_id]))
+        return counts[start_id]
 
     def check_endpoint_integrity(self, endpoint: Section, look_reversed=False):
         """
@@ -158,32 +209,36 @@ class SectionsMapper:
             if not section.accessible_connections(opposite_origin) and not section == endpoint
         ]
 
+        # the counts of the routes reaching the endpoint (in the opposite direction) are shared by every destiny
+        counts_to_endpoint = {}
+        offending_endpoints = []
         for destiny_section in opposite_endpoints:
             routes_normal = self.count_total_routes_between_sections(endpoint, destiny_section, look_reversed)
-            routes_opposite = self.count_total_routes_between_sections(destiny_section, endpoint, not look_reversed)
+            routes_opposite = self.count_total_routes_between_sections(
+                destiny_section, endpoint, not look_reversed, counts_to_endpoint
+            )
 
             if routes_normal != routes_opposite:
+                offending_endpoints.append(
+                    "starting at section {} and ending at section {}, there are {} routes in normal direction, and {} "
+                    "in the opposite one".format(endpoint.name, destiny_section.name, routes_normal, routes_opposite)
+                )
 
-                for section in self.sections:
-                    print(section.name)
-                    print("section: {} endpoint: {} destiny_section: {} look_reverded: {}".format(
-                        section.name, endpoint.name, destiny_section.name, look_reversed
-                    ))
-                    print(self.get_routes_between_sections(endpoint, destiny_section, look_reversed))
-                    print(self.get_routes_between_sections(destiny_section, endpoint, not look_reversed))
-
-
+        if len(offending_endpoints):
+            raise ConflictConditionError("Conectivity integrity error: {}.".format("; ".join(offending_endpoints)))
 
-                raise ConflictConditionError(
-                    "Conectivity integrity error: starting at section {} and ending at section {}, there are {} routes in normal direction, and {} in the opposite one."
-                    .format(endpoint.name, destiny_section.name, routes_normal, routes_opposite)
-                )
+    def get_section_id(self, section: Section) -> int:
+        """Gets the integer id of a given section in the topology index"""
+        section_id = self.index.get_id(section.name)
+        if section_id is None:
+            raise NotFoundError("Section {} wasn't found!".format(section.name))
+        return section_id
 
     def find_section_by_name(self, section_name):
         """Finds one section by its name"""
-        for section in self.sections:
-            if section.name == section_name:
-                return section
+        section_id = self.index.get_id(section_name)
+        if section_id is not None:
+            return self.index.sections[section_id]
         raise NotFoundError("Section {} wasn't found!".format(section_name))
 
     def get_next_turnout(self, from_section: Section, is_reversed=False):
@@ -193,10 +248,11 @@ class SectionsMapper:
             if cursor_at.is_turnout():
                 return cursor_at
 
-            if not len(self.get_next_sections(cursor_at, is_reversed)):
+            next_sections = self.get_next_sections(cursor_at, is_reversed)
+            if not len(next_sections):
                 return None
 
-            cursor_at = self.get_next_sections(cursor_at, is_reversed)[0]
+            cursor_at = next_sections[0]
 
     def get_previous_turnout(self, from_section: Section, is_reversed=False):
         """Gets the first previous turnout section behind a given section and a direction"""
@@ -205,7 +261,8 @@ class SectionsMapper:
             if cursor_at.is_turnout():
                 return cursor_at
 
-            if not len(self.get_previous_sections(cursor_at, is_reversed)):
+            previous_sections = self.get_previous_sections(cursor_at, is_reversed)
+            if not len(previous_sections):
                 return None
 
-            cursor_at = self.get_previous_sections(cursor_at, is_reversed)[0]
+            cursor_at = previous_sections[0]
@@ -1,52 +1,171 @@
 import logging
 
+import numpy as np
+
+from app.simulation.model.recording import RecordColumns, RecordingLevels
 from app.simulation.model.simulation_frame import SimulationFrame
 
 
 class SimulationResults:
+    """
+    Results registered on every step of a simulation, with a given recording level (see RecordingLevels). Below the
+    full level, the frames aren't built while the simulation runs: a compact summary (and the trains trajectories) are
+    appended to numeric columns instead, and the full frames are materialized only when requested, by replaying the
+    simulation (see `frames_loader`).
+    """
+    SUMMARY_COLUMNS = {
+        'step': np.int64,
+        'timestamp': np.float64,
+        'total_cost': np.float64,
+        'trains_finished': bool,
+    }
+    TRAJECTORY_COLUMNS = {
+        'step': np.int64,
+        'train_id': np.int64,
+        'section_id': np.int64,
+        'relative_position': np.float64,
+        'velocity': np.float64,
+        'accumulated_cost': np.float64,
+    }
 
-    def __init__(self, simulation, frames=None, controller_name='Undefined Controller'):
+    def __init__(self, simulation, frames=None, controller_name='Undefined Controller',
+                 recording_level=RecordingLevels.FULL):
         self.logger = logging.getLogger(__name__)
         self.route_name = simulation.route.name
         self.simulation_uuid = simulation.uuid
+        self.seed = simulation.seed  # random seed of the simulation, which may be replayed from it
         self.controller_name = controller_name
+        self.recording_level = recording_level
         self.calculated_time_elapsed = simulation.time_dynamics.get_elapsed_time()
         self.has_finished = simulation.has_finished
-        self.frames = [frame.serialize() for frame in frames] if frames is not None else []
+        self.total_frames = len(frames) if frames is not None else 0
         self.sections = [section.serialize() for section in simulation.route.sections_mapper.sections]
         self.trains_log = []
+        self.trains_ids = {}  # id of each train (its position in the trains log) by prefix
+        # total cost and whether every train had finished at the last registered frame (recorded at every level)
+        self.last_total_cost = None
+        self.all_trains_finished = None
+
+        self._frames = None
+        if frames is not None:
+            self._frames = [frame.serialize() for frame in frames]
+        elif recording_level == RecordingLevels.FULL:
+            self._frames = []
+        self.frames_loader = None  # function returning the full frames, when they aren't recorded
+        self.summary = RecordColumns(self.SUMMARY_COLUMNS)
+        self.trajectory = RecordColumns(self.TRAJECTORY_COLUMNS)
+
+    @property
+    def frames(self):
+        """Full frames of the simulation (materialized by the frames loader when they weren't recorded)"""
+        if self._frames is None:
+            self._frames = self.frames_loader() if self.frames_loader is not None else []
+        return self._frames
+
+    @frames.setter
+    def frames(self, frames):
+        self._frames = frames
 
     def reset(self):
-        del self.frames[:]
+        self._frames = [] if self.recording_level == RecordingLevels.FULL else None
         del self.trains_log[:]
+        self.trains_ids.clear()
+        self.total_frames = 0
+        self.last_total_cost = None
+        self.all_trains_finished = None
+        self.summary = RecordColumns(self.SUMMARY_COLUMNS)
+        self.trajectory = RecordColumns(self.TRAJECTORY_COLUMNS)
 
     def register_frame(self, simulation):
-        frame = SimulationFrame(simulation, len(self.frames))
-        self.frames.append(frame)
+        trains = simulation.dispatcher.trains
+        for train in trains:
+            if train.prefix not in self.trains_ids:
+                self.trains_ids[train.prefix] = len(self.trains_log)
+                self.trains_log.append(train.prefix)
 
-        for train in frame.trains:
-            if train["prefix"] not in self.trains_log:
-                self.trains_log.append(train["prefix"])
+        self.last_total_cost = simulation.accumulated_cost
+        self.all_trains_finished = all(train.has_finished() for train in trains)
 
+        if self.recording_level == RecordingLevels.FULL:
+            self._frames.append(SimulationFrame(simulation, self.total_frames))
+        elif self.recording_level != RecordingLevels.OFF:
+            self.summary.append(
+                step=self.total_frames,
+                timestamp=simulation.time_dynamics.get_current_timestamp(),
+                total_cost=self.last_total_cost,
+                trains_finished=self.all_trains_finished,
+            )
+
+        if self.recording_level == RecordingLevels.TRAJECTORY and len(trains):
+            trains_state = simulation.dispatcher.trains_state
+            rows = trains_state.rows
+            self.trajectory.append(
+                len(trains),
+                step=self.total_frames,
+                train_id=[self.trains_ids[train.prefix] for train in trains],
+                section_id=trains_state.section_id[rows],
+                relative_position=trains_state.relative_position[rows],
+                velocity=trains_state.velocity[rows],
+                accumulated_cost=trains_state.accumulated_cost[rows],
+            )
+
+        self.total_frames += 1
         self.calculated_time_elapsed = simulation.time_dynamics.get_elapsed_time()
         self.has_finished = simulation.has_finished
 
+    def get_state(self):
+        """Gets a copy of the registered results (used by the simulation checkpoints)"""
+        return {
+            'frames': list(self._frames) if self._frames is not None else None,
+            'trains_log': list(self.trains_log),
+            'trains_ids': dict(self.trains_ids),
+            'total_frames': self.total_frames,
+            'last_total_cost': self.last_total_cost,
+            'all_trains_finished': self.all_trains_finished,
+            'summary': self.summary.copy(),
+            'trajectory': self.trajectory.copy(),
+        }
+
+    def set_state(self, state):
+        """Restores a copy of the registered results (see get_state)"""
+        self._frames = list(state['frames']) if state['frames'] is not None else None
+        self.trains_log = list(state['trains_log'])
+        self.trains_ids = dict(state['trains_ids'])
+        self.total_frames = state['total_frames']
+        self.last_total_cost = state['last_total_cost']
+        self.all_trains_finished = state['all_trains_finished']
+        self.summary = state['summary'].copy()
+        self.trajectory = state['trajectory'].copy()
+
+    def get_trajectory(self):
+        """Gets the trajectory columns (one record per train and step), only recorded at the trajectory level"""
+        return self.trajectory.to_dict()
+
     def serialize(self):
         return {
             "route_name": self.route_name,
             "sections": self.sections,
             "simulation_uuid": self.simulation_uuid,
+            "seed": self.seed,
             "final_total_cost": self.get_last_total_cost(),
             "final_status": self.get_final_status(),
             "frames": [frame.serialize() for frame in self.frames],
         }
 
     def get_last_total_cost(self):
+        # the frames are only read when the results weren't registered (but given)
+        if self.last_total_cost is not None:
+            return float(self.last_total_cost)
         if len(self.frames) == 0:
             return 0
         return self.frames[-1].total_cost
 
     def get_final_status(self):
+        if self.all_trains_finished is not None:
+            return "SUCCESS" if self.all_trains_finished else "FAIL"
+        if len(self.frames) == 0:
+            return "FAIL"
+
         all_trains_finished = True
         for train in self.frames[-1].trains:
             if not train["finished"]:
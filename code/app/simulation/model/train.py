@@ -3,78 +3,143 @@ import random
 import string
 from typing import List
 
-from app.common.options import BaseOptions
 from app.simulation.math.dynamics import TimeDynamics
 from app.simulation.math.equation import TrainEquation
 from app.simulation.model.section import Section
-
-
-class TrainOptions(BaseOptions):
-    """Base class for setting/getting train options"""
-    action_cost: float = 100
-    allow_reverse_action: bool = False
-    cost_normalizer: float = 1e-9
-    direction: str = 'normal'  # normal | reverse
-    distance_to_goal_cost: float = 0.5
-    finish_section: Section = None
-    length: int = 100
-    may_invade_interdicted_sections = False
-    meter_travelled_cost: float = 0.2
-    prefix: str = None
-    prefix_format: str = 'A00'
-    priority: int = 1  # min: 1
-    start_relative_position = 0.5
-    start_section: Section = None
-    stopped_time_cost: float = 0.3
-    time_dynamics: TimeDynamics = None
-    traveling_time_cost: float = 0.4
-    weight: float = 1e6
+from app.simulation.model.trains_state import TrainsState, TrainStateColumn
+
+
+class TrainOptions:
+    """
+    Typed container of the train options (slotted, as there's one for each train). Any other given option (e.g. the
+    step to add the train) is kept as is and may still be read as an attribute.
+    """
+    action_cost: float
+    allow_reverse_action: bool
+    cost_normalizer: float
+    direction: str  # normal | reverse
+    distance_to_goal_cost: float
+    finish_section: Section
+    length: int
+    may_invade_interdicted_sections: bool
+    meter_travelled_cost: float
+    prefix: str
+    prefix_format: str
+    priority: int  # min: 1
+    random_generator: random.Random  # generator of the random choices (the global one when not given)
+    start_relative_position: float
+    start_section: Section
+    stopped_time_cost: float
+    time_dynamics: TimeDynamics
+    traveling_time_cost: float
+    velocity_memory_size: int  # number of past velocities kept (0 keeps none)
+    weight: float
+
+    DEFAULTS = {
+        'action_cost': 100,
+        'allow_reverse_action': False,
+        'cost_normalizer': 1e-9,
+        'direction': 'normal',
+        'distance_to_goal_cost': 0.5,
+        'finish_section': None,
+        'length': 100,
+        'may_invade_interdicted_sections': False,
+        'meter_travelled_cost': 0.2,
+        'prefix': None,
+        'prefix_format': 'A00',
+        'priority': 1,
+        'random_generator': None,
+        'start_relative_position': 0.5,
+        'start_section': None,
+        'stopped_time_cost': 0.3,
+        'time_dynamics': None,
+        'traveling_time_cost': 0.4,
+        'velocity_memory_size': 16,
+        'weight': 1e6,
+    }
+    __slots__ = tuple(DEFAULTS) + ('extra_options',)
+
+    def __init__(self, **options):
+        """Class constructor"""
+        for option_name, default_value in self.DEFAULTS.items():
+            setattr(self, option_name, options.pop(option_name, default_value))
+        self.extra_options = options
+
+    def __getattr__(self, option_name):
+        """Reads the other options (only called when the attribute isn't one of the typed options)"""
+        if option_name == 'extra_options':
+            raise AttributeError(option_name)
+        try:
+            return self.extra_options[option_name]
+        except KeyError:
+            raise AttributeError("Train option '{}' wasn't given".format(option_name))
 
 
 class Train:
+    __slots__ = (
+        'options', 'state', 'row', 'executing_action', 'time_dynamics', 'train_equation', 'rolling_stock',
+        '_current_head_section', 'current_tail_section', 'section_start', 'routes_between_closest_turnouts',
+        'next_straight_section', 'next_deviated_section', 'next_turnout_section', 'previous_straight_section',
+        'previous_deviated_section', 'previous_turnout_section', 'possible_actions', 'possible_actions_key',
+        'trains_ahead', 'trains_behind', 'actions_queue', 'actions_history', 'random_actions_count', 'random',
+        'sections_history', 'acceleration_leveler', 'operative', 'prefix',
+    )
+    logger = logging.getLogger(__name__)
+
+    # numeric state, stored in a row of a TrainsState table (shared by every train of a dispatcher)
+    relative_position = TrainStateColumn('relative_position')
+    odometer = TrainStateColumn('odometer')  # [m]
+    traveling_time = TrainStateColumn('traveling_time')  # [s]
+    stopped_time = TrainStateColumn('stopped_time')  # [s]
+    last_accumulated_cost = TrainStateColumn('last_accumulated_cost')
+    accumulated_cost = TrainStateColumn('accumulated_cost')
+    instant_cost = TrainStateColumn('instant_cost')
+    is_reversed = TrainStateColumn('is_reversed', bool)
 
     def __init__(
         self,
         **options
     ):
         """Train class constructor"""
-        self.logger = logging.getLogger(__name__)
         self.options = TrainOptions(**options)
 
+        # until attached to a dispatcher table, the train state is stored in its own (single row) table
+        self.state = TrainsState(capacity=1)
+        self.row = self.state.add_row(self)
+        self.read_state_constants()
+
         self.executing_action = None
 
         self.time_dynamics = self.options.time_dynamics
-        self.train_equation = TrainEquation(self.options)
-        self.rolling_stock = []
+        self.train_equation = TrainEquation(self.options, self)
+        self.rolling_stock = ()
 
+        self._current_head_section = None
         self.current_head_section = self.options.start_section
         self.current_tail_section = None
         self.section_start = Section.SECTION_END_STRAIGHT
 
-        self.routes_between_closest_turnouts = []
+        self.routes_between_closest_turnouts = ()
         self.next_straight_section = None
         self.next_deviated_section = None
         self.next_turnout_section = None
         self.previous_straight_section = None
         self.previous_deviated_section = None
         self.previous_turnout_section = None
-        self.possible_actions = []
+        self.possible_actions = ()
+        self.possible_actions_key = None  # inputs of the last possible actions evaluation (see Dispatcher)
 
-        self.trains_ahead: List[Train] = []
-        self.trains_behind: List[Train] = []
+        # the lists which are always replaced (never changed in place) start as the shared empty tuple
+        self.trains_ahead: List[Train] = ()
+        self.trains_behind: List[Train] = ()
 
         self.actions_queue = []
         self.actions_history = []
-        self.sections_history = []
+        self.random_actions_count = 0  # number of actions randomly chosen (not taken from the actions queue)
+        self.random = self.options.random_generator if self.options.random_generator is not None else random
+        self.sections_history = ()
 
         self.acceleration_leveler = 0.0  # -1.0 to +1.0
-        self.odometer = 0.0  # [m]
-        self.traveling_time = 0.0  # [s]
-        self.stopped_time = 0.0  # [s]
-
-        self.last_accumulated_cost = 0.0
-        self.accumulated_cost = 0.0
-        self.instant_cost = 0.0
 
         self.relative_position = self.options.start_relative_position
         self.operative = True
@@ -89,6 +154,28 @@ class Train:
         """As the prefix is the unique index, we use it to display a Train object"""
         return "<Train_{}>".format(self.prefix)
 
+    @property
+    def current_head_section(self) -> Section:
+        """Getter for the current head section"""
+        return self._current_head_section
+
+    @current_head_section.setter
+    def current_head_section(self, section: Section):
+        """Setter for the current head section (also updating its id in the state table)"""
+        self._current_head_section = section
+        self.state.section_id[self.row] = self.state.get_section_id(section)
+
+    def read_state_constants(self):
+        """Copies the options used by the vectorized cost calculation into the state table"""
+        self.state.priority[self.row] = self.options.priority
+        self.state.length[self.row] = self.options.length
+        self.state.cost_normalizer[self.row] = self.options.cost_normalizer
+        self.state.meter_travelled_cost[self.row] = self.options.meter_travelled_cost
+        self.state.traveling_time_cost[self.row] = self.options.traveling_time_cost
+        self.state.stopped_time_cost[self.row] = self.options.stopped_time_cost
+        self.state.distance_to_goal_cost[self.row] = self.options.distance_to_goal_cost
+        self.state.action_cost[self.row] = self.options.action_cost
+
     def serialize(self):
         """Serializes the train"""
         return {
@@ -153,22 +240,22 @@ class Train:
 
         for char in self.options.prefix_format:
             if char == 'A':
-                generated_prefix.append(random.choice(string.ascii_uppercase))
+                generated_prefix.append(self.random.choice(string.ascii_uppercase))
             elif char == '0':
-                generated_prefix.append(random.choice(string.digits))
+                generated_prefix.append(self.random.choice(string.digits))
 
         return "".join(generated_prefix)
 
     def step(self):
-        """Performs the calculations for a simulation step"""
+        """
+        Performs the non-vectorized calculations for a simulation step (the velocity, position and times are integrated
+        for every train at once by the dispatcher, through the TrainsState table)
+        """
         self.check_condition()
-        self.train_equation.update_velocity()
-        self.update_position()
 
         if self.operative:
             self.check_executing_action()
 
-        self.update_times()
         self.log_status()
 
     def check_condition(self):
@@ -179,21 +266,6 @@ class Train:
                 self.operative = False
                 break
 
-    def update_position(self):
-        """Update trains relative position to section (and also the odometer)"""
-        new_position = self.train_equation.calculate_next_step_position(
-            self.current_head_section.length,
-            self.relative_position
-        )
-
-        if new_position < 0:
-            new_position = 0.0
-        elif new_position > 1:
-            new_position = 1.0
-
-        self.odometer += abs(self.current_head_section.length * (new_position - self.relative_position))
-        self.relative_position = new_position
-
     def is_at_section_end(self):
         """Check if train is at current section end"""
         return (
@@ -227,7 +299,8 @@ class Train:
                 return
 
         # by default, take a random action
-        self.set_action(random.choice(self.possible_actions))
+        self.random_actions_count += 1
+        self.set_action(self.random.choice(self.possible_actions))
 
     def go_at_maximum_speed(self):
         """Sets the desired velocity to the maximum possible one for current section/position"""
@@ -248,18 +321,12 @@ class Train:
             'accumulated_cost': self.accumulated_cost,
             'instant_cost': self.instant_cost,
         })
+        self.state.total_actions[self.row] = len(self.actions_history)
 
         self.logger.debug("Train {} took {} action at {:.2f} of section {} @ step {}".format(
             self.prefix, action.name, self.relative_position, current_section.name, self.time_dynamics.current_step
         ))
 
-    def update_times(self):
-        """Updates train time recorders"""
-        if self.train_equation.velocity != 0:
-            self.traveling_time += self.time_dynamics.step_duration
-        else:
-            self.stopped_time += self.time_dynamics.step_duration
-
     def log_status(self):
         """Logs train status"""
         self.logger.debug(
@@ -0,0 +1,276 @@
+import math
+from typing import List
+
+import numpy as np
+
+
+class TrainsColumns:
+    """
+    Base class for the struct-of-arrays tables of trains numeric state. Every column is a numpy array whose last axis
+    are the train rows, and the batched updates work on a given selection of them (`rows`), being a slice for a single
+    table or a boolean mask for a table of several simulations. As the operations are element-wise, the results are
+    exactly the same whatever the selection shape is.
+    """
+    FLOAT_COLUMNS = (
+        'relative_position',
+        'velocity',
+        'desired_velocity',
+        'odometer',
+        'traveling_time',
+        'stopped_time',
+        'last_accumulated_cost',
+        'accumulated_cost',
+        'instant_cost',
+        # constants (read from the train options when attached)
+        'priority',
+        'length',
+        'cost_normalizer',
+        'meter_travelled_cost',
+        'traveling_time_cost',
+        'stopped_time_cost',
+        'distance_to_goal_cost',
+        'action_cost',
+    )
+    INT_COLUMNS = (
+        'section_id',
+        'finish_section_id',
+        'total_actions',
+    )
+    BOOL_COLUMNS = (
+        'is_reversed',
+    )
+
+    @staticmethod
+    def all_columns():
+        """Returns the name of every column of the table"""
+        return TrainsColumns.FLOAT_COLUMNS + TrainsColumns.INT_COLUMNS + TrainsColumns.BOOL_COLUMNS
+
+    def allocate_columns(self, shape):
+        """Allocates every column (filled with zeros) with a given shape"""
+        for column in self.FLOAT_COLUMNS:
+            setattr(self, column, np.zeros(shape, dtype=np.float64))
+        for column in self.INT_COLUMNS:
+            setattr(self, column, np.zeros(shape, dtype=np.int64))
+        for column in self.BOOL_COLUMNS:
+            setattr(self, column, np.zeros(shape, dtype=bool))
+
+    def update_velocities(self, rows):
+        """Sets the trains velocities to the desired ones, returning a boolean array marking the changed ones"""
+        changed = np.zeros(self.velocity.shape, dtype=bool)
+        changed[rows] = self.velocity[rows] != self.desired_velocity[rows]
+        self.velocity[rows] = self.desired_velocity[rows]
+        return changed
+
+    def update_positions(self, rows, sections_lengths: np.ndarray, step_duration):
+        """Integrates the trains relative positions (limited to the section boundaries) and odometers"""
+        trains_sections_lengths = sections_lengths[self.section_id[rows]]
+        last_relative_position = self.relative_position[rows]
+        last_real_position = trains_sections_lengths * last_relative_position
+        new_real_position = self.velocity[rows] * step_duration + last_real_position
+        new_position = np.clip(new_real_position / trains_sections_lengths, 0.0, 1.0)
+
+        self.odometer[rows] += np.abs(trains_sections_lengths * (new_position - last_relative_position))
+        self.relative_position[rows] = new_position
+
+    def update_times(self, rows, step_duration):
+        """Updates the trains time recorders"""
+        # The original per-train check compared the velocity Variable object itself with zero (so it was always
+        # different), meaning that every step has always been accounted as traveling time. It's kept as is to preserve
+        # the costs of the simulations.
+        self.traveling_time[rows] += step_duration
+
+    def update_costs(self, rows, distances_to_goal: np.ndarray):
+        """Updates the trains instant and accumulated costs (the same equation of TrainEquation.calculate_cost)"""
+        self.last_accumulated_cost[rows] = self.accumulated_cost[rows]
+        cost = self.cost_normalizer[rows] * (
+            self.odometer[rows] * self.meter_travelled_cost[rows] +
+            self.traveling_time[rows] * self.traveling_time_cost[rows] +
+            self.stopped_time[rows] * self.stopped_time_cost[rows] +
+            distances_to_goal * self.distance_to_goal_cost[rows] +
+            self.total_actions[rows] * self.action_cost[rows]
+        )
+        self.instant_cost[rows] = self.priority[rows] * cost
+        self.accumulated_cost[rows] += self.instant_cost[rows]
+
+    def get_distances_to_goal(self, rows, sections_index, sections_lengths: np.ndarray):
+        """Calculates the trains distances to their goals (the vectorized Dispatcher.get_train_distance_to_goal)"""
+        sections_ids = self.section_id[rows]
+        finish_sections_ids = self.finish_section_id[rows]
+        is_reversed = self.is_reversed[rows]
+        relative_position = self.relative_position[rows]
+        trains_sections_lengths = sections_lengths[sections_ids]
+
+        distances = sections_index.distances
+        total_distance = (
+            np.where(
+                is_reversed,
+                distances[1][sections_ids, finish_sections_ids],
+                distances[0][sections_ids, finish_sections_ids]
+            ) - np.where(
+                is_reversed,
+                (1 - relative_position) * trains_sections_lengths,
+                relative_position * trains_sections_lengths
+            ) - sections_lengths[finish_sections_ids] + self.length[rows]
+        )
+        total_distance[total_distance == math.inf] = 2 * sections_index.total_length
+        return total_distance
+
+
+class TrainsState(TrainsColumns):
+    """
+    Struct-of-arrays storage for the numeric state of a set of trains, one row per train (in the same order they were
+    attached). It allows the kinematics, times and costs of every train to be integrated as a batch, while each
+    `Train` object just reads and writes its own row through `TrainStateColumn` descriptors.
+
+    The table may also be bound to a `TrainsStateBatch`, becoming a view over one of its lines.
+    """
+
+    def __init__(self, sections_index=None, capacity=8):
+        """Class constructor. The sections index (if any) is used to resolve the sections ids."""
+        self.sections_index = sections_index
+        self.capacity = max(1, capacity)
+        self.size = 0
+        self.trains = []
+        self.batch = None
+        self.allocate_columns(self.capacity)
+
+    @property
+    def rows(self):
+        """Selection of the used rows of the table"""
+        return slice(0, self.size)
+
+    def get_section_id(self, section) -> int:
+        """Gets the id of a given section in the sections index (-1 if unknown)"""
+        if section is None or self.sections_index is None:
+            return -1
+        return self.sections_index.get_id(section.name, -1)
+
+    def grow(self):
+        """Doubles the table capacity"""
+        if self.batch is not None:
+            self.batch.grow()
+            return
+
+        self.capacity *= 2
+        for column in self.all_columns():
+            old_values = getattr(self, column)
+            new_values = np.zeros(self.capacity, dtype=old_values.dtype)
+            new_values[:self.size] = old_values[:self.size]
+            setattr(self, column, new_values)
+
+    def bind(self, batch, line: int):
+        """Moves the table data into a line of a given batch table, making the columns views over it"""
+        for column in self.all_columns():
+            values = getattr(batch, column)[line]
+            values[:self.size] = getattr(self, column)[:self.size]
+            setattr(self, column, values)
+        self.capacity = batch.capacity
+        self.batch = batch
+
+    def unbind(self):
+        """Moves the table data out of its batch table (if any), into its own columns"""
+        if self.batch is None:
+            return
+
+        for column in self.all_columns():
+            setattr(self, column, getattr(self, column).copy())
+        self.batch = None
+
+    def add_row(self, train) -> int:
+        """Allocates a new row (at the end of the table) for a given train"""
+        if self.size == self.capacity:
+            self.grow()
+
+        row = self.size
+        self.size += 1
+        self.trains.append(train)
+
+        for column in self.FLOAT_COLUMNS + self.BOOL_COLUMNS:
+            getattr(self, column)[row] = 0
+        self.section_id[row] = -1
+        self.finish_section_id[row] = -1
+        self.total_actions[row] = 0
+        return row
+
+    def attach(self, train):
+        """Moves the state of a given train into a new row of this table, making the train a view over it"""
+        old_state, old_row = train.state, train.row
+        row = self.add_row(train)
+        for column in self.all_columns():
+            getattr(self, column)[row] = getattr(old_state, column)[old_row]
+
+        train.state, train.row = self, row
+        self.section_id[row] = self.get_section_id(train.current_head_section)
+        self.finish_section_id[row] = self.get_section_id(train.options.finish_section)
+        if old_state is not self:
+            old_state.remove_row(old_row)
+
+    def detach(self, train):
+        """Moves the state of a given train out of this table (into its own table), compacting the rows"""
+        standalone_state = TrainsState(self.sections_index, capacity=1)
+        standalone_state.attach(train)
+
+    def remove_row(self, row):
+        """Removes a row from the table, shifting the following ones (and updating their trains)"""
+        for column in self.all_columns():
+            values = getattr(self, column)
+            values[row:self.size - 1] = values[row + 1:self.size]
+
+        del self.trains[row]
+        self.size -= 1
+        for index in range(row, self.size):
+            self.trains[index].row = index
+
+
+class TrainsStateBatch(TrainsColumns):
+    """
+    Struct-of-arrays storage for the trains state of several simulations of the same route, shaped as (simulations,
+    trains). Each simulation table is bound to one line of it, so the kinematics, times and costs of a whole population
+    may be integrated at once (only for the lines marked as active).
+    """
+
+    def __init__(self, states: List[TrainsState], sections_index=None):
+        """Class constructor. Binds every given table to a line of the batch."""
+        self.states = states
+        self.sections_index = sections_index
+        self.capacity = max([1] + [state.capacity for state in states])
+        self.active = np.ones(len(states), dtype=bool)
+        self.allocate_columns((len(states), self.capacity))
+
+        for line, state in enumerate(states):
+            state.bind(self, line)
+
+    @property
+    def rows(self):
+        """Selection (boolean mask) of the used rows of the active lines"""
+        sizes = np.array([state.size for state in self.states], dtype=np.int64)
+        return (np.arange(self.capacity) < sizes[:, np.newaxis]) & self.active[:, np.newaxis]
+
+    def grow(self):
+        """Doubles the batch capacity, binding the tables again to the new columns"""
+        self.capacity *= 2
+        self.allocate_columns((len(self.states), self.capacity))
+        for line, state in enumerate(self.states):
+            state.bind(self, line)
+
+    def release(self):
+        """Unbinds every table from the batch"""
+        for state in self.states:
+            state.unbind()
+
+
+class TrainStateColumn:
+    """Descriptor used to expose a column of the trains state table as a train attribute"""
+
+    def __init__(self, column, cast=float):
+        """Class constructor"""
+        self.column = column
+        self.cast = cast
+
+    def __get__(self, train, owner=None):
+        if train is None:
+            return self
+        return self.cast(getattr(train.state, self.column)[train.row])
+
+    def __set__(self, train, value):
+        getattr(train.state, self.column)[train.row] = value
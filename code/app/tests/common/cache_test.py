@@ -1,8 +1,10 @@
 import math
 import os
+import threading
 import time
 import unittest
 from typing import Any
+from unittest import mock
 
 from app.common.cache import Cache
 
@@ -20,6 +22,12 @@ class TestCache(unittest.TestCase):
     TEST_KEY = 'test'
     TEST_VALUE = math.pi
 
+    def setUp(self):
+        # the cache is tested even when it's globally disabled (see Cache.is_disabled)
+        environment_patcher = mock.patch.dict(os.environ, {'CACHE_DISABLED': '0'})
+        environment_patcher.start()
+        self.addCleanup(environment_patcher.stop)
+
     def test_cache_expiration(self):
         Cache.clear_all()
         Cache.save_to_key(self.TEST_MODULE_NAME, self.TEST_KEY, self.TEST_VALUE)
@@ -99,3 +107,87 @@ class TestCache(unittest.TestCase):
         self.assertEqual(self.TEST_VALUE, cache_value_data, "Test value wasn't saved into cache module key")
 
         Cache.clear_all()
+
+    def test_frozen_values(self):
+        """UT for testing if the values are stored frozen and returned without any copy"""
+        Cache.clear_all()
+        saved_value = Cache.save_to_key(self.TEST_MODULE_NAME, self.TEST_KEY, [['A', 'B'], {'C': ['D']}])
+        self.assertEqual((('A', 'B'), {'C': ('D',)}), saved_value)
+        self.assertIs(saved_value, Cache.get_from_key(self.TEST_MODULE_NAME, self.TEST_KEY))
+
+        with self.assertRaises(TypeError):
+            saved_value[1]['C'] = ()
+
+        module_data = Cache.load_from_file(self.TEST_MODULE_NAME)
+        self.assertEqual([['A', 'B'], {'C': ['D']}], module_data[self.TEST_KEY])
+
+        Cache.clear_all()
+
+    def test_concurrent_writes(self):
+        """UT for testing if the module file stays valid while several threads write into the cache"""
+        Cache.clear_all()
+        disk_sync_seconds = Cache.DISK_SYNC_SECONDS
+        Cache.DISK_SYNC_SECONDS = -1  # syncs on every write
+
+        def save_keys(thread_index):
+            for index in range(50):
+                Cache.save_to_key(self.TEST_MODULE_NAME, '{}_{}'.format(thread_index, index), [thread_index, index])
+
+        try:
+            threads = [threading.Thread(target=save_keys, args=(thread_index,)) for thread_index in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(200, len(Cache.list_keys(self.TEST_MODULE_NAME)))
+            Cache.sync_all()
+            self.assertEqual(200, len(Cache.load_from_file(self.TEST_MODULE_NAME)))
+        finally:
+            Cache.DISK_SYNC_SECONDS = disk_sync_seconds
+            Cache.clear_all()
+
+    def test_lazy_load(self):
+        """UT for testing if the stored values are loaded key by key, as they're read"""
+        Cache.clear_all()
+        Cache.save_to_key(self.TEST_MODULE_NAME, self.TEST_KEY, [self.TEST_VALUE])
+        Cache.save_to_key(self.TEST_MODULE_NAME, 'other_test', self.TEST_VALUE)
+        Cache.sync_all()
+
+        # a new process would start with no value in the memory
+        Cache.unload(self.TEST_MODULE_NAME)
+        self.assertEqual([self.TEST_KEY, 'other_test'], Cache.list_keys(self.TEST_MODULE_NAME))
+        self.assertEqual((self.TEST_VALUE,), Cache.get_from_key(self.TEST_MODULE_NAME, self.TEST_KEY))
+        self.assertEqual([self.TEST_KEY], list(Cache._data[self.TEST_MODULE_NAME]))
+        self.assertIsNone(Cache.get_from_key(self.TEST_MODULE_NAME, 'missing_test'))
+
+        Cache.clear_all()
+
+    def test_eviction(self):
+        """UT for testing if the least recently used values are evicted beyond the module limits"""
+        Cache.clear_all()
+        Cache.set_limits(self.TEST_MODULE_NAME, max_entries=2)
+        try:
+            for index in range(3):
+                Cache.save_to_key(self.TEST_MODULE_NAME, 'test_{}'.format(index), [index])
+                # the first value is read again, so it's the most recently used one
+                Cache.get_from_key(self.TEST_MODULE_NAME, 'test_0')
+
+            self.assertEqual(['test_2', 'test_0'], list(Cache._data[self.TEST_MODULE_NAME]))
+            stats = Cache.stats(self.TEST_MODULE_NAME)
+            self.assertEqual(1, stats['evictions'])
+            self.assertEqual(2, stats['size'])
+            self.assertEqual(3, stats['hits'])
+            self.assertEqual(sum(Cache.get_size((index,)) for index in (0, 2)), stats['bytes'])
+
+            # the evicted value is loaded again (from the values not written into the store yet)
+            self.assertEqual((1,), Cache.get_from_key(self.TEST_MODULE_NAME, 'test_1'))
+            self.assertIsNone(Cache.get_from_key(self.TEST_MODULE_NAME, 'missing_test'))
+            stats = Cache.stats(self.TEST_MODULE_NAME)
+            self.assertEqual((1, 1, 2), (stats['loads'], stats['misses'], stats['evictions']))
+
+            Cache.set_limits(self.TEST_MODULE_NAME, max_bytes=Cache.get_size((1,)))
+            self.assertEqual(['test_1'], list(Cache._data[self.TEST_MODULE_NAME]))
+        finally:
+            Cache._limits.pop(self.TEST_MODULE_NAME, None)
+            Cache.clear_all()
@@ -0,0 +1,37 @@
+import unittest
+
+from app.controller.genetic_algorithm.controller import GeneticAlgorithmController
+from app.routes.example import ExampleRoute
+from app.simulation.core.simulation import Simulation
+
+
+class TestBaseController(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+    ]
+
+    def create_solution(self, max_steps):
+        """Helper function to create a solution of the example route, run until a given number of steps"""
+        solution = Simulation(ExampleRoute, trains_queue=self.TRAINS, seed=0, max_steps=max_steps)
+        solution.run()
+        return solution
+
+    def test_update_best_solution(self):
+        """Test if the best solution is the cheapest one, but for a completed one when the solutions are pruned"""
+        failed_solution = self.create_solution(20)
+        completed_solution = self.create_solution(300)
+        self.assertFalse(failed_solution.has_completed_every_train)
+        self.assertTrue(completed_solution.has_completed_every_train)
+        self.assertLess(failed_solution.accumulated_cost, completed_solution.accumulated_cost)
+
+        for prune_solutions, expected_status in ((False, 'FAIL'), (True, 'SUCCESS')):
+            controller = GeneticAlgorithmController(
+                ExampleRoute, self.TRAINS, solutions_size=1, prune_solutions=prune_solutions, seed=1
+            )
+            controller.update_best_solution([failed_solution])
+            controller.update_best_solution([completed_solution])
+            self.assertEqual(expected_status, controller.best_solution_status)
@@ -0,0 +1,74 @@
+import unittest
+
+from app.controller.core.evaluation_cache import EvaluationCache
+from app.controller.genetic_algorithm.controller import GeneticAlgorithmController
+from app.routes.example import ExampleRoute
+from app.simulation.action.all import ALL_POSSIBLE_ACTIONS
+
+
+class TestEvaluationCache(unittest.TestCase):
+
+    def create_task(self, trains_actions=None, seed=0, **options):
+        """Helper function to create an evaluation task (see Simulation.get_evaluation_task)"""
+        return {
+            'route': ExampleRoute,
+            'trains_queue': [{'prefix': 'M01', 'start_section': 'ZAS_P', 'end_section': 'ZPV_D'}],
+            'trains_actions': trains_actions,
+            'options': dict({'max_steps': 100, 'controller_name': 'Test'}, **options),
+            'seed': seed,
+        }
+
+    def test_seed_dependent_outcome(self):
+        """Test if an outcome with random actions is only reused for the same seed"""
+        cache = EvaluationCache()
+        cache.put_outcome(self.create_task(seed=1), {'accumulated_cost': 1.0, 'random_actions_count': 2})
+
+        self.assertIsNone(cache.get_outcome(self.create_task(seed=2)))
+        self.assertEqual(1.0, cache.get_outcome(self.create_task(seed=1))['accumulated_cost'])
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_genome_determined_outcome(self):
+        """Test if an outcome without random actions is reused for any seed (and equivalent genomes/options)"""
+        action = ALL_POSSIBLE_ACTIONS[0]
+        cache = EvaluationCache()
+        cache.put_outcome(
+            self.create_task({'M01': [action.name]}, seed=1), {'accumulated_cost': 1.0, 'random_actions_count': 0}
+        )
+
+        outcome = cache.get_outcome(self.create_task({'M01': [action.abbrev]}, seed=2, controller_name='Other'))
+        self.assertEqual(1.0, outcome['accumulated_cost'])
+        self.assertIsNone(cache.get_outcome(self.create_task({'M01': [action.name]}, seed=1, max_steps=200)))
+
+    def test_eviction(self):
+        """Test if the least recently used outcomes are evicted when the cache is full"""
+        cache = EvaluationCache(max_size=2)
+        for seed in range(3):
+            cache.put_outcome(self.create_task(seed=seed), {'random_actions_count': 1})
+            cache.get_outcome(self.create_task(seed=0))
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.stats()['evictions'])
+        self.assertIsNotNone(cache.get_outcome(self.create_task(seed=0)))
+        self.assertIsNone(cache.get_outcome(self.create_task(seed=1)))
+
+    def test_thread_backend(self):
+        """Test if the thread backend reads the memoized outcome of a solution already evaluated"""
+        controller = GeneticAlgorithmController(
+            ExampleRoute,
+            [{'prefix': 'M01', 'start_section': 'ZAS_P', 'end_section': 'ZPV_D'}],
+            simulation_options={'max_steps': 300},
+            solutions_size=1,
+            evaluation_backend='thread',
+            seed=1,
+        )
+        solution = controller.create_solution()
+        controller.run_unsolved_solutions()
+
+        duplicate = controller.create_solution()
+        duplicate.seed = solution.seed
+        controller.run_unsolved_solutions()
+
+        self.assertEqual((1, 2), (controller.evaluation_cache.hits, controller.evaluation_cache.misses))
+        self.assertEqual(solution.accumulated_cost, duplicate.accumulated_cost)
+        self.assertEqual(solution.get_trains_actions(), duplicate.get_trains_actions())
+        self.assertTrue(duplicate.has_finished)
@@ -0,0 +1,59 @@
+import unittest
+
+from app.controller.exception.error import InvalidConditionError
+from app.controller.genetic_algorithm.controller import GeneticAlgorithmController
+from app.controller.particle_swarm_optimization.controller import ParticleSwarmOptimizationController
+from app.routes.example import ExampleRoute
+
+
+class TestSteadyStateMode(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+        {
+            'prefix': 'M10',
+            'start_section': 'ZPV_P',
+            'end_section': 'ZAS_D',
+            'direction': 'reversed',
+            'step_to_add': 20,
+        },
+    ]
+
+    def create_controller(self, controller_class, **options):
+        """Helper function to create a steady-state controller of the example route"""
+        return controller_class(
+            ExampleRoute,
+            self.TRAINS,
+            simulation_options={'max_steps': 300, 'max_steps_without_train_movement': 0},
+            solutions_size=4,
+            max_iterations=12,
+            max_consecutive_steps_with_same_best=0,
+            evaluation_mode='steady_state',
+            seed=1,
+            **options
+        )
+
+    def test_run(self):
+        """Test if the controllers run every solution, keeping their population size, with no generation barrier"""
+        for controller_class in (GeneticAlgorithmController, ParticleSwarmOptimizationController):
+            for max_thread_workers in (1, 2):
+                controller = self.create_controller(controller_class, max_thread_workers=max_thread_workers)
+                controller.run()
+
+                self.assertEqual(12, controller.iterations_counter)
+                self.assertEqual(3, controller.current_step)
+                self.assertEqual(3, len(controller.best_cost_per_step))
+                self.assertLessEqual(len(controller.solutions), 4)
+                self.assertGreater(controller.get_throughput(), 0)
+                # the solutions received from several threads depend on their finishing order, unlike a single one
+                if max_thread_workers == 1:
+                    self.assertEqual('SUCCESS', controller.best_solution_status)
+
+    def test_batch_backend(self):
+        """Test if the steady-state mode refuses the lockstep batch backend"""
+        controller = self.create_controller(GeneticAlgorithmController, evaluation_backend='batch')
+        with self.assertRaises(InvalidConditionError):
+            controller.run()
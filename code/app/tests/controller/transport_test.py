@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from multiprocessing.connection import Client
+
+from app.controller.core.transport import BrokerTransport, InProcessTransport, WorkerTransport
+from app.controller.core.worker import run_remote_worker
+from app.controller.exception.error import InvalidConditionError
+from app.routes.example import ExampleRoute
+from app.simulation.core.simulation import Simulation
+
+
+class TestWorkerTransports(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+    ]
+    AUTHKEY = b'transport-test'
+
+    def setUp(self):
+        simulation = Simulation(ExampleRoute, trains_queue=self.TRAINS, max_steps=200)
+        self.tasks = [dict(simulation.get_evaluation_task(), seed=seed) for seed in range(5)]
+        self.expected_outcomes = [Simulation.evaluate_task(task) for task in self.tasks]
+
+    def start_workers(self, address, total_workers=2):
+        """Helper function to start local worker processes connected to a broker"""
+        workers = [
+            multiprocessing.Process(target=run_remote_worker, args=(address, self.AUTHKEY, 0.1), daemon=True)
+            for _ in range(total_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def stop_broker(self, broker, workers):
+        """Helper function to close a broker, checking its workers stop along with it"""
+        broker.close()
+        for worker in workers:
+            worker.join(timeout=5)
+            self.assertFalse(worker.is_alive())
+
+    def test_in_process(self):
+        """Test if the in-process transport reaches the same outcomes of evaluating each solution by itself"""
+        transport = InProcessTransport()
+        self.assertEqual(self.expected_outcomes, transport.evaluate(self.tasks))
+        self.assertEqual(0, transport.count_pending())
+
+    def test_broker(self):
+        """Test if the workers of a broker (on a Unix socket and on TCP) reach the same outcomes"""
+        addresses = [os.path.join(tempfile.mkdtemp(), 'broker.sock'), ('127.0.0.1', 0)]
+        for address in addresses:
+            broker = BrokerTransport(address, self.AUTHKEY, batch_size=2)
+            workers = self.start_workers(broker.address)
+            try:
+                self.assertEqual(self.expected_outcomes, broker.evaluate(self.tasks))
+                self.assertEqual(self.expected_outcomes, broker.evaluate(self.tasks))
+            finally:
+                self.stop_broker(broker, workers)
+
+    def test_worker_drop_out(self):
+        """Test if the tasks of a worker which drops out are evaluated by the next worker to join"""
+        broker = BrokerTransport(('127.0.0.1', 0), self.AUTHKEY, batch_size=3)
+        connection = Client(broker.address, authkey=self.AUTHKEY)
+        while not broker.count_workers():
+            time.sleep(0.01)
+        for index, task in enumerate(self.tasks):
+            broker.submit(index, task)
+
+        # the worker receives its first batch, then drops out without answering
+        connection.recv()
+        connection.close()
+
+        workers = self.start_workers(broker.address, 1)
+        try:
+            outcomes = [None] * len(self.tasks)
+            while broker.count_pending():
+                for index, outcome in broker.receive():
+                    outcomes[index] = outcome
+            self.assertEqual(self.expected_outcomes, outcomes)
+        finally:
+            self.stop_broker(broker, workers)
+
+    def test_missing_authkey(self):
+        """Test if the broker refuses to accept workers without authentication"""
+        with self.assertRaises(InvalidConditionError):
+            BrokerTransport(('127.0.0.1', 0), None)
+
+    def test_incomplete_transport(self):
+        """Test if a transport missing any of the interface methods may not be created"""
+        class IncompleteTransport(WorkerTransport):
+            def submit(self, key, task):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteTransport()
@@ -0,0 +1,43 @@
+import unittest
+
+from app.controller.core.worker_pool import WarmWorkerPool
+from app.routes.example import ExampleRoute
+from app.simulation.core.simulation import Simulation
+
+
+class TestWarmWorkerPool(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+    ]
+
+    def test_evaluate(self):
+        """Test if the warm workers reach the same outcomes of evaluating each solution by itself"""
+        simulation = Simulation(ExampleRoute, trains_queue=self.TRAINS, max_steps=200)
+        tasks = [dict(simulation.get_evaluation_task(), seed=seed) for seed in range(5)]
+
+        pool = WarmWorkerPool(2)
+        try:
+            outcomes = pool.evaluate(tasks)
+            # the second request reuses the routes already built by the workers
+            self.assertEqual(outcomes, pool.evaluate(tasks))
+        finally:
+            pool.close()
+
+        self.assertEqual([Simulation.evaluate_task(task) for task in tasks], outcomes)
+
+    def test_group_tasks(self):
+        """Test if the tasks are grouped by their shared parts"""
+        simulation = Simulation(ExampleRoute, trains_queue=self.TRAINS, max_steps=200)
+        other_simulation = Simulation(ExampleRoute, trains_queue=self.TRAINS, max_steps=100)
+        tasks = [
+            dict(simulation.get_evaluation_task(), seed=0),
+            other_simulation.get_evaluation_task(),
+            dict(simulation.get_evaluation_task(), seed=2),
+        ]
+
+        groups = WarmWorkerPool.group_tasks(tasks)
+        self.assertEqual([[0, 2], [1]], [group['indexes'] for group in groups])
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from app.routes.example import ExampleRoute
+from app.simulation.core.batch import SimulationBatch
+from app.simulation.core.simulation import Simulation
+from app.simulation.exception.error import EmptyCollectionError
+
+
+class TestSimulationBatch(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+        {
+            'prefix': 'M10',
+            'start_section': 'ZPV_P',
+            'end_section': 'ZAS_D',
+            'direction': 'reversed',
+            'step_to_add': 20,
+        },
+    ]
+
+    def create_simulation(self, **options):
+        """Helper function to create a simulation of the example route"""
+        simulation_options = {'max_steps': 300, 'max_steps_without_train_movement': 0}
+        simulation_options.update(options)
+        return Simulation(ExampleRoute, trains_queue=[dict(train) for train in self.TRAINS], **simulation_options)
+
+    def test_batch_matches_single_simulation(self):
+        """Test if a simulation run in a batch reaches exactly the same results of running it by itself"""
+        for seed in range(3):
+            random.seed(seed)
+            single = self.create_simulation()
+            single.run()
+
+            random.seed(seed)
+            batched = self.create_simulation()
+            SimulationBatch([batched]).run()
+
+            self.assertEqual(single.current_step, batched.current_step)
+            self.assertEqual(single.accumulated_cost, batched.accumulated_cost)
+            self.assertEqual(single.get_status_text(), batched.get_status_text())
+            self.assertEqual(single.trains_positions_history, batched.trains_positions_history)
+
+    def test_batch_runs_every_simulation(self):
+        """Test if every simulation of a batch is run until it finishes (and released from the batch)"""
+        random.seed(0)
+        simulations = [self.create_simulation(), self.create_simulation(event_driven=True, max_steps=100)]
+        SimulationBatch(simulations).run()
+
+        for simulation in simulations:
+            self.assertTrue(simulation.has_finished)
+            self.assertIsNone(simulation.dispatcher.trains_state.batch)
+        self.assertEqual(101, simulations[1].current_step)
+
+    def test_empty_batch(self):
+        """Test if an empty batch is refused"""
+        with self.assertRaises(EmptyCollectionError):
+            SimulationBatch([])
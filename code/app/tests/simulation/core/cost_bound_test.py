@@ -0,0 +1,68 @@
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from app.routes.example import ExampleRoute
+from app.simulation.core.cost_bound import CostBound
+from app.simulation.core.simulation import Simulation
+
+
+def publish_costs(cost_bound: CostBound, costs):
+    """Helper function to publish some costs (in a worker process)"""
+    for cost in costs:
+        cost_bound.publish(cost)
+
+
+class TestCostBound(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+    ]
+
+    def test_publish(self):
+        """Test if the bound only keeps the lowest cost published, shared by its copies"""
+        cost_bound = CostBound()
+        self.assertEqual(float('inf'), cost_bound.get())
+        self.assertTrue(cost_bound.publish(10.0))
+        self.assertFalse(cost_bound.publish(12.0))
+
+        copied_bound = pickle.loads(pickle.dumps(cost_bound))
+        self.assertEqual(10.0, copied_bound.get())
+        self.assertTrue(copied_bound.publish(8.0))
+        self.assertEqual(8.0, cost_bound.get())
+
+    def test_concurrent_publish(self):
+        """Test if the bound keeps the lowest cost published by several processes at the same time"""
+        cost_bound = CostBound()
+        # every process publishes decreasing costs, interleaved with the ones of the others, so they keep lowering it
+        total_processes = 4
+        costs = [
+            [float(step * total_processes + process) for step in reversed(range(1, 2000))]
+            for process in range(total_processes)
+        ]
+
+        with ProcessPoolExecutor(max_workers=len(costs)) as executor:
+            for future in [executor.submit(publish_costs, cost_bound, worker_costs) for worker_costs in costs]:
+                future.result()
+
+        self.assertEqual(min(min(worker_costs) for worker_costs in costs), cost_bound.get())
+
+    def test_pruned_simulation(self):
+        """Test if a simulation is pruned once its cost passes the bound, and publishes its cost if it completes"""
+        cost_bound = CostBound()
+        simulation = Simulation(ExampleRoute, trains_queue=self.TRAINS, seed=0, cost_bound=cost_bound, max_steps=300)
+        simulation.run()
+        self.assertEqual('SUCCESS', simulation.get_status_text())
+        self.assertEqual(simulation.accumulated_cost, cost_bound.get())
+
+        cost_bound.publish(simulation.accumulated_cost / 2)
+        pruned = Simulation(ExampleRoute, trains_queue=self.TRAINS, seed=0, cost_bound=cost_bound, max_steps=300)
+        pruned.run()
+        self.assertEqual('PRUNED', pruned.get_status_text())
+        self.assertTrue(pruned.has_finished)
+        self.assertFalse(pruned.has_completed_every_train)
+        self.assertLess(pruned.current_step, simulation.current_step)
+        self.assertGreater(pruned.accumulated_cost, cost_bound.get())
@@ -2,6 +2,9 @@ import unittest
 import uuid
 
 from app.routes.example import ExampleRoute
+from app.simulation.action.all import ALL_POSSIBLE_ACTIONS
+from app.simulation.action.move_straight import MoveStraightAction
+from app.simulation.action.wait_crossing import WaitCrossingAction
 from app.simulation.core.dispatcher import Dispatcher
 from app.simulation.math.dynamics import TimeDynamics
 from app.simulation.model.train import Train
@@ -65,11 +68,11 @@ class TestDispatcher(unittest.TestCase):
 
         self.assertEqual(len([route for route in routes_availability if route is True]), 1)
         available_route = next((route for route in routes if dispatcher.is_route_available(route) is True), None)
-        self.assertEqual(['ZCM#1', 'ZCM_D', 'ZCM#2'], available_route)
+        self.assertEqual(('ZCM#1', 'ZCM_D', 'ZCM#2'), available_route)
 
         self.assertEqual(len([route for route in routes_availability if route is False]), 1)
         unavailable_route = next((route for route in routes if dispatcher.is_route_available(route) is False), None)
-        self.assertEqual(['ZCM#1', 'ZCM_P', 'ZCM#2'], unavailable_route)
+        self.assertEqual(('ZCM#1', 'ZCM_P', 'ZCM#2'), unavailable_route)
 
     def test_trains_moving_normal_before_section(self):
         """UT for the trains_moving_normal_before_section method"""
@@ -136,3 +139,112 @@ class TestDispatcher(unittest.TestCase):
         dispatcher.update_related_trains(train1)
         self.assertEqual(1, len(train1.trains_ahead))
         self.assertEqual([train2], train1.trains_ahead)
+
+    def test_incremental_occupancy_dict(self):
+        """UT for the incremental occupancy dict (should always match a full rebuild)"""
+        route = ExampleRoute()
+        dispatcher = Dispatcher(str(uuid.uuid4()), TimeDynamics(), route.sections_mapper, [], {})
+        dispatcher.check_occupancy = True
+
+        dispatcher.add_generic_train(
+            prefix='T01',
+            start_section='ZAS_ZCM',
+            end_section='ZPV_P',
+            start_relative_position=1.0,
+            direction='normal',
+        )
+        train1 = dispatcher.find_train_by_prefix('T01')
+        self.assertEqual([train1], dispatcher.occupancy_dict['ZAS_ZCM'])
+        dispatcher.check_occupancy_dict()
+
+        dispatcher.move_train_to_section(train1, route.sections_mapper.find_section_by_name('ZCM#1'))
+        self.assertEqual([], dispatcher.occupancy_dict['ZAS_ZCM'])
+        self.assertEqual([train1], dispatcher.occupancy_dict['ZCM#1'])
+        self.assertEqual(dispatcher.build_occupancy_dict(), dispatcher.occupancy_dict)
+
+        dispatcher.remove_train(train1)
+        self.assertEqual([], dispatcher.occupancy_dict['ZCM#1'])
+        dispatcher.check_occupancy_dict()
+
+    def test_trains_state_attach_and_detach(self):
+        """UT for the trains state table rows (trains keep their values when attached and detached)"""
+        route = ExampleRoute()
+        dispatcher = Dispatcher(str(uuid.uuid4()), TimeDynamics(), route.sections_mapper, [], {})
+
+        dispatcher.add_generic_train(prefix='T01', start_section='ZAS_ZCM', end_section='ZPV_P',
+                                     start_relative_position=0.5, direction='normal')
+        dispatcher.add_generic_train(prefix='T02', start_section='ZCM_ZPV', end_section='ZPV_P',
+                                     start_relative_position=0.2, direction='normal')
+        train1 = dispatcher.find_train_by_prefix('T01')
+        train2 = dispatcher.find_train_by_prefix('T02')
+        self.assertEqual([train1, train2], dispatcher.trains)
+        self.assertEqual((0, 1), (train1.row, train2.row))
+
+        train1.odometer = 42.0
+        dispatcher.remove_train(train1)
+        self.assertEqual([train2], dispatcher.trains)
+        self.assertEqual(0, train2.row)
+        self.assertEqual(0.2, train2.relative_position)
+        self.assertEqual(42.0, train1.odometer)
+        self.assertEqual(0.5, train1.relative_position)
+
+    def test_cached_possible_actions(self):
+        """UT for the cached possible actions (evaluated again only when their inputs change)"""
+        route = ExampleRoute()
+        dispatcher = Dispatcher(str(uuid.uuid4()), TimeDynamics(), route.sections_mapper, [], {})
+
+        dispatcher.add_generic_train(prefix='T01', start_section='ZAS_ZCM', end_section='ZPV_P',
+                                     start_relative_position=0.5, direction='normal')
+        dispatcher.add_generic_train(prefix='T02', start_section='ZCM_P', end_section='ZPV_P',
+                                     start_relative_position=0.5, direction='normal')
+        train1 = dispatcher.find_train_by_prefix('T01')
+        train2 = dispatcher.find_train_by_prefix('T02')
+
+        dispatcher.update_train_sections(train1)
+        dispatcher.update_train_possible_actions(train1)
+        possible_actions = train1.possible_actions
+        self.assertIn(MoveStraightAction, possible_actions)
+
+        dispatcher.update_train_possible_actions(train1)
+        self.assertIs(possible_actions, train1.possible_actions)
+
+        # a train entering the next section changes the occupancy, so the actions are evaluated again
+        dispatcher.move_train_to_section(train2, route.sections_mapper.find_section_by_name('ZCM#1'))
+        dispatcher.update_train_possible_actions(train1)
+        self.assertNotIn(MoveStraightAction, train1.possible_actions)
+        self.assertEqual(
+            [action for action in ALL_POSSIBLE_ACTIONS if action.is_applicable(dispatcher, train1)],
+            train1.possible_actions
+        )
+
+        # rebuilding the occupancy (e.g. after placing a train by hand) evaluates the actions again as well
+        train2.current_head_section = route.sections_mapper.find_section_by_name('ZCM_P')
+        dispatcher.update_occupancy_dict()
+        dispatcher.update_train_possible_actions(train1)
+        self.assertIn(MoveStraightAction, train1.possible_actions)
+
+    def test_find_deadlocked_trains(self):
+        """UT for the deadlock detection (trains only waiting for each other)"""
+        route = ExampleRoute()
+        dispatcher = Dispatcher(str(uuid.uuid4()), TimeDynamics(), route.sections_mapper, [], {})
+
+        dispatcher.add_generic_train(prefix='T01', start_section='ZAS_ZCM', end_section='ZPV_P',
+                                     start_relative_position=1.0, direction='normal')
+        dispatcher.add_generic_train(prefix='T02', start_section='ZCM_P', end_section='ZAS_P',
+                                     start_relative_position=0.0, direction='reversed')
+        train1 = dispatcher.find_train_by_prefix('T01')
+        train2 = dispatcher.find_train_by_prefix('T02')
+
+        # a train waiting for another one which may still move isn't deadlocked
+        train1.executing_action = WaitCrossingAction()
+        train1.executing_action.lookup_train = train2
+        train2.executing_action = MoveStraightAction()
+        self.assertEqual([], dispatcher.find_deadlocked_trains())
+
+        train2.executing_action = WaitCrossingAction()
+        train2.executing_action.lookup_train = train1
+        self.assertEqual([train1, train2], dispatcher.find_deadlocked_trains())
+
+        # a waiting train keeps going until its section end
+        train2.relative_position = 0.5
+        self.assertEqual([], dispatcher.find_deadlocked_trains())
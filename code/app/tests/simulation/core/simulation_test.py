@@ -0,0 +1,145 @@
+import random
+import unittest
+
+from app.routes.example import ExampleRoute
+from app.simulation.core.simulation import Simulation
+
+
+class TestSimulation(unittest.TestCase):
+    TRAINS = [
+        {
+            'prefix': 'M01',
+            'start_section': 'ZAS_P',
+            'end_section': 'ZPV_D',
+        },
+        {
+            'prefix': 'M10',
+            'start_section': 'ZPV_P',
+            'end_section': 'ZAS_D',
+            'direction': 'reversed',
+            'step_to_add': 20,
+        },
+    ]
+
+    def run_simulation(self, seed, trains_actions=None, **options):
+        """Helper function to run a simulation of the example route with a given random seed"""
+        simulation = Simulation(
+            ExampleRoute,
+            trains_queue=[dict(train) for train in self.TRAINS],
+            trains_actions=trains_actions,
+            seed=seed,
+            max_steps=300,
+            max_steps_without_train_movement=0,
+            **options
+        )
+        simulation.run()
+        return simulation
+
+    def test_event_driven_mode_matches_fixed_step_mode(self):
+        """Test if the event-driven mode reaches exactly the same results of the fixed-step one"""
+        for seed in range(3):
+            fixed_step = self.run_simulation(seed)
+            event_driven = self.run_simulation(seed, event_driven=True)
+
+            self.assertEqual(fixed_step.current_step, event_driven.current_step)
+            self.assertEqual(fixed_step.accumulated_cost, event_driven.accumulated_cost)
+            self.assertEqual(fixed_step.get_status_text(), event_driven.get_status_text())
+            self.assertEqual(fixed_step.trains_positions_history, event_driven.trains_positions_history)
+            self.assertEqual(
+                [frame.trains for frame in fixed_step.results.frames],
+                [frame.trains for frame in event_driven.results.frames],
+            )
+
+    def test_replay(self):
+        """Test if a simulation is replayed bit-for-bit from its seed, whatever the global random state is"""
+        simulation = self.run_simulation(3)
+        frames = [frame.trains for frame in simulation.results.frames]
+        self.assertTrue(simulation.dispatcher.get_random_actions_count() > 0)
+
+        random.seed(0)
+        replay = simulation.replay()
+        self.assertEqual(simulation.uuid, replay.uuid)
+        self.assertEqual(simulation.accumulated_cost, replay.accumulated_cost)
+        self.assertEqual(simulation.get_trains_actions(), replay.get_trains_actions())
+        self.assertEqual(frames, [frame.trains for frame in replay.results.frames])
+
+        simulation.drop_results()
+        self.assertEqual(0, len(simulation.results.frames))
+        self.assertEqual(frames, [frame.trains for frame in simulation.get_results().frames])
+
+    def test_recording_levels(self):
+        """Test if the compact recording levels register the same results of the full frames (replayed on request)"""
+        full = self.run_simulation(5)
+        frames = [frame.trains for frame in full.results.frames]
+
+        for recording_level in ('trajectory', 'summary', 'off'):
+            simulation = self.run_simulation(5, recording_level=recording_level)
+            results = simulation.results
+            self.assertEqual(len(frames), results.total_frames)
+            self.assertEqual(full.results.get_last_total_cost(), results.get_last_total_cost())
+            self.assertEqual(full.results.get_final_status(), results.get_final_status())
+            # the final cost and status are recorded at every level, so the frames aren't replayed to read them
+            self.assertIsNone(results._frames)
+            self.assertEqual(recording_level == 'trajectory', len(results.trajectory) > 0)
+            self.assertEqual(frames, [frame.trains for frame in results.frames])
+
+        trajectory = self.run_simulation(5, recording_level='trajectory').results.get_trajectory()
+        self.assertEqual(sum(len(frame_trains) for frame_trains in frames), len(trajectory['step']))
+        self.assertEqual(
+            [train['relative_position'] for frame_trains in frames for train in frame_trains],
+            list(trajectory['relative_position']),
+        )
+
+    def test_evaluation_task_outcome(self):
+        """Test if a simulation evaluated from its compact inputs (as in a worker process) can be read and replayed"""
+        simulation = Simulation(
+            ExampleRoute,
+            trains_queue=[dict(train) for train in self.TRAINS],
+            seed=7,
+            max_steps=300,
+            max_steps_without_train_movement=0,
+        )
+        outcome = Simulation.evaluate_task(simulation.get_evaluation_task())
+        simulation.read_outcome(outcome)
+        local_run = self.run_simulation(7)
+
+        self.assertEqual(local_run.accumulated_cost, simulation.accumulated_cost)
+        self.assertEqual(local_run.get_status_text(), simulation.get_status_text())
+        self.assertEqual(local_run.get_trains_actions(), simulation.get_trains_actions())
+
+        random_state = random.getstate()
+        results = simulation.get_results()
+        self.assertEqual(random_state, random.getstate())
+        self.assertEqual(simulation.uuid, results.simulation_uuid)
+        self.assertEqual(7, results.seed)
+        self.assertEqual(
+            [frame.trains for frame in local_run.results.frames],
+            [frame.trains for frame in results.frames],
+        )
+
+    def test_fork_from_checkpoint(self):
+        """Test if a simulation forked from a checkpoint reaches the same results of running it from the beginning"""
+        parent = self.run_simulation(0, checkpoints=True, checkpoints_min_interval=1)
+        self.assertTrue(len(parent.checkpoints) > 1)
+
+        checkpoint = parent.checkpoints[len(parent.checkpoints) // 2]
+        trains_actions = {
+            prefix: actions + ['move_straight', 'move_straight']
+            for prefix, actions in checkpoint.trains_actions.items()
+        }
+        # a later checkpoint may match as well, if the parent has taken the same following actions
+        checkpoint = parent.find_checkpoint(trains_actions)
+        self.assertTrue(checkpoint.step >= parent.checkpoints[len(parent.checkpoints) // 2].step)
+
+        fork = parent.fork(checkpoint, trains_actions, seed=1)
+        fork.run()
+
+        from_beginning = self.run_simulation(1, trains_actions=trains_actions)
+        self.assertEqual(from_beginning.current_step, fork.current_step)
+        self.assertEqual(from_beginning.accumulated_cost, fork.accumulated_cost)
+        self.assertEqual(from_beginning.trains_positions_history, fork.trains_positions_history)
+        self.assertEqual(
+            [frame.trains for frame in from_beginning.results.frames],
+            [frame.trains for frame in fork.results.frames],
+        )
+        self.assertEqual(checkpoint.results['total_frames'], checkpoint.step)
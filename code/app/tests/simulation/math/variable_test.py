@@ -0,0 +1,32 @@
+import copy
+import unittest
+
+from app.simulation.math.variable import Variable
+
+
+class TestVariable(unittest.TestCase):
+
+    def test_memory(self):
+        """Test if the last values are kept in order, up to the memory size"""
+        variable = Variable(0.0, memory_size=3)
+        self.assertEqual([], list(variable.last_values))
+
+        for value in range(1, 6):
+            variable.value = float(value)
+        self.assertEqual(5.0, variable.value)
+        self.assertEqual([2.0, 3.0, 4.0], list(variable.last_values))
+
+        variable_copy = copy.deepcopy(variable)
+        variable.value = 6.0
+        self.assertEqual([2.0, 3.0, 4.0], list(variable_copy.last_values))
+        self.assertEqual([3.0, 4.0, 5.0], list(variable.last_values))
+
+    def test_without_memory(self):
+        """Test if a variable without memory keeps no values but still has a derivative"""
+        variable = Variable(1.0, memory_size=0)
+        self.assertEqual(0.0, variable.get_derivative())
+
+        variable.value = 4.0
+        self.assertEqual([], list(variable.last_values))
+        self.assertEqual(3.0, variable.get_derivative())
+        self.assertEqual(1.5, variable.get_derivative(interval=2.0))
@@ -1,10 +1,17 @@
+import math
+import os
 import unittest
+from unittest import mock
 
 from app.routes.example import ExampleRoute
+from app.simulation.exception.error import ConflictConditionError
+from app.simulation.model.section import Section
+from app.simulation.model.sections_mapper import SectionsMapper
 
 
 class TestSectionsMapper(unittest.TestCase):
 
+    @mock.patch.dict(os.environ, {'CACHE_DISABLED': '0'})
     def test_get_routes_between_sections(self):
         """UT for the get_routes_between_sections method"""
         route = ExampleRoute()
@@ -14,14 +21,44 @@ class TestSectionsMapper(unittest.TestCase):
         end_section = mapper.find_section_by_name('ZPV_P')
 
         # We're expecting two possible routes between ZAS_P and ZPV_P (double in ZCM_P/ZCM_D)
-        expected_routes = [
-            ['ZAS_P', 'ZAS#1', 'ZAS_ZCM', 'ZCM#1', 'ZCM_P', 'ZCM#2', 'ZCM_ZPV', 'ZPV#1', 'ZPV_P'],
-            ['ZAS_P', 'ZAS#1', 'ZAS_ZCM', 'ZCM#1', 'ZCM_D', 'ZCM#2', 'ZCM_ZPV', 'ZPV#1', 'ZPV_P']
-        ]
+        expected_routes = (
+            ('ZAS_P', 'ZAS#1', 'ZAS_ZCM', 'ZCM#1', 'ZCM_P', 'ZCM#2', 'ZCM_ZPV', 'ZPV#1', 'ZPV_P'),
+            ('ZAS_P', 'ZAS#1', 'ZAS_ZCM', 'ZCM#1', 'ZCM_D', 'ZCM#2', 'ZCM_ZPV', 'ZPV#1', 'ZPV_P')
+        )
         returned_routes = mapper.get_routes_between_sections(start_section, end_section)
         print(returned_routes)
 
-        self.assertListEqual(expected_routes, returned_routes)
+        self.assertTupleEqual(expected_routes, returned_routes)
+        # the cached routes are returned as they are, with no copy
+        self.assertIs(returned_routes, mapper.get_routes_between_sections(start_section, end_section))
+
+    def test_count_total_routes_between_sections(self):
+        """UT for the count_total_routes_between_sections method (counting the routes without enumerating them)"""
+        mapper = ExampleRoute().sections_mapper
+
+        for start_section in mapper.sections:
+            for end_section in mapper.sections:
+                for is_reversed in (False, True):
+                    self.assertEqual(
+                        len(mapper.get_routes_between_sections(start_section, end_section, is_reversed)),
+                        mapper.count_total_routes_between_sections(start_section, end_section, is_reversed)
+                    )
+
+    def test_count_total_routes_through_cycle(self):
+        """UT for checking that a cycle in the routes between two sections raises an error"""
+        mapper = SectionsMapper(sections=[
+            Section('A', connections=[{'connects_to': 'B', 'when_at': 'end_straight'}]),
+            Section('B', connections=[
+                {'connects_to': 'C', 'when_at': 'end_straight'},
+                {'connects_to': 'A', 'when_at': 'end_deviated'},
+            ]),
+            Section('C'),
+        ])
+        start_section = mapper.find_section_by_name('A')
+        end_section = mapper.find_section_by_name('C')
+
+        with self.assertRaisesRegex(ConflictConditionError, 'A -> B -> A'):
+            mapper.count_total_routes_between_sections(start_section, end_section)
 
     def test_get_distance_between_sections(self):
         """UT for the get_distance_between_sections method"""
@@ -75,3 +112,56 @@ class TestSectionsMapper(unittest.TestCase):
         sections_after = mapper.get_all_sections_after(start_section, True)
         # Should return something like: ['ZAS_P', 'ZAS_D', 'ZAS#1']
         self.assertEqual(3, len(sections_after))
+
+    def test_sections_index(self):
+        """UT for the compiled sections index (should match a linear scan of the sections)"""
+        route = ExampleRoute()
+        mapper = route.sections_mapper
+
+        for section_id, section in enumerate(mapper.sections):
+            self.assertEqual(section_id, mapper.index.get_id(section.name))
+            self.assertIs(section, mapper.find_section_by_name(section.name))
+
+            for is_reversed in (False, True):
+                next_names = section.accessible_connections("start" if is_reversed else "end")
+                previous_names = section.accessible_connections("end" if is_reversed else "start")
+                self.assertEqual(
+                    [next_section for next_section in mapper.sections if next_section.name in next_names],
+                    mapper.get_next_sections(section, is_reversed)
+                )
+                self.assertEqual(
+                    [previous_section for previous_section in mapper.sections if previous_section.name in previous_names],
+                    mapper.get_previous_sections(section, is_reversed)
+                )
+
+        with self.assertRaises(AttributeError):
+            mapper.index.ids = {}
+
+    def test_get_distance_between_unreachable_sections(self):
+        """UT for the get_distance_between_sections method when there's no route in the given direction"""
+        route = ExampleRoute()
+        mapper = route.sections_mapper
+
+        start_section = mapper.find_section_by_name('ZAS_P')
+        end_section = mapper.find_section_by_name('ZPV_P')
+
+        self.assertEqual(math.inf, mapper.get_distance_between_sections(start_section, end_section, is_reversed=True))
+        self.assertEqual(
+            mapper.get_distance_between_sections(start_section, end_section, is_reversed=False),
+            mapper.get_distance_between_sections(end_section, start_section, is_reversed=True),
+        )
+        self.assertEqual(start_section.length, mapper.get_distance_between_sections(start_section, start_section))
+
+    def test_sections_reachability_masks(self):
+        """UT for the reachability masks used by get_all_sections_before/get_all_sections_after"""
+        route = ExampleRoute()
+        mapper = route.sections_mapper
+
+        section = mapper.find_section_by_name('ZAS_ZCM')
+        before_mask = mapper.get_sections_before_mask(section, False)
+        after_mask = mapper.get_sections_after_mask(section, True)
+
+        self.assertEqual(len(mapper.sections), len(before_mask))
+        self.assertFalse(before_mask[mapper.get_section_id(section)])
+        self.assertListEqual(before_mask.tolist(), after_mask.tolist())
+        self.assertSetEqual({'ZAS_P', 'ZAS_D', 'ZAS#1'}, set(mapper.get_all_sections_before(section, False)))
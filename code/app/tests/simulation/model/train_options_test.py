@@ -0,0 +1,18 @@
+import unittest
+
+from app.simulation.model.train import TrainOptions
+
+
+class TestTrainOptions(unittest.TestCase):
+
+    def test_options(self):
+        """Test if the typed options take their defaults, while the other options are still readable"""
+        options = TrainOptions(prefix='M01', priority=5, step_to_add=20)
+        self.assertEqual('M01', options.prefix)
+        self.assertEqual(5, options.priority)
+        self.assertEqual(TrainOptions.DEFAULTS['length'], options.length)
+        self.assertEqual(20, options.step_to_add)
+        self.assertFalse(hasattr(options, 'unknown_option'))
+
+        with self.assertRaises(AttributeError):
+            options.another_option = True